@@ -1,3 +1,6 @@
+import argparse
+import hashlib
+import json
 import shutil
 import os
 import datetime
@@ -11,22 +14,189 @@ FOLDERS = [
     "manifest"
 ]
 
+# 內容定址儲存：同樣內容只存一份 blob，每次備份只寫入變動的檔案
+# backup/cas/objects/<sha256[:2]>/<sha256[2:]>   唯讀 blob
+# backup/cas/manifests/backup_<ts>.json          每次備份的檔案清單
+# backup/backup_<ts>/                            以硬連結組成的可瀏覽目錄（不支援時改為複製）
+CAS_DIR = os.path.join(BACKUP_DIR, "cas")
+OBJECTS_DIR = os.path.join(CAS_DIR, "objects")
+MANIFESTS_DIR = os.path.join(CAS_DIR, "manifests")
+SKIP_DIRS = {"__pycache__"}
+CHUNK_SIZE = 1 << 20
 
-def run_backup():
-    if not os.path.exists(BACKUP_DIR):
-        os.makedirs(BACKUP_DIR)
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _blob_path(sha: str) -> str:
+    return os.path.join(OBJECTS_DIR, sha[:2], sha[2:])
+
+
+def _store_blob(src: str, sha: str) -> bool:
+    """把檔案寫入 CAS（已存在則略過）；回傳是否新寫入。"""
+    dest = _blob_path(sha)
+    if os.path.exists(dest):
+        return False
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f"{dest}.tmp{os.getpid()}"
+    shutil.copyfile(src, tmp)
+    os.chmod(tmp, 0o444)  # blob 會被硬連結到備份目錄，唯讀避免從備份目錄改到共用內容
+    os.replace(tmp, dest)
+    return True
+
+
+def _link_or_copy(blob: str, dest: str):
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    try:
+        os.link(blob, dest)
+    except OSError:
+        # 跨檔案系統或不支援硬連結
+        shutil.copy2(blob, dest)
+
+
+def _iter_source_files(folders):
+    for folder in folders:
+        src = os.path.join(BASE_DIR, folder)
+        if not os.path.isdir(src):
+            continue
+        for dirpath, dirnames, filenames in os.walk(src):
+            dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                yield os.path.relpath(path, BASE_DIR).replace("\\", "/"), path
+
+
+def list_backups():
+    """依時間排序的 manifest 名稱（不含副檔名）。"""
+    if not os.path.isdir(MANIFESTS_DIR):
+        return []
+    return sorted(name[:-5] for name in os.listdir(MANIFESTS_DIR) if name.endswith(".json"))
+
+
+def load_manifest(name: str) -> dict:
+    with open(os.path.join(MANIFESTS_DIR, f"{name}.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run_backup(folders=None):
+    folders = folders or FOLDERS
+    os.makedirs(MANIFESTS_DIR, exist_ok=True)
 
     ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    session_dir = os.path.join(BACKUP_DIR, f"backup_{ts}")
+    name = f"backup_{ts}"
+    session_dir = os.path.join(BACKUP_DIR, name)
     os.makedirs(session_dir)
 
-    for folder in FOLDERS:
-        src = os.path.join(BASE_DIR, folder)
-        if os.path.exists(src):
-            shutil.copytree(src, os.path.join(session_dir, folder))
+    # 上一次備份的 (size, mtime_ns) 相同 → 沿用其 sha256，不重讀檔案
+    previous = list_backups()
+    previous_files = load_manifest(previous[-1])["files"] if previous else {}
 
+    files = {}
+    new_bytes = 0
+    total_bytes = 0
+    for rel, path in _iter_source_files(folders):
+        st = os.stat(path)
+        prev = previous_files.get(rel)
+        if prev and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns and os.path.exists(_blob_path(prev["sha256"])):
+            sha = prev["sha256"]
+        else:
+            sha = _file_sha256(path)
+            if _store_blob(path, sha):
+                new_bytes += st.st_size
+        files[rel] = {"sha256": sha, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "mode": st.st_mode & 0o777}
+        total_bytes += st.st_size
+        _link_or_copy(_blob_path(sha), os.path.join(session_dir, rel))
+
+    manifest = {
+        "name": name,
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "folders": list(folders),
+        "files": files,
+        "total_bytes": total_bytes,
+        "new_bytes": new_bytes,
+    }
+    tmp = os.path.join(MANIFESTS_DIR, f"{name}.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(MANIFESTS_DIR, f"{name}.json"))
 
     print(f"[✅] Backup complete: {session_dir}")
+    print(f"     {len(files)} files, {total_bytes} bytes, new content {new_bytes} bytes")
+    return name
+
+
+def restore_backup(name: str, target: str = None, delete_extra: bool = False) -> dict:
+    """
+    依 manifest 還原到 target（預設為專案根目錄）。
+    大小與 sha256 已相符的檔案略過；還原的檔案為一般可寫入的複本（不與 blob 共用 inode）。
+    delete_extra：同時刪除備份資料夾中 manifest 沒有的檔案。
+    """
+    target = target or BASE_DIR
+    manifest = load_manifest(name)
+    restored = skipped = 0
+    for rel, info in manifest["files"].items():
+        dest = os.path.join(target, rel)
+        if os.path.isfile(dest) and os.path.getsize(dest) == info["size"] and _file_sha256(dest) == info["sha256"]:
+            skipped += 1
+            continue
+        blob = _blob_path(info["sha256"])
+        if not os.path.exists(blob):
+            raise FileNotFoundError(f"missing blob for {rel}: {info['sha256']}")
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f"{dest}.restore_tmp"
+        shutil.copyfile(blob, tmp)
+        os.chmod(tmp, info.get("mode", 0o644))
+        os.replace(tmp, dest)
+        os.utime(dest, ns=(info["mtime_ns"], info["mtime_ns"]))
+        restored += 1
+
+    removed = 0
+    if delete_extra:
+        for folder in manifest["folders"]:
+            root = os.path.join(target, folder)
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+                for fname in filenames:
+                    rel = os.path.relpath(os.path.join(dirpath, fname), target).replace("\\", "/")
+                    if rel not in manifest["files"]:
+                        os.remove(os.path.join(dirpath, fname))
+                        removed += 1
+
+    print(f"[✅] Restored {name} → {target}: {restored} restored, {skipped} unchanged, {removed} removed")
+    return {"restored": restored, "skipped": skipped, "removed": removed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed backup of engine / state / manifest")
+    sub = parser.add_subparsers(dest="cmd")
+    sub.add_parser("backup", help="建立備份（預設動作）")
+    sub.add_parser("list", help="列出備份")
+    p_restore = sub.add_parser("restore", help="依 manifest 還原")
+    p_restore.add_argument("name", help="備份名稱，例如 backup_20251213_120000（latest = 最新一份）")
+    p_restore.add_argument("--target", default=None, help="還原目的地（預設為專案根目錄）")
+    p_restore.add_argument("--delete-extra", action="store_true", help="刪除 manifest 中沒有的檔案")
+    args = parser.parse_args()
+
+    if args.cmd == "list":
+        for name in list_backups():
+            m = load_manifest(name)
+            print(f"{name}  {len(m['files'])} files  {m['total_bytes']} bytes  (+{m['new_bytes']} new)")
+    elif args.cmd == "restore":
+        name = args.name
+        if name == "latest":
+            backups = list_backups()
+            if not backups:
+                raise SystemExit("[ERR] 沒有可還原的備份。")
+            name = backups[-1]
+        restore_backup(name, args.target, args.delete_extra)
+    else:
+        run_backup()
+
 
 if __name__ == "__main__":
-    run_backup()
+    main()
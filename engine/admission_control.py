@@ -0,0 +1,247 @@
+# ==========================================
+# Admission Control & Load Shedding (Engine Entry)
+# ==========================================
+# - 每個 source 一個 token bucket（速率 + 突發上限）
+# - 有界工作佇列 + 固定 worker 數
+# - 超載時立即回傳明確治理判決 REJECTED_OVERLOAD，而不是讓請求等到逾時
+# - 指標：佇列等待時間 vs 實際處理時間
+
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List
+
+# ======================
+# 預設參數
+# ======================
+DEFAULT_RATE_PER_SOURCE = 20.0   # 每秒補充 token 數
+DEFAULT_BURST = 40               # bucket 容量
+DEFAULT_MAX_QUEUE = 64           # 佇列深度上限
+DEFAULT_WORKERS = 4
+MAX_TRACKED_SOURCES = 10000      # 超過時淘汰最久未使用的 bucket
+METRIC_WINDOW = 10000            # 延遲指標保留最近 N 筆
+
+OVERLOAD_STATUS = "REJECTED_OVERLOAD"
+SHED_RATE_LIMIT = "RATE_LIMIT"
+SHED_QUEUE_FULL = "QUEUE_FULL"
+SHED_SHUTDOWN = "SHUTDOWN"
+
+
+class TokenBucket:
+    """單一 source 的 token bucket（呼叫端負責加鎖）。"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def try_acquire(self, now: float) -> bool:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        missing = 1.0 - self.tokens
+        return round(missing / self.rate, 3) if self.rate > 0 and missing > 0 else 0.0
+
+
+def overload_verdict(source: str, reason: str, retry_after: float = 0.0) -> Dict[str, Any]:
+    """被卸載請求的治理判決（與 L(α) 判決同形）。"""
+    return {
+        "Decision_Status": OVERLOAD_STATUS,
+        "L_Alpha_Score": None,
+        "Verdict_Reason": f"Admission control shed request ({reason}).",
+        "Shed_Reason": reason,
+        "Source": source,
+        "Retry_After_Sec": retry_after,
+    }
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    s = sorted(values)
+    n = len(s)
+
+    def pick(q: float) -> float:
+        return round(s[min(n - 1, int(q * n))], 3)
+
+    return {"count": n, "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(s[-1], 3)}
+
+
+class AdmissionController:
+    """
+    引擎入口的准入控制器。
+
+    submit(source, payload) → Future，結果為 dict：
+      {"admitted": bool, "output": handler 回傳值 | None,
+       "verdict": None | overload_verdict, "queue_wait_ms", "service_ms"}
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Any],
+        workers: int = DEFAULT_WORKERS,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        rate_per_source: float = DEFAULT_RATE_PER_SOURCE,
+        burst: int = DEFAULT_BURST,
+    ):
+        self._handler = handler
+        self._rate = rate_per_source
+        self._burst = burst
+        # 項目為 (future, payload, 入列時間)；None 為 worker 停止訊號
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._counters: Dict[str, int] = {
+            "submitted": 0,
+            "admitted": 0,
+            "completed": 0,
+            "errors": 0,
+            "shed_rate_limit": 0,
+            "shed_queue_full": 0,
+        }
+        self._queue_wait_ms: Deque[float] = deque(maxlen=METRIC_WINDOW)
+        self._service_ms: Deque[float] = deque(maxlen=METRIC_WINDOW)
+
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"admission-worker-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for t in self._workers:
+            t.start()
+
+    # ---------- 准入 ----------
+    def _bucket(self, source: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(source)
+        if bucket is None:
+            bucket = TokenBucket(self._rate, self._burst, now)
+            self._buckets[source] = bucket
+            if len(self._buckets) > MAX_TRACKED_SOURCES:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(source)
+        return bucket
+
+    def _shed(self, future: Future, source: str, reason: str, retry_after: float = 0.0) -> Future:
+        future.set_result({
+            "admitted": False,
+            "output": None,
+            "verdict": overload_verdict(source, reason, retry_after),
+            "queue_wait_ms": 0.0,
+            "service_ms": 0.0,
+        })
+        return future
+
+    def submit(self, source: str, payload: Any) -> Future:
+        future: Future = Future()
+        now = time.monotonic()
+
+        # put_nowait 不會阻塞，放在鎖內可確保 shutdown 後不再有請求進入佇列
+        with self._lock:
+            self._counters["submitted"] += 1
+            if self._closed:
+                return self._shed(future, source, SHED_SHUTDOWN)
+
+            bucket = self._bucket(source, now)
+            if not bucket.try_acquire(now):
+                self._counters["shed_rate_limit"] += 1
+                return self._shed(future, source, SHED_RATE_LIMIT, bucket.retry_after())
+
+            try:
+                self._queue.put_nowait((future, payload, time.perf_counter()))
+            except queue.Full:
+                self._counters["shed_queue_full"] += 1
+                return self._shed(future, source, SHED_QUEUE_FULL)
+
+            self._counters["admitted"] += 1
+        return future
+
+    def call(self, source: str, payload: Any) -> Dict[str, Any]:
+        """同步版本：等待處理完成或立即取得卸載判決。"""
+        return self.submit(source, payload).result()
+
+    # ---------- 執行 ----------
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            future, payload, enqueued = item
+            started = time.perf_counter()
+            wait_ms = (started - enqueued) * 1000.0
+            try:
+                output = self._handler(payload)
+                error = None
+            except Exception as e:
+                output, error = None, e
+            service_ms = (time.perf_counter() - started) * 1000.0
+
+            with self._lock:
+                self._queue_wait_ms.append(wait_ms)
+                self._service_ms.append(service_ms)
+                self._counters["completed" if error is None else "errors"] += 1
+
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result({
+                    "admitted": True,
+                    "output": output,
+                    "verdict": None,
+                    "queue_wait_ms": wait_ms,
+                    "service_ms": service_ms,
+                })
+            self._queue.task_done()
+
+    # ---------- 指標 / 關閉 ----------
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            waits = list(self._queue_wait_ms)
+            services = list(self._service_ms)
+        counters["queue_depth"] = self._queue.qsize()
+        counters["queue_capacity"] = self._queue.maxsize
+        return {
+            "counters": counters,
+            "queue_wait_ms": _percentiles(waits),
+            "service_ms": _percentiles(services),
+        }
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        # 已入列的請求先處理完，再由 sentinel 結束 worker
+        for _ in self._workers:
+            self._queue.put(None)
+        if wait:
+            for t in self._workers:
+                t.join()
+
+
+def format_metrics(m: Dict[str, Any]) -> str:
+    c = m["counters"]
+    w = m["queue_wait_ms"]
+    s = m["service_ms"]
+    return (
+        f"[ADMISSION] submitted={c['submitted']} admitted={c['admitted']} "
+        f"shed(rate)={c['shed_rate_limit']} shed(queue)={c['shed_queue_full']} "
+        f"errors={c['errors']} depth={c['queue_depth']}/{c['queue_capacity']}\n"
+        f"  - queue wait ms : p50={w['p50']} p95={w['p95']} p99={w['p99']} max={w['max']}\n"
+        f"  - service ms    : p50={s['p50']} p95={s['p95']} p99={s['p99']} max={s['max']}"
+    )
@@ -0,0 +1,358 @@
+# engine/chain_verifier.py
+# ======================================================
+# Meta-DAG 記憶鏈驗證（state/meta_dag_memory.json）
+# - 逐節點檢查：Node_Index 連續、Previous_Node_ID 指向前一節點、
+#   Node_ID 與內容 hash 相符（同 phase2_memory_engine.append_node 的算法）
+# - 累積鏈 hash：chain_i = sha256(chain_{i-1} + 節點 canonical JSON)，任何欄位被改都會改變後續所有值
+# - 檢查點：每 CHECKPOINT_INTERVAL 個節點記錄 (index, node_id, chain_hash)，以 HMAC-SHA256 簽章
+#   → 平常只需從最後一個可信檢查點往後驗證
+#   → 區段驗證失敗時不簽章（其後也不簽），改拋出 ChainIntegrityError
+# - 全量驗證：檢查點把鏈切成獨立區段，可用多個行程平行驗證
+# ======================================================
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+STATE_DIR = BASE_DIR / "state"
+
+MEMORY_STORE_FILE = STATE_DIR / "meta_dag_memory.json"
+CHECKPOINT_FILE = STATE_DIR / "meta_dag_checkpoints.json"
+# 簽章金鑰：優先取環境變數（hex），否則使用 / 建立本機金鑰檔
+KEY_ENV = "META_DAG_CHAIN_KEY"
+KEY_FILE = STATE_DIR / ".chain_checkpoint.key"
+
+CHECKPOINT_INTERVAL = 256
+GENESIS_NODE_ID = "GENESIS_NODE_0000"
+GENESIS_CHAIN_HASH = hashlib.sha256(GENESIS_NODE_ID.encode("utf-8")).hexdigest()
+
+
+class ChainIntegrityError(ValueError):
+    """record_checkpoints 遇到驗證失敗的區段：該區段與其後都不簽章。"""
+
+    def __init__(self, errors: List[Dict[str, Any]], added: int):
+        first = errors[0]
+        super().__init__(f"chain verification failed at position {first['position']}: {first['reason']}"
+                         f" ({len(errors)} error(s); {added} checkpoint(s) recorded before it)")
+        self.errors = errors
+        self.added = added
+
+
+# 檢查點檔快取：{path: (mtime_ns, size, state)}；append_node 每次都會呼叫 record_checkpoints，
+# 檔案沒被其他行程改過時不必重新解析
+_STATE_CACHE: Dict[Path, Tuple[int, int, Dict[str, Any]]] = {}
+
+
+# ===============================
+# 金鑰與檢查點檔
+# ===============================
+
+def load_key(create: bool = True) -> bytes:
+    env = os.environ.get(KEY_ENV)
+    if env:
+        return bytes.fromhex(env)
+    if KEY_FILE.exists():
+        return bytes.fromhex(KEY_FILE.read_text(encoding="utf-8").strip())
+    if not create:
+        raise FileNotFoundError(f"checkpoint key not found: set {KEY_ENV} or create {KEY_FILE}")
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    key = secrets.token_bytes(32)
+    fd = os.open(KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(key.hex())
+    return key
+
+
+def load_checkpoints(path: Path = CHECKPOINT_FILE) -> Dict[str, Any]:
+    if not path.exists():
+        return {"interval": CHECKPOINT_INTERVAL, "checkpoints": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoints(state: Dict[str, Any], path: Path = CHECKPOINT_FILE):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+    st = path.stat()
+    _STATE_CACHE[Path(path)] = (st.st_mtime_ns, st.st_size, state)
+
+
+def _cached_checkpoints(path: Path) -> Dict[str, Any]:
+    """load_checkpoints 的快取版本（以 mtime / 大小判斷檔案是否被外部修改）。"""
+    path = Path(path)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        _STATE_CACHE.pop(path, None)
+        return load_checkpoints(path)
+    cached = _STATE_CACHE.get(path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    state = load_checkpoints(path)
+    _STATE_CACHE[path] = (st.st_mtime_ns, st.st_size, state)
+    return state
+
+
+def _sign(key: bytes, index: int, node_id: str, chain_hash: str) -> str:
+    return hmac.new(key, f"{index}:{node_id}:{chain_hash}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def trusted_checkpoints(state: Dict[str, Any], key: bytes) -> List[Dict[str, Any]]:
+    """簽章有效、index 遞增的前綴；遇到第一個無效檢查點即停止（其後一律不信任）。"""
+    trusted = []
+    last = 0
+    for cp in state.get("checkpoints", []):
+        valid = (
+            isinstance(cp.get("index"), int) and cp["index"] > last
+            and hmac.compare_digest(cp.get("mac", ""), _sign(key, cp["index"], cp.get("node_id", ""), cp.get("chain_hash", "")))
+        )
+        if not valid:
+            break
+        trusted.append(cp)
+        last = cp["index"]
+    return trusted
+
+
+# ===============================
+# 節點與區段驗證
+# ===============================
+
+def _canonical(node: Dict[str, Any]) -> bytes:
+    return json.dumps(node, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _expected_node_id(node: Dict[str, Any]) -> str:
+    """append_node 的 Node_ID 算法：TS{秒}_{sha256(時間戳-核心內容)[:8]}。"""
+    ts = node["Creation_Timestamp"]
+    core = json.dumps([node["TUL_Input"], node["L_Alpha_Verdict"], node["PRA_Final_Report"]], sort_keys=True)
+    digest = hashlib.sha256(f"{ts}-{core}".encode()).hexdigest()
+    return f"TS{int(ts)}_{digest[:8]}"
+
+
+def verify_segment(
+    nodes: List[Dict[str, Any]],
+    start_position: int,
+    chain_hash: str,
+    prev_node_id: str,
+    prev_index: int,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    驗證一段連續節點（nodes[0] 位於鏈上第 start_position 個位置，從 0 起算）。
+    回傳 (區段結束時的累積 hash, 錯誤清單)。為模組層級函式，可交給子行程執行。
+    """
+    errors = []
+    for offset, node in enumerate(nodes):
+        position = start_position + offset
+        try:
+            node_id = node["Node_ID"]
+            if node["Previous_Node_ID"] != prev_node_id:
+                errors.append({"position": position, "node_id": node_id, "reason": "broken Previous_Node_ID link"})
+            if node["Node_Index"] != prev_index + 1:
+                errors.append({"position": position, "node_id": node_id, "reason": "non-contiguous Node_Index"})
+            if _expected_node_id(node) != node_id:
+                errors.append({"position": position, "node_id": node_id, "reason": "content does not match Node_ID"})
+            prev_node_id, prev_index = node_id, node["Node_Index"]
+        except (KeyError, TypeError) as e:
+            errors.append({"position": position, "node_id": None, "reason": f"malformed node: {e}"})
+            prev_node_id, prev_index = None, prev_index + 1
+        chain_hash = hashlib.sha256(chain_hash.encode("ascii") + _canonical(node)).hexdigest()
+    return chain_hash, errors
+
+
+def _segment_task(args):
+    return verify_segment(*args)
+
+
+def record_checkpoints(
+    nodes: List[Dict[str, Any]],
+    interval: Optional[int] = None,
+    key: Optional[bytes] = None,
+    path: Path = CHECKPOINT_FILE,
+    state: Optional[Dict[str, Any]] = None,
+) -> int:
+    """
+    從最後一個可信檢查點往後補上新檢查點（每 interval 個節點一個）；回傳新增數量。
+    只處理上次檢查點之後的節點，append_node 每次呼叫的成本固定。
+    state 省略時讀取 path（有快取）。
+    區段驗證失敗時，先保存失敗前已簽的檢查點，再拋出 ChainIntegrityError；
+    失敗的區段與其後一律不簽章，檢查點永遠不會替被竄改的鏈背書。
+    """
+    if state is None:
+        state = _cached_checkpoints(path)
+    interval = interval or state.get("interval", CHECKPOINT_INTERVAL)
+    start = state["checkpoints"][-1]["index"] if state["checkpoints"] else 0
+    if len(nodes) < start + interval:
+        return 0
+
+    key = key or load_key()
+    trusted = trusted_checkpoints(state, key)
+    if trusted:
+        last = trusted[-1]
+        position, chain_hash, prev_id = last["index"], last["chain_hash"], last["node_id"]
+        prev_index = nodes[position - 1].get("Node_Index", position) if position <= len(nodes) else position
+    else:
+        position, chain_hash, prev_id, prev_index = 0, GENESIS_CHAIN_HASH, GENESIS_NODE_ID, 0
+
+    added = []
+    errors: List[Dict[str, Any]] = []
+    while position + interval <= len(nodes):
+        segment = nodes[position:position + interval]
+        chain_hash, errors = verify_segment(segment, position, chain_hash, prev_id, prev_index)
+        if errors:
+            break
+        position += interval
+        prev_id = segment[-1].get("Node_ID")
+        prev_index = segment[-1].get("Node_Index", prev_index + interval)
+        added.append({
+            "index": position,
+            "node_id": prev_id,
+            "chain_hash": chain_hash,
+            "mac": _sign(key, position, prev_id, chain_hash),
+            "sealed_at": time.time(),
+        })
+    if added or len(trusted) != len(state["checkpoints"]) or state.get("interval") != interval:
+        state["interval"] = interval
+        state["checkpoints"] = trusted + added
+        save_checkpoints(state, path)
+    if errors:
+        raise ChainIntegrityError(errors, len(added))
+    return len(added)
+
+
+def verify_chain(
+    nodes: List[Dict[str, Any]],
+    state: Dict[str, Any],
+    key: bytes,
+    full: bool = False,
+    workers: int = 1,
+) -> Dict[str, Any]:
+    """
+    驗證記憶鏈。
+    - 預設（增量）：從最後一個與目前鏈相符的可信檢查點往後驗證
+    - full=True：從創世節點驗證全部區段，並比對每個檢查點的累積 hash；workers > 1 時平行驗證
+    """
+    report: Dict[str, Any] = {"nodes": len(nodes), "mode": "full" if full else "incremental", "errors": []}
+    checkpoints = trusted_checkpoints(state, key)
+    report["trusted_checkpoints"] = len(checkpoints)
+    if len(checkpoints) < len(state.get("checkpoints", [])):
+        report["errors"].append({"position": None, "node_id": None,
+                                 "reason": f"checkpoint #{len(checkpoints) + 1} has an invalid signature"})
+
+    # 檢查點超出目前鏈長 → 鏈被截斷
+    beyond = [cp for cp in checkpoints if cp["index"] > len(nodes)]
+    if beyond:
+        report["errors"].append({"position": len(nodes), "node_id": None,
+                                 "reason": f"chain truncated: checkpoint at {beyond[0]['index']} beyond {len(nodes)} nodes"})
+        checkpoints = [cp for cp in checkpoints if cp["index"] <= len(nodes)]
+
+    if not full:
+        # 最後一個 node_id 仍相符的檢查點才可作為起點；不相符的表示其前的節點被替換
+        while checkpoints and nodes[checkpoints[-1]["index"] - 1].get("Node_ID") != checkpoints[-1]["node_id"]:
+            cp = checkpoints.pop()
+            report["errors"].append({"position": cp["index"] - 1, "node_id": nodes[cp["index"] - 1].get("Node_ID"),
+                                     "reason": "node at checkpoint was replaced"})
+        checkpoints = checkpoints[-1:]
+
+    # 區段：[起點, 檢查點1), [檢查點1, 檢查點2), ..., [最後檢查點, 鏈尾)
+    bounds = [(0, GENESIS_CHAIN_HASH, GENESIS_NODE_ID, 0)] if full or not checkpoints else []
+    for cp in checkpoints:
+        prev_index = nodes[cp["index"] - 1].get("Node_Index", cp["index"])
+        bounds.append((cp["index"], cp["chain_hash"], cp["node_id"], prev_index))
+    ends = [b[0] for b in bounds[1:]] + [len(nodes)]
+    tasks = [(nodes[start:end], start, chain, prev_id, prev_index)
+             for (start, chain, prev_id, prev_index), end in zip(bounds, ends)]
+    report["verified_from"] = bounds[0][0] if bounds else len(nodes)
+    report["nodes_checked"] = sum(len(t[0]) for t in tasks)
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_segment_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        results = [verify_segment(*t) for t in tasks]
+
+    expected_by_end = {cp["index"]: cp for cp in checkpoints}
+    for (segment, start, *_), end, (chain_hash, errors) in zip(tasks, ends, results):
+        report["errors"].extend(errors)
+        cp = expected_by_end.get(end)
+        if cp is not None and end > start and cp["chain_hash"] != chain_hash:
+            report["errors"].append({"position": end - 1, "node_id": cp["node_id"],
+                                     "reason": f"chain hash mismatch in segment [{start}, {end})"})
+        if end == len(nodes):
+            report["tip_chain_hash"] = chain_hash
+
+    report["errors"].sort(key=lambda e: (e["position"] is None, e["position"] or 0))
+    report["ok"] = not report["errors"]
+    return report
+
+
+# ===============================
+# CLI
+# ===============================
+
+def _load_nodes(path: Path) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cmd_checkpoint(args):
+    nodes = _load_nodes(Path(args.store))
+    try:
+        added = record_checkpoints(nodes, interval=args.interval)
+    except ChainIntegrityError as e:
+        print(f"[CHAIN] {len(nodes)} 個節點，新增 {e.added} 個檢查點後停止：")
+        for err in e.errors[:20]:
+            print(f"  ! 位置 {err['position']} {err['node_id'] or ''}: {err['reason']}")
+        return 1
+    print(f"[CHAIN] {len(nodes)} 個節點，新增 {added} 個檢查點。")
+    return 0
+
+
+def cmd_verify(args):
+    nodes = _load_nodes(Path(args.store))
+    t0 = time.perf_counter()
+    report = verify_chain(nodes, load_checkpoints(), load_key(), full=args.full, workers=args.workers)
+    elapsed = time.perf_counter() - t0
+    print(f"[CHAIN] {report['mode']}：驗證 {report['nodes_checked']} / {report['nodes']} 個節點"
+          f"（自位置 {report['verified_from']} 起，可信檢查點 {report['trusted_checkpoints']}，{elapsed:.2f}s）")
+    for err in report["errors"][:20]:
+        print(f"  ! 位置 {err['position']} {err['node_id'] or ''}: {err['reason']}")
+    print("[RESULT] ✅ 記憶鏈完整。" if report["ok"] else f"[RESULT] ❌ 偵測到 {len(report['errors'])} 個問題。")
+    return 0 if report["ok"] else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Meta-DAG memory chain verifier")
+    parser.add_argument("--store", default=str(MEMORY_STORE_FILE), help="meta_dag_memory.json 路徑")
+    sub = parser.add_subparsers(dest="cmd")
+
+    p_cp = sub.add_parser("checkpoint", help="補上缺少的簽章檢查點")
+    p_cp.add_argument("--interval", type=int, default=None, help=f"每幾個節點一個檢查點（預設 {CHECKPOINT_INTERVAL}）")
+    p_cp.set_defaults(func=cmd_checkpoint)
+
+    p_verify = sub.add_parser("verify", help="驗證記憶鏈")
+    p_verify.add_argument("--full", action="store_true", help="從創世節點驗證全部區段")
+    p_verify.add_argument("--workers", type=int, default=1, help="全量驗證的平行行程數")
+    p_verify.set_defaults(func=cmd_verify)
+
+    args = parser.parse_args()
+    if not hasattr(args, "func"):
+        parser.print_help()
+        return
+    raise SystemExit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,15 +9,9 @@ import subprocess
 import argparse
 
 from governance.drift_guard import enforce_governance
+from governance.fast_path import pre_admission
 from engine.tul_map import TUL_translate_v2
-
-
-# ======================
-# CLI Argument Handler
-# ======================
-parser = argparse.ArgumentParser()
-parser.add_argument("--once", type=str, help="Run a single query then exit")
-args = parser.parse_args()
+from engine.admission_control import AdmissionController, format_metrics
 
 
 # ======================
@@ -32,26 +26,67 @@ def run_model(prompt: str) -> str:
 
 
 # ======================
-# Engine Boot Log
+# Pre-Admission Fast Path
 # ======================
-print("C-2 Self-Assertion Passed - OK (Engine Integrity Verified)")
-print("[C-3] Governance Lock Verified - OK (Safe-Mode)")
-print("\nMeta-DAG Engine v1.0 booting...")
-print("Core Loaded - OK")
-print("Phase 2 Memory Hooks Active - OK")
-print("Phase 3 TUL Translation Active - OK")
-print("Engine Ready - OK")
-print("[ENGINE LOCAL MODE READY] (Mock Mode + Governance Safe-Mode)\n")
+def fast_path_reply(user_input: str) -> bool:
+    """
+    Noise / 危機模板輸入：直接輸出判決與回應，跳過 TUL / 模型 / drift。
+    回傳 True 表示已處理完畢。
+    """
+    fast = pre_admission(user_input, source="engine_v2")
+    if fast is None:
+        return False
+
+    print(f"\n[FAST PATH] {fast['Decision_Status']} ({fast['Code']})")
+    print(fast["response"])
+    return True
 
 
+# ======================
+# Engine Boot Log
+# ======================
+def boot_log():
+    print("C-2 Self-Assertion Passed - OK (Engine Integrity Verified)")
+    print("[C-3] Governance Lock Verified - OK (Safe-Mode)")
+    print("\nMeta-DAG Engine v1.0 booting...")
+    print("Core Loaded - OK")
+    print("Phase 2 Memory Hooks Active - OK")
+    print("Phase 3 TUL Translation Active - OK")
+    print("Engine Ready - OK")
+    print("[ENGINE LOCAL MODE READY] (Mock Mode + Governance Safe-Mode)\n")
+
 
 # ======================
-# Single-Shot Execution Mode
+# Query Handler (單筆完整流程)
 # ======================
-if args.once:
-    user_input = args.once.strip()
+def handle_query(user_input: str):
+    if fast_path_reply(user_input):
+        return
+
     tul = TUL_translate_v2("USER", user_input)
+
+    print("\n=== TUL TRANSLATE RESULT ===")
+    print(json.dumps(tul, indent=2, ensure_ascii=False))
+
     out = run_model(user_input)
+    print("\n=== MODEL RESPONSE ===")
+    print(out)
+
+    try:
+        drift = enforce_governance()
+        print(f"[DRIFT] {drift:.3f}")
+    except Exception:
+        print("[VETO]")
+
+
+def once_query(user_input: str):
+    """--once 的單筆流程（不印 TUL 結構，只輸出 drift / veto）。"""
+    if fast_path_reply(user_input):
+        return
+
+    # 與 handle_query 相同的處理流程，結果不輸出
+    TUL_translate_v2("USER", user_input)
+    run_model(user_input)
 
     try:
         drift = enforce_governance()
@@ -59,44 +94,67 @@ if args.once:
     except Exception as e:
         print(f"[VETO] {str(e)}")
 
-    sys.exit(0)
 
+def report_shed(result):
+    if not result["admitted"]:
+        verdict = result["verdict"]
+        print(f"\n[{verdict['Decision_Status']}] {verdict['Verdict_Reason']}"
+              f" retry_after={verdict['Retry_After_Sec']}s")
 
-# ======================
-# LIVE Interactive Mode
-# ======================
-print("=== META-DAG LIVE MODE ===")
 
+def main():
+    # ======================
+    # CLI Argument Handler
+    # ======================
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--once", type=str, help="Run a single query then exit")
+    args = parser.parse_args()
 
-while True:
-    try:
-        user_input = input("\nCommand (exit to quit): ").strip()
-
-        if user_input.lower() in ["exit", "quit"]:
-            break
+    boot_log()
 
-        tul = TUL_translate_v2("USER", user_input)
+    # ======================
+    # Single-Shot Execution Mode
+    # ======================
+    # 入口准入控制：CLI 一次只處理一筆，主要作用是 /metrics 的排隊 / 服務時間，
+    # 以及對管線輸入（腳本大量灌入 stdin）的每 source 限速；
+    # 並行負載下的卸載行為見 tests/load_generator.py --admission
+    if args.once:
+        controller = AdmissionController(once_query, workers=1)
+        report_shed(controller.call("cli", args.once.strip()))
+        controller.shutdown()
+        sys.exit(0)
 
-        print("\n=== TUL TRANSLATE RESULT ===")
-        print(json.dumps(tul, indent=2, ensure_ascii=False))
+    # ======================
+    # LIVE Interactive Mode
+    # ======================
+    print("=== META-DAG LIVE MODE ===")
 
-        out = run_model(user_input)
-        print("\n=== MODEL RESPONSE ===")
-        print(out)
+    controller = AdmissionController(handle_query, workers=1)
 
+    while True:
         try:
-            drift = enforce_governance()
-            print(f"[DRIFT] {drift:.3f}")
-        except Exception:
-            print("[VETO]")
-        continue  # Skip to next iteration
+            user_input = input("\nCommand (exit to quit): ").strip()
 
-           
+            if user_input.lower() in ["exit", "quit"]:
+                break
 
-    except KeyboardInterrupt:
-        print("\n[Interrupted]")
-        break
+            if user_input == "/metrics":
+                print(format_metrics(controller.metrics()))
+                continue
 
-    except Exception as e:
-        print(f"\n[ENGINE WARNING] {e}, continuing (Safe-Mode)")
-        continue
+            report_shed(controller.call("cli", user_input))
+            continue  # Skip to next iteration
+
+        except KeyboardInterrupt:
+            print("\n[Interrupted]")
+            break
+
+        except Exception as e:
+            print(f"\n[ENGINE WARNING] {e}, continuing (Safe-Mode)")
+            continue
+
+    controller.shutdown()
+
+
+if __name__ == "__main__":
+    main()
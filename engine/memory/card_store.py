@@ -0,0 +1,203 @@
+# engine/memory/card_store.py
+# ======================================================
+# 欄式記憶卡儲存（取代 List[MemoryCard]）
+# - timestamp：array('d')，存 epoch 微秒（< 2^53，以 double 精確表示）
+# - event_type / severity / api_version：字串駐留表 + array('H') 代碼
+# - indexed_keywords：字典編碼 → CSR（offsets + keyword id 陣列）
+# - event_id：標準 UUID 存 16 bytes；非標準字串另存於稀疏表
+# - description：UTF-8 串接於單一 bytearray + offsets
+# - dag_hash / 密文 / key_id：多數為 None → 稀疏 dict
+# - 主鍵索引：UUID 16 bytes → slot（O(1) 點查，供治理回饋使用）
+# - 治理決策：駐留代碼 → 稀疏 dict（只有收到回饋的卡片才佔空間）
+# - 讀取時才組出 MemoryCard（惰性 view），寫入後卡片物件即可釋放
+# ======================================================
+
+import uuid
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def timestamp_key(dt: datetime) -> int:
+    """
+    datetime → 自 epoch 起的微秒整數（naive 視為 UTC，aware 先換算成 UTC）。
+    用整數避免浮點誤差讓區間邊界（含端點）判斷失準。
+    """
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - _EPOCH) // _MICROSECOND
+
+
+def timestamp_from_key(key: float) -> datetime:
+    """時間鍵 → naive UTC datetime（MemoryCard 預設以 datetime.utcnow 建立）。"""
+    return _EPOCH + timedelta(microseconds=int(key))
+
+
+def _uuid_key(event_id: Any) -> Optional[bytes]:
+    """標準小寫 UUID 字串 → 16 bytes；其他格式回傳 None（以原字串定址）。"""
+    try:
+        u = uuid.UUID(event_id)
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return u.bytes if str(u) == event_id else None
+
+
+class StringTable:
+    """字串駐留表：字串 ↔ 連續整數代碼。"""
+
+    __slots__ = ("values", "_codes")
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self._codes[value] = code
+        return code
+
+    def get(self, value: str) -> Optional[int]:
+        return self._codes.get(value)
+
+
+class CardStore:
+    """
+    以 slot（寫入順序）定址的欄式記憶卡儲存。
+    支援 len() / store[slot] / 迭代，行為與原本的 List[MemoryCard] 相同。
+    """
+
+    def __init__(self, card_factory: Callable[..., Any]):
+        self._card_factory = card_factory
+
+        self.timestamps = array("d")
+        self.type_codes = array("H")
+        self.severity_codes = array("H")
+        self.version_codes = array("H")
+        self.types = StringTable()
+        self.severities = StringTable()
+        self._versions = StringTable()
+
+        self.keywords = StringTable()
+        self.keyword_offsets = array("I", [0])
+        self.keyword_ids = array("I")
+
+        self._uuid_bytes = bytearray()
+        self._raw_event_ids: Dict[int, str] = {}
+        self._slot_by_uuid: Dict[bytes, int] = {}
+        self._slot_by_raw_id: Dict[str, int] = {}
+        self._description_bytes = bytearray()
+        self._description_offsets = array("Q", [0])
+
+        self._dag_hashes: Dict[int, str] = {}
+        self._ciphertexts: Dict[int, bytes] = {}
+        self._key_ids: Dict[int, str] = {}
+
+        self.decisions = StringTable()
+        self._decision_codes: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    # ---------- 寫入 ----------
+    def append(self, card: Any) -> int:
+        slot = len(self.timestamps)
+
+        self.timestamps.append(timestamp_key(card.timestamp))
+        self.type_codes.append(self.types.code(card.event_type))
+        self.severity_codes.append(self.severities.code(card.severity))
+        self.version_codes.append(self._versions.code(card.api_version))
+
+        self.keyword_ids.extend(self.keywords.code(kw) for kw in card.indexed_keywords)
+        self.keyword_offsets.append(len(self.keyword_ids))
+
+        key = _uuid_key(card.event_id)
+        if key is not None:
+            self._uuid_bytes += key
+            self._slot_by_uuid[key] = slot
+        else:
+            # 非標準格式（大寫、無連字號、自訂 id）原樣保留，欄位補零
+            self._uuid_bytes += bytes(16)
+            self._raw_event_ids[slot] = card.event_id
+            self._slot_by_raw_id[card.event_id] = slot
+        self._description_bytes += card.description.encode("utf-8")
+        self._description_offsets.append(len(self._description_bytes))
+
+        if card.dag_hash is not None:
+            self._dag_hashes[slot] = card.dag_hash
+        if card.encrypted_data_ciphertext is not None:
+            self._ciphertexts[slot] = card.encrypted_data_ciphertext
+        if card.encrypted_data_key_id is not None:
+            self._key_ids[slot] = card.encrypted_data_key_id
+        return slot
+
+    def set_decision(self, slot: int, decision: str):
+        self._decision_codes[slot] = self.decisions.code(decision)
+
+    # ---------- 讀取 ----------
+    def slot_of(self, event_id: str) -> Optional[int]:
+        """event_id → slot（字串完全相同才算命中）；同一 id 重複寫入時指向最新一筆。"""
+        key = _uuid_key(event_id)
+        if key is not None:
+            return self._slot_by_uuid.get(key)
+        return self._slot_by_raw_id.get(event_id)
+
+    def decision(self, slot: int) -> Optional[str]:
+        code = self._decision_codes.get(slot)
+        return None if code is None else self.decisions.values[code]
+
+    def event_id(self, slot: int) -> str:
+        raw = self._raw_event_ids.get(slot)
+        if raw is not None:
+            return raw
+        return str(uuid.UUID(bytes=bytes(self._uuid_bytes[slot * 16:slot * 16 + 16])))
+
+    def event_type(self, slot: int) -> str:
+        return self.types.values[self.type_codes[slot]]
+
+    def severity(self, slot: int) -> str:
+        return self.severities.values[self.severity_codes[slot]]
+
+    def description(self, slot: int) -> str:
+        start, end = self._description_offsets[slot], self._description_offsets[slot + 1]
+        return self._description_bytes[start:end].decode("utf-8")
+
+    def keywords_of(self, slot: int) -> List[str]:
+        values = self.keywords.values
+        return [values[i] for i in self.keyword_ids[self.keyword_offsets[slot]:self.keyword_offsets[slot + 1]]]
+
+    def card(self, slot: int) -> Any:
+        """惰性組出 MemoryCard view。"""
+        return self._card_factory(
+            api_version=self._versions.values[self.version_codes[slot]],
+            event_id=self.event_id(slot),
+            timestamp=timestamp_from_key(self.timestamps[slot]),
+            event_type=self.event_type(slot),
+            severity=self.severity(slot),
+            description=self.description(slot),
+            dag_hash=self._dag_hashes.get(slot),
+            encrypted_data_ciphertext=self._ciphertexts.get(slot),
+            encrypted_data_key_id=self._key_ids.get(slot),
+            indexed_keywords=self.keywords_of(slot),
+        )
+
+    def __getitem__(self, slot: int) -> Any:
+        if isinstance(slot, slice):
+            return [self.card(i) for i in range(*slot.indices(len(self)))]
+        if slot < 0:
+            slot += len(self)
+        if not 0 <= slot < len(self):
+            raise IndexError("card slot out of range")
+        return self.card(slot)
+
+    def __iter__(self) -> Iterator[Any]:
+        for slot in range(len(self)):
+            yield self.card(slot)
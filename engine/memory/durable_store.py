@@ -0,0 +1,268 @@
+# engine/memory/durable_store.py
+# ======================================================
+# 時間分區的本地持久層（TimescaleDB 替身，完全離線）
+# - 每個時間桶（預設 1 天）一個 SQLite 檔：<root>/memory_<YYYYMMDDTHH>.sqlite3
+# - 批次寫入：依分區分組，每個分區一次交易 + executemany
+# - 時間區間查詢只開啟與區間重疊的分區（partition pruning），
+#   分區內以 (ts, event_id) 索引排序輸出
+# - 保留期限：整個分區檔案刪除（不做逐列 DELETE）
+# - 重啟時列舉目錄即可找回所有分區，供 MemoryManager 以熱區間（hot_days）重建記憶體索引，
+#   熱區間之前的分區不會被開啟
+# ======================================================
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from engine.memory.card_store import timestamp_from_key, timestamp_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION_HOURS = 24
+_HOUR_US = 3600 * 1000000
+
+_PARTITION_RE = re.compile(r"^memory_(\d{8}T\d{2})\.sqlite3$")
+_PARTITION_FMT = "%Y%m%dT%H"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memory_cards (
+    event_id    TEXT PRIMARY KEY,
+    ts          INTEGER NOT NULL,
+    api_version TEXT NOT NULL,
+    event_type  TEXT NOT NULL,
+    severity    TEXT NOT NULL,
+    description TEXT NOT NULL,
+    dag_hash    TEXT,
+    ciphertext  BLOB,
+    key_id      TEXT,
+    keywords    TEXT NOT NULL,
+    decision    TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_memory_cards_ts ON memory_cards (ts, event_id);
+"""
+
+_COLUMNS = "event_id, ts, api_version, event_type, severity, description, dag_hash, ciphertext, key_id, keywords, decision"
+# event_id 重複時保留先寫入的一筆（含其治理決策），與 MemoryIndex.add 的去重一致
+_INSERT = f"INSERT OR IGNORE INTO memory_cards ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, NULL)"
+
+
+class PartitionedStore:
+    """
+    以時間分區的 SQLite 記憶卡儲存。
+    card_factory：由資料列組回卡片的建構式（MemoryManager 傳入 MemoryCard）。
+    retention_days：保留天數；None 表示不自動丟棄分區。
+    """
+
+    def __init__(
+        self,
+        root: str,
+        card_factory: Callable[..., Any],
+        partition_hours: int = DEFAULT_PARTITION_HOURS,
+        retention_days: Optional[float] = None,
+    ):
+        if partition_hours <= 0:
+            raise ValueError("partition_hours must be positive")
+        self.root = root
+        self.partition_hours = partition_hours
+        self.retention_days = retention_days
+        self._card_factory = card_factory
+        self._span = partition_hours * _HOUR_US
+        self._lock = threading.RLock()
+        self._conns: Dict[int, sqlite3.Connection] = {}
+
+        os.makedirs(root, exist_ok=True)
+        # 分區起點（時間鍵）→ 檔案路徑
+        self._partitions: Dict[int, str] = {}
+        for name in os.listdir(root):
+            m = _PARTITION_RE.match(name)
+            if m:
+                start = timestamp_key(datetime.strptime(m.group(1), _PARTITION_FMT))
+                self._partitions[start] = os.path.join(root, name)
+
+    # ---------- 分區 ----------
+    def partition_of(self, ts_key: float) -> int:
+        return int(ts_key) // self._span * self._span
+
+    def partitions(self) -> List[Tuple[int, str]]:
+        with self._lock:
+            return sorted(self._partitions.items())
+
+    def _path_for(self, start: int) -> str:
+        name = f"memory_{timestamp_from_key(start).strftime(_PARTITION_FMT)}.sqlite3"
+        return os.path.join(self.root, name)
+
+    def _conn(self, start: int, create: bool) -> Optional[sqlite3.Connection]:
+        """呼叫端須持有 lock。"""
+        conn = self._conns.get(start)
+        if conn is not None:
+            return conn
+        path = self._partitions.get(start)
+        if path is None:
+            if not create:
+                return None
+            path = self._partitions[start] = self._path_for(start)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL + NORMAL：提交不逐筆 fsync，崩潰時最多遺失最後一批，檔案不會損毀
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._conns[start] = conn
+        return conn
+
+    def _overlapping(self, start_key: Optional[int], end_key: Optional[int]) -> List[int]:
+        """與 [start_key, end_key] 重疊的分區起點（遞增）。"""
+        lo = None if start_key is None else self.partition_of(start_key)
+        return [
+            start for start in sorted(self._partitions)
+            if (lo is None or start >= lo) and (end_key is None or start <= end_key)
+        ]
+
+    # ---------- 寫入 ----------
+    def insert_many(self, cards: Iterable[Any]) -> int:
+        """批次寫入；依分區分組，每個分區一次交易。分區內 event_id 已存在的卡片略過。"""
+        groups: Dict[int, List[Tuple]] = {}
+        for card in cards:
+            ts = timestamp_key(card.timestamp)
+            groups.setdefault(self.partition_of(ts), []).append((
+                card.event_id, ts, card.api_version, card.event_type, card.severity, card.description,
+                card.dag_hash, card.encrypted_data_ciphertext, card.encrypted_data_key_id,
+                json.dumps(list(card.indexed_keywords), ensure_ascii=False),
+            ))
+        with self._lock:
+            for start, rows in groups.items():
+                conn = self._conn(start, create=True)
+                with conn:
+                    conn.executemany(_INSERT, rows)
+        return sum(len(rows) for rows in groups.values())
+
+    def set_decisions(self, items: Iterable[Tuple[str, float, str]]) -> int:
+        """套用治理決策：[(event_id, 時間鍵, decision), ...]；時間鍵只用來定位分區。"""
+        groups: Dict[int, List[Tuple[str, str]]] = {}
+        for event_id, ts_key, decision in items:
+            groups.setdefault(self.partition_of(ts_key), []).append((decision, event_id))
+        updated = 0
+        with self._lock:
+            for start, rows in groups.items():
+                conn = self._conn(start, create=False)
+                if conn is None:
+                    continue
+                with conn:
+                    updated += conn.executemany("UPDATE memory_cards SET decision = ? WHERE event_id = ?", rows).rowcount
+        return updated
+
+    # ---------- 讀取 ----------
+    def locate(self, event_ids: Iterable[str], batch_size: int = 500) -> Dict[str, int]:
+        """
+        event_id → 時間鍵（供不在記憶體索引內的冷資料定位分區）。
+        由新到舊逐分區以主鍵查詢，全部找到即停止；找不到的 id 不在結果中。
+        """
+        wanted = list(dict.fromkeys(event_ids))
+        found: Dict[str, int] = {}
+        with self._lock:
+            for start in sorted(self._partitions, reverse=True):
+                if not wanted:
+                    break
+                conn = self._conn(start, create=False)
+                if conn is None:
+                    continue
+                for i in range(0, len(wanted), batch_size):
+                    chunk = wanted[i:i + batch_size]
+                    placeholders = ", ".join("?" * len(chunk))
+                    found.update(conn.execute(
+                        f"SELECT event_id, ts FROM memory_cards WHERE event_id IN ({placeholders})", chunk
+                    ).fetchall())
+                wanted = [event_id for event_id in wanted if event_id not in found]
+        return found
+
+    def _to_card(self, row: Tuple) -> Any:
+        event_id, ts, api_version, event_type, severity, description, dag_hash, ciphertext, key_id, keywords, _ = row
+        return self._card_factory(
+            api_version=api_version,
+            event_id=event_id,
+            timestamp=timestamp_from_key(ts),
+            event_type=event_type,
+            severity=severity,
+            description=description,
+            dag_hash=dag_hash,
+            encrypted_data_ciphertext=ciphertext,
+            encrypted_data_key_id=key_id,
+            indexed_keywords=json.loads(keywords),
+        )
+
+    def iter_range(
+        self,
+        start_key: Optional[int] = None,
+        end_key: Optional[int] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[Tuple[Any, Optional[str]]]:
+        """
+        依 (timestamp, event_id) 遞增輸出 [start_key, end_key] 內的 (card, decision)。
+        只讀與區間重疊的分區；每次從 SQLite 取 batch_size 列，記憶體用量固定。
+        """
+        with self._lock:
+            starts = self._overlapping(start_key, end_key)
+        lo = -(1 << 62) if start_key is None else int(start_key)
+        hi = (1 << 62) if end_key is None else int(end_key)
+        for start in starts:
+            with self._lock:
+                conn = self._conn(start, create=False)
+                if conn is None:  # 已被保留期限丟棄
+                    continue
+                cursor = conn.execute(
+                    f"SELECT {_COLUMNS} FROM memory_cards WHERE ts >= ? AND ts <= ? ORDER BY ts, event_id", (lo, hi)
+                )
+            while True:
+                with self._lock:
+                    rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._to_card(row), row[-1]
+
+    def count(self, start_key: Optional[int] = None, end_key: Optional[int] = None) -> int:
+        lo = -(1 << 62) if start_key is None else int(start_key)
+        hi = (1 << 62) if end_key is None else int(end_key)
+        total = 0
+        with self._lock:
+            for start in self._overlapping(start_key, end_key):
+                conn = self._conn(start, create=False)
+                if conn is not None:
+                    total += conn.execute("SELECT COUNT(*) FROM memory_cards WHERE ts >= ? AND ts <= ?", (lo, hi)).fetchone()[0]
+        return total
+
+    # ---------- 保留期限 ----------
+    def drop_before(self, cutoff_key: int) -> List[str]:
+        """刪除整段早於 cutoff 的分區檔（分區結束點 ≤ cutoff）；回傳被刪除的檔案。"""
+        dropped: List[str] = []
+        with self._lock:
+            for start in sorted(self._partitions):
+                if start + self._span > cutoff_key:
+                    break
+                path = self._partitions.pop(start)
+                conn = self._conns.pop(start, None)
+                if conn is not None:
+                    conn.close()
+                for suffix in ("", "-wal", "-shm"):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+                dropped.append(path)
+        if dropped:
+            logger.info(f"Retention dropped {len(dropped)} memory partition(s).")
+        return dropped
+
+    def enforce_retention(self, now: Optional[datetime] = None) -> List[str]:
+        if self.retention_days is None:
+            return []
+        now = now or datetime.utcnow()
+        return self.drop_before(timestamp_key(now - timedelta(days=self.retention_days)))
+
+    def close(self):
+        with self._lock:
+            for conn in self._conns.values():
+                conn.close()
+            self._conns.clear()
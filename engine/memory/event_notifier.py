@@ -0,0 +1,169 @@
+# engine/memory/event_notifier.py
+# ======================================================
+# 記憶事件通知管線（寫入路徑 → 治理層）
+# - 寫入端只做 enqueue，不等待 INarrativeEventSender
+# - 背景 worker 把事件合併成批次，呼叫 send_events_batch
+# - 有界佇列 + 溢位策略：
+#     drop_oldest  丟掉最舊的待送事件（預設，保留最新狀態）
+#     drop_newest  拒收新事件
+#     block        寫入端等待空位（最多 block_timeout 秒，逾時視同 drop_newest）
+# ======================================================
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DROP_NEWEST = "drop_newest"
+OVERFLOW_BLOCK = "block"
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_BLOCK)
+
+DEFAULT_MAX_QUEUE = 10000
+DEFAULT_MAX_BATCH = 256
+DEFAULT_LINGER_MS = 20.0        # 收到第一筆後最多再等多久湊批
+DEFAULT_BLOCK_TIMEOUT = 1.0
+
+
+class EventNotifier:
+    """
+    非同步、批次化的事件發送器。
+    publish() 回傳是否成功排入佇列；flush() 等待已排入的事件送出；close() 送完後停止 worker。
+    """
+
+    def __init__(
+        self,
+        sender: Any,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        overflow: str = OVERFLOW_DROP_OLDEST,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        linger_ms: float = DEFAULT_LINGER_MS,
+        block_timeout: float = DEFAULT_BLOCK_TIMEOUT,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy: {overflow}")
+        self._sender = sender
+        self.max_queue = max(1, max_queue)
+        self.overflow = overflow
+        self.max_batch = max(1, max_batch)
+        self.linger = linger_ms / 1000.0
+        self.block_timeout = block_timeout
+
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._closed = False
+        self._stats: Dict[str, int] = {
+            "enqueued": 0,
+            "delivered": 0,
+            "failed": 0,
+            "dropped_oldest": 0,
+            "dropped_newest": 0,
+            "batches": 0,
+        }
+
+        self._worker = threading.Thread(target=self._run, name="memory-event-notifier", daemon=True)
+        self._worker.start()
+
+    # ---------- 寫入端 ----------
+    def publish(self, event_type: str, memory_id: str, context: Dict[str, Any]) -> bool:
+        return self.publish_many([{"event_type": event_type, "memory_id": memory_id, "context": context}]) == 1
+
+    def publish_many(self, events: Iterable[Dict[str, Any]]) -> int:
+        """排入多筆事件（一次取鎖）；回傳實際排入筆數。"""
+        accepted = 0
+        with self._cond:
+            for event in events:
+                if self._closed:
+                    self._stats["dropped_newest"] += 1
+                    continue
+                if len(self._queue) >= self.max_queue and not self._make_room():
+                    self._stats["dropped_newest"] += 1
+                    continue
+                self._queue.append(event)
+                accepted += 1
+            self._stats["enqueued"] += accepted
+            if accepted:
+                self._cond.notify_all()
+        return accepted
+
+    def _make_room(self) -> bool:
+        """佇列已滿時依策略騰出空位（呼叫端持有鎖）。"""
+        if self.overflow == OVERFLOW_DROP_OLDEST:
+            self._queue.popleft()
+            self._stats["dropped_oldest"] += 1
+            return True
+        if self.overflow == OVERFLOW_BLOCK:
+            deadline = time.monotonic() + self.block_timeout
+            while len(self._queue) >= self.max_queue and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return not self._closed
+        return False
+
+    # ---------- worker ----------
+    def _next_batch(self) -> Optional[List[Dict[str, Any]]]:
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return None  # closed 且已送完
+            # 湊批：等到滿批、linger 到期或關閉
+            deadline = time.monotonic() + self.linger
+            while len(self._queue) < self.max_batch and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            n = min(self.max_batch, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(n)]
+            self._in_flight = n
+            self._cond.notify_all()  # 喚醒 block 策略下等待空位的寫入端
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            delivered = 0
+            try:
+                delivered = int(self._sender.send_events_batch(batch) or 0)
+            except Exception as e:
+                logger.error(f"Event notification batch failed ({len(batch)} events): {e}")
+            with self._cond:
+                self._stats["batches"] += 1
+                self._stats["delivered"] += delivered
+                self._stats["failed"] += len(batch) - delivered
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    # ---------- 控制 ----------
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待佇列清空且無送出中的批次；回傳是否在時限內完成。"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        """停止收件，送完剩餘事件後結束 worker。"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            out = dict(self._stats)
+            out["queue_depth"] = len(self._queue)
+        return out
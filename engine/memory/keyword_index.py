@@ -0,0 +1,218 @@
+# engine/memory/keyword_index.py
+# ======================================================
+# 記憶卡關鍵字：CJK 感知斷詞 + 壓縮倒排索引 + BM25 排序
+# - 斷詞：CJK 連續字元 → 字元 bigram（單字則保留單字）；
+#         其他文字 → 小寫單詞（\w 連續段），去除通用詞
+# - 倒排索引：每個詞一條 posting（slot 遞增），
+#   以 varint 差值編碼 (slot, tf) 存在 bytearray；每 BLOCK_SIZE 筆一個區塊，
+#   區塊起點另存 skip 表 → 點查只解一個區塊
+# - 排序：BM25（k1 / b 見常數），tf 取自描述斷詞結果
+# ======================================================
+
+import math
+import re
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+BLOCK_SIZE = 128
+
+STOPWORDS = frozenset({"a", "the", "is", "in", "of", "and", "or", "to", "from"})
+
+# 中日韓文字：假名、CJK 統一漢字（含擴充 A）、相容漢字、諺文
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_TOKEN_RE = re.compile(rf"([{_CJK}]+)|([^\W{_CJK}]+)")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    斷詞（保留重複，供 tf 計算）：
+    "治理否決 veto node-7" → ["治理", "理否", "否決", "veto", "node", "7"]
+    """
+    tokens: List[str] = []
+    for cjk, word in _TOKEN_RE.findall(text.lower()):
+        if cjk:
+            if len(cjk) == 1:
+                tokens.append(cjk)
+            else:
+                tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        elif word not in STOPWORDS:
+            tokens.append(word)
+    return tokens
+
+
+# ---------- varint ----------
+def _put_varint(buf: bytearray, value: int):
+    while value >= 0x80:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _get_varint(buf: bytearray, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+class _PostingList:
+    """
+    單一詞的壓縮 posting：每筆 (slot 差值, tf)，區塊首筆存絕對 slot。
+    skip 表只在超過一個區塊時建立。
+    """
+
+    __slots__ = ("data", "count", "last", "skip_slots", "skip_offsets")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.count = 0
+        self.last = -1
+        self.skip_slots: Optional[array] = None
+        self.skip_offsets: Optional[array] = None
+
+    def append(self, slot: int, tf: int):
+        if self.count and self.count % BLOCK_SIZE == 0:
+            if self.skip_slots is None:
+                self.skip_slots = array("I")
+                self.skip_offsets = array("I")
+            self.skip_slots.append(slot)
+            self.skip_offsets.append(len(self.data))
+            _put_varint(self.data, slot)
+        else:
+            _put_varint(self.data, slot - self.last if self.count else slot)
+        _put_varint(self.data, tf)
+        self.last = slot
+        self.count += 1
+
+    def _block_bounds(self, block: int) -> Tuple[int, int]:
+        offsets = self.skip_offsets
+        start = 0 if block == 0 else offsets[block - 1]
+        end = offsets[block] if offsets is not None and block < len(offsets) else len(self.data)
+        return start, end
+
+    def _block_of(self, slot: int) -> int:
+        return 0 if self.skip_slots is None else bisect_right(self.skip_slots, slot)
+
+    def _decode(self, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        data = self.data
+        pos = start
+        slot = -1
+        while pos < end:
+            value, pos = _get_varint(data, pos)
+            slot = value if slot < 0 else slot + value
+            tf, pos = _get_varint(data, pos)
+            yield slot, tf
+
+    def lookup(self, slot: int) -> int:
+        """slot 的 tf；不存在回傳 0。只解碼 slot 所在的區塊。"""
+        if self.count == 0 or slot > self.last:
+            return 0
+        start, end = self._block_bounds(self._block_of(slot))
+        for s, tf in self._decode(start, end):
+            if s >= slot:
+                return tf if s == slot else 0
+        return 0
+
+    def iter_range(self, lo: int = 0, hi: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        """依 slot 遞增輸出 [lo, hi) 內的 (slot, tf)。"""
+        n_blocks = 1 if self.skip_slots is None else len(self.skip_slots) + 1
+        for block in range(self._block_of(lo), n_blocks):
+            start, end = self._block_bounds(block)
+            for s, tf in self._decode(start, end):
+                if hi is not None and s >= hi:
+                    return
+                if s >= lo:
+                    yield s, tf
+
+
+class KeywordIndex:
+    """
+    slot 對齊 CardStore 的關鍵字倒排索引。
+    - 只索引卡片的 indexed_keywords（篩選語義：卡片含任一查詢詞）
+    - tf / 文件長度取自描述斷詞，作為 BM25 排序依據
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, _PostingList] = {}
+        self._doc_len = array("H")
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def add(self, slot: int, keywords: Iterable[str], text: str):
+        if slot != len(self._doc_len):
+            raise ValueError(f"keyword index out of sync: slot {slot} != {len(self._doc_len)}")
+        counts = Counter(tokenize(text))
+        doc_len = min(0xFFFF, max(1, sum(counts.values())))
+        self._doc_len.append(doc_len)
+        self._total_len += doc_len
+
+        for kw in dict.fromkeys(keywords):
+            postings = self._postings.get(kw)
+            if postings is None:
+                postings = self._postings[kw] = _PostingList()
+            postings.append(slot, max(1, counts.get(kw, 0)))
+
+    def df(self, term: str) -> int:
+        postings = self._postings.get(term)
+        return postings.count if postings is not None else 0
+
+    def query_terms(self, keywords: Sequence[str]) -> List[str]:
+        """
+        查詢字串 → 索引詞：整串（小寫）本身就是索引詞時直接使用（如 tul_marker），
+        否則以同一套斷詞規則拆開。
+        """
+        terms: Dict[str, None] = {}
+        for kw in keywords:
+            lowered = kw.lower()
+            if lowered in self._postings:
+                terms[lowered] = None
+            else:
+                terms.update(dict.fromkeys(tokenize(kw)))
+        return list(terms)
+
+    # ---------- BM25 ----------
+    def _idf(self, term: str) -> float:
+        n = len(self._doc_len)
+        df = self.df(term)
+        return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+    def _norm(self, slot: int) -> float:
+        avg = self._total_len / len(self._doc_len)
+        return self.k1 * (1.0 - self.b + self.b * self._doc_len[slot] / avg)
+
+    def _term_score(self, idf: float, tf: int, slot: int) -> float:
+        return idf * tf * (self.k1 + 1.0) / (tf + self._norm(slot))
+
+    def score_range(self, terms: Sequence[str], lo: int = 0, hi: Optional[int] = None) -> Dict[int, float]:
+        """term-at-a-time 累加：回傳 [lo, hi) 內含任一詞的 slot → BM25 分數。"""
+        scores: Dict[int, float] = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            idf = self._idf(term)
+            for slot, tf in postings.iter_range(lo, hi):
+                scores[slot] = scores.get(slot, 0.0) + self._term_score(idf, tf, slot)
+        return scores
+
+    def score_slot(self, terms: Sequence[str], slot: int) -> Optional[float]:
+        """單一 slot 的 BM25 分數；不含任何查詢詞回傳 None。"""
+        score = None
+        for term in terms:
+            postings = self._postings.get(term)
+            tf = postings.lookup(slot) if postings is not None else 0
+            if tf:
+                score = (score or 0.0) + self._term_score(self._idf(term), tf, slot)
+        return score
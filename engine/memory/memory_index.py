@@ -0,0 +1,368 @@
+# engine/memory/memory_index.py
+# ======================================================
+# In-memory 記憶卡索引層（TimescaleDB 整合前的查詢加速）
+# - 卡片本體存在欄式 CardStore（card_store.py），索引只存 slot
+# - event_type / severity：hash 索引 → posting list（array('I')，slot 遞增）
+# - timestamp：時間排序陣列，以 bisect 取區間
+# - indexed_keywords：壓縮倒排索引 + BM25（keyword_index.py）
+# - 多條件查詢：先估計各條件候選數，由最小者驅動，
+#   其餘條件依候選數由小到大逐一交集，湊滿 limit 即停止
+# - 帶 keywords 的查詢改依 BM25 分數排序（同分依寫入順序）
+# - 分頁（page）：依 (timestamp, event_id) 排序，由游標位置接續
+# ======================================================
+
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from engine.memory.card_store import CardStore
+from engine.memory.keyword_index import KeywordIndex
+
+
+def _postings() -> array:
+    return array("I")
+
+
+class _PostingFilter:
+    """一個條件 = 一或多條 posting list 的聯集（slot 皆遞增）。"""
+
+    __slots__ = ("lists", "bounds", "size", "_cursors")
+
+    def __init__(self, lists: List[Sequence[int]]):
+        self.lists = [p for p in lists if p]
+        self.bounds = [(0, len(p)) for p in self.lists]
+        self.size = sum(len(p) for p in self.lists)
+        self._cursors = [0] * len(self.lists)
+
+    def restrict(self, lo_slot: int, hi_slot: int):
+        """只保留 [lo_slot, hi_slot) 內的區段（時間窗對應的 slot 範圍）。"""
+        self.bounds = [(bisect_left(p, lo_slot), bisect_left(p, hi_slot)) for p in self.lists]
+        self.size = sum(hi - lo for lo, hi in self.bounds)
+        self._cursors = [lo for lo, _ in self.bounds]
+
+    def restricted(self, lo_slot: int, hi_slot: int) -> Iterator[int]:
+        self.restrict(lo_slot, hi_slot)
+        return self.iter_slots()
+
+    def iter_slots(self) -> Iterator[int]:
+        parts = [islice(p, lo, hi) for p, (lo, hi) in zip(self.lists, self.bounds)]
+        if len(parts) == 1:
+            return parts[0]
+        return _dedup_sorted(heapq.merge(*parts))
+
+    def contains(self, slot: int) -> bool:
+        # 驅動端以遞增順序詢問 → 每條 list 的游標只會往前推進
+        for i, postings in enumerate(self.lists):
+            hi = self.bounds[i][1]
+            pos = bisect_left(postings, slot, self._cursors[i], hi)
+            self._cursors[i] = pos
+            if pos < hi and postings[pos] == slot:
+                return True
+        return False
+
+
+class _TimeFilter:
+    """時間區間條件：[start_key, end_key]（含端點）。"""
+
+    __slots__ = ("index", "start", "end", "lo", "hi", "size", "slot_lo", "slot_hi")
+
+    def __init__(self, index: "MemoryIndex", start: int, end: int):
+        self.index = index
+        self.start = start
+        self.end = end
+        if index._ts_in_slot_order:
+            self.lo = bisect_left(index._ts_by_slot, start)
+            self.hi = bisect_right(index._ts_by_slot, end)
+            self.slot_lo, self.slot_hi = self.lo, self.hi
+        else:
+            self.lo = bisect_left(index._ts_sorted, start)
+            self.hi = bisect_right(index._ts_sorted, end)
+            # 命中 slot 必落在 [slot_lo, slot_hi)：之前的前綴最大值 < start，之後的後綴最小值 > end
+            self.slot_lo = bisect_left(index._ts_prefix_max, start)
+            self.slot_hi = bisect_right(index._ts_suffix_min, end)
+        self.size = max(0, self.hi - self.lo)
+
+    def iter_slots(self) -> Iterable[int]:
+        if self.index._ts_in_slot_order:
+            return range(self.lo, self.hi)
+        return sorted(self.index._slots_by_ts[self.lo:self.hi])
+
+    def contains(self, slot: int) -> bool:
+        return self.start <= self.index._ts_by_slot[slot] <= self.end
+
+
+def _dedup_sorted(it: Iterable[int]) -> Iterator[int]:
+    last = None
+    for slot in it:
+        if slot != last:
+            yield slot
+            last = slot
+
+
+class MemoryIndex:
+    """
+    記憶卡儲存 + 索引。
+    slot = 卡片寫入順序（append-only，event_id 重複的卡片不會再佔 slot），posting list 自然保持遞增，
+    查詢結果依寫入順序回傳，與原本的線性掃描一致。
+    self.cards 為 CardStore：store[slot] 才組出 MemoryCard。
+    """
+
+    def __init__(self, card_factory: Callable[..., Any]):
+        self.cards = CardStore(card_factory)
+        self._by_type: Dict[str, array] = defaultdict(_postings)
+        self._by_severity: Dict[str, array] = defaultdict(_postings)
+        self.keywords = KeywordIndex()
+
+        # slot → 時間鍵（即 CardStore 的 timestamp 欄）；寫入時間單調遞增時它本身就是時間排序陣列
+        self._ts_by_slot = self.cards.timestamps
+        self._ts_in_slot_order = True
+        # 出現亂序寫入後才建立：(時間鍵, slot) 排序陣列 + 前綴最大 / 後綴最小（slot 窗口界線）
+        self._ts_sorted = array("d")
+        self._slots_by_ts = array("I")
+        self._ts_prefix_max = array("d")
+        self._ts_suffix_min = array("d")
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    # ---------- 寫入 ----------
+    def add(self, card: Any) -> int:
+        # event_id 為主鍵：已存在時沿用原 slot，不再追加（與持久層 INSERT OR IGNORE 一致，先寫入者為準）
+        slot = self.cards.slot_of(card.event_id)
+        if slot is not None:
+            return slot
+        slot = self.cards.append(card)
+        self._by_type[card.event_type].append(slot)
+        self._by_severity[card.severity].append(slot)
+        self.keywords.add(slot, card.indexed_keywords, card.description)
+
+        ts = self._ts_by_slot[slot]
+        if self._ts_in_slot_order:
+            if slot and ts < self._ts_by_slot[slot - 1]:
+                self._build_time_order()
+        else:
+            # 同時間鍵時新 slot 排在最後（bisect_right），維持 (ts, slot) 順序
+            pos = bisect_right(self._ts_sorted, ts)
+            self._ts_sorted.insert(pos, ts)
+            self._slots_by_ts.insert(pos, slot)
+            self._append_slot_bounds(ts)
+        return slot
+
+    def add_many(self, cards: Iterable[Any]) -> List[int]:
+        return [self.add(card) for card in cards]
+
+    def _build_time_order(self):
+        order = sorted(range(len(self._ts_by_slot)), key=self._ts_by_slot.__getitem__)
+        self._slots_by_ts = array("I", order)
+        self._ts_sorted = array("d", (self._ts_by_slot[s] for s in order))
+        # 觸發切換的最後一筆之前仍是遞增 → 前綴最大 / 後綴最小即為原值
+        self._ts_prefix_max = self._ts_by_slot[:-1]
+        self._ts_suffix_min = self._ts_by_slot[:-1]
+        self._ts_in_slot_order = False
+        self._append_slot_bounds(self._ts_by_slot[-1])
+
+    def _append_slot_bounds(self, ts: float):
+        prefix = self._ts_prefix_max
+        prefix.append(max(prefix[-1], ts) if prefix else ts)
+        # 晚到事件只回頭修正比它晚的那一段，成本與亂序幅度成正比
+        suffix = self._ts_suffix_min
+        suffix.append(ts)
+        j = len(suffix) - 2
+        while j >= 0 and suffix[j] > ts:
+            suffix[j] = ts
+            j -= 1
+
+    # ---------- 查詢 ----------
+    def query(
+        self,
+        event_types: Optional[Sequence[str]] = None,
+        severities: Optional[Sequence[str]] = None,
+        time_range: Optional[Tuple[int, int]] = None,
+        keywords: Optional[Sequence[str]] = None,
+        limit: int = 100,
+    ) -> List[int]:
+        """
+        回傳符合所有條件的 slot，最多 limit 筆。
+        - event_types / severities / keywords：條件內為 OR，None 表示不篩選
+        - time_range：(start_key, end_key)，見 timestamp_key()
+        - 無 keywords：寫入順序；有 keywords：BM25 分數高者在前
+        """
+        filters: List[Any] = []
+        postings: List[_PostingFilter] = []
+        if event_types is not None:
+            postings.append(_PostingFilter([self._by_type.get(t, []) for t in set(event_types)]))
+        if severities is not None:
+            postings.append(_PostingFilter([self._by_severity.get(s, []) for s in set(severities)]))
+        filters.extend(postings)
+        slot_window = (0, len(self.cards))
+        if time_range is not None:
+            time_filter = _TimeFilter(self, time_range[0], time_range[1])
+            filters.append(time_filter)
+            # 時間窗對應的 slot 區間 → 先裁切 posting list，候選數估計也更準確
+            slot_window = (time_filter.slot_lo, time_filter.slot_hi)
+            for f in postings:
+                f.restrict(*slot_window)
+
+        if limit <= 0:
+            return []
+        if keywords is not None:
+            return self._ranked_query(self.keywords.query_terms(keywords), filters, slot_window, limit)
+        if not filters:
+            return list(range(min(limit, len(self.cards))))
+
+        filters.sort(key=lambda f: f.size)
+        driver, rest = filters[0], filters[1:]
+        if driver.size == 0:
+            return []
+
+        out: List[int] = []
+        for slot in driver.iter_slots():
+            if all(f.contains(slot) for f in rest):
+                out.append(slot)
+                if len(out) >= limit:
+                    break
+        return out
+
+    def _ranked_query(self, terms: List[str], filters: List[Any], slot_window: Tuple[int, int], limit: int) -> List[int]:
+        """
+        keywords 查詢：
+        - 關鍵字候選數（各詞 df 總和）最小 → 逐詞累加 BM25，再以其他條件過濾
+        - 其他條件更小 → 由它驅動，只對通過的 slot 以 skip 表點查 tf 計分
+        最後取分數前 limit 名（分數取 9 位小數比較，避免累加順序造成的浮點抖動）
+        """
+        kw_size = sum(self.keywords.df(t) for t in terms)
+        if kw_size == 0 or any(f.size == 0 for f in filters):
+            return []
+
+        filters.sort(key=lambda f: f.size)
+        if not filters or kw_size <= filters[0].size:
+            scores = self.keywords.score_range(terms, *slot_window)
+            matched = [slot for slot in sorted(scores) if all(f.contains(slot) for f in filters)]
+        else:
+            driver, rest = filters[0], filters[1:]
+            scores = {}
+            for slot in driver.iter_slots():
+                if all(f.contains(slot) for f in rest):
+                    score = self.keywords.score_slot(terms, slot)
+                    if score is not None:
+                        scores[slot] = score
+            matched = list(scores)
+
+        return heapq.nsmallest(limit, matched, key=lambda slot: (-round(scores[slot], 9), slot))
+
+    # ---------- 依時間排序的分頁 ----------
+    def page(
+        self,
+        event_types: Optional[Sequence[str]] = None,
+        severities: Optional[Sequence[str]] = None,
+        time_range: Optional[Tuple[int, int]] = None,
+        keywords: Optional[Sequence[str]] = None,
+        after: Optional[Tuple[float, str]] = None,
+        limit: int = 100,
+    ) -> List[int]:
+        """
+        依 (timestamp, event_id) 遞增，回傳排在 after 之後、符合所有條件的前 limit 個 slot。
+        keywords 在此為篩選條件（含任一詞），不做 BM25 排序。
+        - 條件候選數小：取候選集合，只排出前 limit 名（同時間鍵才比較 event_id）
+        - 否則沿時間順序走訪，逐筆檢查欄位代碼，湊滿 limit 即停止
+        """
+        store = self.cards
+        start, end = time_range if time_range is not None else (float("-inf"), float("inf"))
+        if after is not None:
+            start = max(start, after[0])
+        if limit <= 0 or start > end or not len(store):
+            return []
+
+        # 欄位代碼層級的檢查（不依賴 posting 游標，走訪順序任意）
+        checks: List[Callable[[int], bool]] = []
+        sources: List[Tuple[int, Callable[[int, int], Iterable[int]]]] = []
+        for values, table, codes, by_value in (
+            (event_types, store.types, store.type_codes, self._by_type),
+            (severities, store.severities, store.severity_codes, self._by_severity),
+        ):
+            if values is None:
+                continue
+            wanted = {table.get(v) for v in values} - {None}
+            if not wanted:
+                return []
+            checks.append(lambda slot, codes=codes, wanted=wanted: codes[slot] in wanted)
+            lists = [by_value[table.values[c]] for c in wanted]
+            sources.append((sum(len(p) for p in lists),
+                            lambda lo, hi, lists=lists: _PostingFilter(lists).restricted(lo, hi)))
+        if keywords is not None:
+            terms = self.keywords.query_terms(keywords)
+            term_ids = {store.keywords.get(t) for t in terms} - {None}
+            if not term_ids:
+                return []
+            offsets, ids = store.keyword_offsets, store.keyword_ids
+            checks.append(lambda slot: any(k in term_ids for k in ids[offsets[slot]:offsets[slot + 1]]))
+            sources.append((sum(self.keywords.df(t) for t in terms),
+                            lambda lo, hi: sorted(self.keywords.score_range(terms, lo, hi))))
+
+        time_filter = _TimeFilter(self, start, end)
+        if time_filter.size == 0:
+            return []
+        ts = self._ts_by_slot
+
+        def is_after(slot: int) -> bool:
+            t = ts[slot]
+            return t > after[0] or (t == after[0] and store.event_id(slot) > after[1])
+
+        def key(slot: int) -> Tuple[float, str]:
+            return ts[slot], store.event_id(slot)
+
+        if sources:
+            size, source = min(sources, key=lambda s: s[0])
+            # 沿時間走訪預估要看 limit / 命中率 筆（各條件視為獨立）；候選集合更小時改由候選驅動
+            selectivity = 1.0
+            for n, _ in sources:
+                selectivity *= n / len(store)
+            if selectivity == 0 or size * selectivity <= limit:
+                candidates = [
+                    slot for slot in source(time_filter.slot_lo, time_filter.slot_hi)
+                    if start <= ts[slot] <= end and all(c(slot) for c in checks)
+                    and (after is None or is_after(slot))
+                ]
+                if len(candidates) <= limit:
+                    return sorted(candidates, key=key)
+                boundary = ts[heapq.nsmallest(limit, candidates, key=ts.__getitem__)[-1]]
+                head = sorted((s for s in candidates if ts[s] < boundary), key=key)
+                ties = sorted((s for s in candidates if ts[s] == boundary), key=store.event_id)
+                return head + ties[:limit - len(head)]
+
+        out: List[int] = []
+        group: List[int] = []
+        group_ts = None
+        for slot in self._time_ordered(time_filter):
+            t = ts[slot]
+            if t != group_ts:
+                if self._emit_group(group, checks, after, out, limit):
+                    return out
+                group, group_ts = [], t
+            group.append(slot)
+        self._emit_group(group, checks, after, out, limit)
+        return out
+
+    def _time_ordered(self, time_filter: "_TimeFilter") -> Iterable[int]:
+        if self._ts_in_slot_order:
+            return range(time_filter.lo, time_filter.hi)
+        return islice(self._slots_by_ts, time_filter.lo, time_filter.hi)
+
+    def _emit_group(self, group: List[int], checks: List[Callable[[int], bool]],
+                    after: Optional[Tuple[float, str]], out: List[int], limit: int) -> bool:
+        """同一時間鍵的一組 slot：依 event_id 排序後輸出；湊滿 limit 回傳 True。"""
+        if not group:
+            return False
+        matched = [slot for slot in group if all(c(slot) for c in checks)]
+        if len(matched) > 1:
+            matched.sort(key=self.cards.event_id)
+        if after is not None and self._ts_by_slot[group[0]] == after[0]:
+            matched = [slot for slot in matched if self.cards.event_id(slot) > after[1]]
+        for slot in matched:
+            out.append(slot)
+            if len(out) >= limit:
+                return True
+        return False
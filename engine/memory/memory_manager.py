@@ -1,44 +1,51 @@
-## 📝 **完整 TODO 清單 (複製到代碼開頭)**
-
-```python
 """
 記憶模組實作 (v0.1-alpha)
 
 🔴 CRITICAL (必須完成才符合契約):
-- [ ] retrieve_relevant_memories: 補完 time_range 篩選
-- [ ] retrieve_relevant_memories: 補完 severity 篩選
-- [ ] retrieve_relevant_memories: 補完 keywords 篩選
+- [x] retrieve_relevant_memories: 補完 time_range 篩選
+- [x] retrieve_relevant_memories: 補完 severity 篩選
+- [x] retrieve_relevant_memories: 補完 keywords 篩選
 - [ ] retrieve_relevant_memories: 實作解密邏輯 (_decrypt_and_serialize)
-- [ ] MemoryManager: 實作 IGovernanceFeedbackReceiver.receive_feedback()
+- [x] MemoryManager: 實作 IGovernanceFeedbackReceiver.receive_feedback()
 
 🟡 HIGH (應盡快完成以提升品質):
 - [ ] log_system_events_batch: 返回詳細失敗資訊
-- [ ] MemoryManager: 建立 event_type/severity 索引以提升查詢效能
-- [ ] observe_performance: 加入效能警告閾值
+- [x] MemoryManager: 建立 event_type/severity 索引以提升查詢效能 (memory_index.py)
+- [x] observe_performance: 加入效能警告閾值 (SLO breach 計數，metrics.py)
 
 🟢 LOW (優化項,可之後完成):
 - [ ] MetaDAGError: 加 to_dict() 方法
 - [ ] MemoryCard: 加 from_dict() 工廠方法
 - [ ] 實作真實 AES-256-GCM 加密/解密
-- [ ] 整合 TimescaleDB 替換 in-memory store
+- [ ] 整合 TimescaleDB 替換 in-memory store（本地離線替身：durable_store.py 時間分區 SQLite）
 
 📅 計劃:
 - Phase 1 (現在): 完成 🔴 CRITICAL 項目
-- Phase 2 (v0.2): 完成 🟡 HIGH 項目  
+- Phase 2 (v0.2): 完成 🟡 HIGH 項目
 - Phase 3 (v1.0): 完成 🟢 LOW 項目 + TimescaleDB 整合
-"""
-```
 
+審查筆記（分類建議）：docs/design_notes/memory_manager_review.md
+"""
 
 import uuid
+import base64
+import hashlib
 import time
 import functools
 import json
 import logging
-from datetime import datetime
-from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from dataclasses import dataclass, field
 
+from engine.memory.card_store import timestamp_key
+from engine.memory.durable_store import PartitionedStore
+from engine.memory.event_notifier import EventNotifier
+from engine.memory.keyword_index import STOPWORDS, tokenize
+from engine.memory.memory_index import MemoryIndex
+from engine.memory.metrics import MetricsRegistry
+
 # 設置結構化日誌（滿足契約第 8 章：可觀測性）
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -54,63 +61,83 @@ class MetaDAGError(Exception):
         self.detail = detail or {}
         super().__init__(message)
 
+# 契約 7.1 響應時間目標 (P95, 毫秒)；單次超過即計入 SLO breach
+SLO_THRESHOLDS_MS = {
+    "log_system_event": 50,
+    "log_system_events_batch": 200,
+    "retrieve_relevant_memories": 100,
+    "retrieve_memories_page": 100,
+}
+
+# 每次調用的 INFO 日誌（熱路徑成本高，預設關閉；延遲 / 錯誤 / 筆數一律進 metrics）
+LOG_API_CALLS = False
+
+
 def observe_performance(metric_name: str):
     """
-    可觀測性裝飾器：自動記錄 API 調用指標和日誌（契約第 8 章）。
+    可觀測性裝飾器：記錄 API 延遲直方圖、錯誤與結果筆數到 self.metrics（契約第 8 章）。
     """
     def decorator(func):
         @functools.wraps(func)
         def wrapper(self, *args, **kwargs):
             start_time = time.perf_counter()
-            # 記錄調用開始（生產環境需對敏感參數脫敏）
-            logger.info(f"API Called: {func.__name__}", extra={"metric": metric_name})
-            
+            if LOG_API_CALLS:
+                # 記錄調用開始（生產環境需對敏感參數脫敏）
+                logger.info(f"API Called: {func.__name__}", extra={"metric": metric_name})
+
             try:
                 result = func(self, *args, **kwargs)
                 duration = (time.perf_counter() - start_time) * 1000  # 毫秒
-                
-                # 記錄成功指標 (應發送到 Prometheus/StatsD)
-                # metrics.timing(f"memory_api.{metric_name}.duration", duration)
-                logger.info(f"API Success: {func.__name__}", extra={"duration_ms": duration, "result_size": len(result) if isinstance(result, list) else 1})
-                
+                if isinstance(result, list):
+                    result_size = len(result)
+                elif isinstance(result, dict) and "items" in result:
+                    result_size = len(result["items"])
+                else:
+                    result_size = 1
+                self.metrics.observe(metric_name, duration, result_size)
+
+                if LOG_API_CALLS:
+                    logger.info(f"API Success: {func.__name__}", extra={"duration_ms": duration, "result_size": result_size})
+
                 return result
             except Exception as e:
                 duration = (time.perf_counter() - start_time) * 1000
-                # 記錄失敗指標並標準化錯誤
-                # metrics.incr(f"memory_api.{metric_name}.error")
+                # 記錄失敗指標並標準化錯誤 (契約第 5 章)
+                error = self._standardize_error(e)
+                self.metrics.observe(metric_name, duration, error_code=error.error_code)
                 logger.exception(f"API Error: {func.__name__}", extra={"error": str(e), "duration_ms": duration})
-                # 重新拋出標準化錯誤 (契約第 5 章)
-                raise self._standardize_error(e)
+                raise error
         return wrapper
     return decorator
 
 # --- 1. MemoryCard 數據模型 (對應契約 system_event_memory_format_v1) ---
-@dataclass(frozen=True)
+# kw_only：帶預設值的欄位排在必填欄位之前，需以關鍵字參數建構
+@dataclass(frozen=True, kw_only=True)
 class MemoryCard:
     """
     不可變的記憶卡數據模型。
     """
-    
+
     # 契約版本 (新增，滿足契約第 6 章)
     api_version: str = "1.0"
-    
+
     # Core Fields for Indexing (TimescaleDB Hypertable Primary Key)
     event_id: str = field(default_factory=lambda: str(uuid.uuid4()))
     timestamp: datetime = field(default_factory=datetime.utcnow)
-    
+
     # Governance & Severity
     event_type: str  # VETO_APPLIED | EXTERNAL_FAILURE | NOISE_BLOCKED | INTERNAL_ANOMALY
     severity: str    # high | medium | low
     description: str
     dag_hash: Optional[str] = None  # Related DAG Node Hash
-    
+
     # 加密數據 (新增，滿足契約第 4 章：安全與加密規範)
     encrypted_data_ciphertext: Optional[bytes] = None
     encrypted_data_key_id: Optional[str] = None
-    
+
     # 用於高效查詢的索引字段 (新增，優化 retrieve_relevant_memories 性能)
     indexed_keywords: List[str] = field(default_factory=list)
-    
+
     @property
     def is_encrypted(self) -> bool:
         """檢查敏感數據是否已加密。"""
@@ -124,6 +151,16 @@ class INarrativeEventSender:
     def send_event(self, event_type: str, memory_id: str, context: Dict[str, Any], api_version: str = API_VERSION) -> bool:
         raise NotImplementedError
 
+    def send_events_batch(self, events: List[Dict[str, Any]], api_version: str = API_VERSION) -> int:
+        """
+        批次發送（由 EventNotifier 背景呼叫）。events 每筆含 event_type / memory_id / context。
+        預設逐筆呼叫 send_event；實作端可覆寫為單次批量傳輸。回傳成功筆數。
+        """
+        return sum(
+            1 for e in events
+            if self.send_event(e["event_type"], e["memory_id"], e["context"], api_version=api_version)
+        )
+
 class IGovernanceFeedbackReceiver:
     """抽象回調接口：用於接收治理層的最終決策。"""
     API_VERSION = "1.0"
@@ -132,18 +169,45 @@ class IGovernanceFeedbackReceiver:
 
 
 # --- 3. 核心管理類：MemoryManager (實現契約 Core APIs) ---
-class MemoryManager:
+class MemoryManager(IGovernanceFeedbackReceiver):
     """
     記憶模組的核心管理器，實現所有契約要求。
     將優先使用記憶體 (in-memory) 模擬存儲，以快速驗證邏輯。
     """
     API_VERSION = "1.0"
-    
-    def __init__(self, event_sender: INarrativeEventSender):
+
+    def __init__(
+        self,
+        event_sender: INarrativeEventSender,
+        notifier: Optional[EventNotifier] = None,
+        durable_dir: Optional[str] = None,
+        retention_days: Optional[float] = None,
+        hot_days: Optional[float] = None,
+    ):
         self._event_sender = event_sender
-        # In-memory store for rapid prototyping (will be replaced by TimescaleDB)
-        self._memory_store: List[MemoryCard] = [] 
-        logger.info("MemoryManager initialized. Ready for in-memory logic testing.")
+        # 事件通知走背景批次佇列，治理層變慢不影響寫入延遲；溢位策略見 event_notifier.py
+        self._notifier = notifier or EventNotifier(event_sender)
+        # 索引層：event_type / severity hash、時間排序陣列、keywords 倒排索引
+        # 卡片以欄式 CardStore 保存，_memory_store[slot] 讀取時才組出 MemoryCard
+        self._index = MemoryIndex(MemoryCard)
+        self._memory_store = self._index.cards
+        # 持久層（TimescaleDB 替身）：durable_dir 指定時寫入時間分區 SQLite，啟動時重建索引
+        # hot_days：索引只載入最近幾天（None = 同 retention_days，兩者皆 None 則全部載入）；
+        # 更早的冷資料仍在持久層：time_range 起點早於熱區間的查詢由持久層補上該段（只開啟重疊分區），
+        # 治理反饋也會回落到持久層以 event_id 定位。未指定 time_range 的查詢只涵蓋熱區間
+        self._durable: Optional[PartitionedStore] = None
+        self._hot_days = retention_days if hot_days is None else hot_days
+        self._loaded_since: Optional[int] = None
+        if durable_dir is not None:
+            self._durable = PartitionedStore(durable_dir, MemoryCard, retention_days=retention_days)
+            self._durable.enforce_retention()
+            self._rehydrate()
+        # API 延遲直方圖 / 錯誤 / SLO 計數；匯出：self.metrics.to_json() / to_prometheus()
+        self.metrics = MetricsRegistry(SLO_THRESHOLDS_MS)
+        logger.info(
+            f"MemoryManager initialized with in-memory indexes ({len(self._memory_store)} cards"
+            f"{', durable' if self._durable else ''})."
+        )
 
 
     @observe_performance("log_system_event")
@@ -154,20 +218,18 @@ class MemoryManager:
         # 1. 確保 API 版本相符
         if api_version != self.API_VERSION:
             raise MetaDAGError("UNSUPPORTED_API_VERSION", f"API version {api_version} is not supported.")
-            
+
         # 2. 創建 MemoryCard 並加密 raw_data
         memory_card = self._create_and_encrypt_card(event)
-        
-        # 3. 數據庫寫入 (In-memory Placeholder)
-        self._memory_store.append(memory_card)
-        
-        # 4. 觸發事件發送者 (回調給 Meta-DAG)
-        self._event_sender.send_event(
-            event_type=memory_card.event_type,
-            memory_id=memory_card.event_id,
-            context={"description": memory_card.description, "dag_hash": memory_card.dag_hash}
-        )
-        
+
+        # 3. 數據庫寫入（持久層先寫，成功後才進索引）
+        if self._durable is not None:
+            self._durable.insert_many([memory_card])
+        self._index.add(memory_card)
+
+        # 4. 觸發事件發送者 (回調給 Meta-DAG；排入背景佇列，非同步送出)
+        self._notifier.publish_many([self._notification(memory_card)])
+
         return memory_card.event_id
 
     @observe_performance("log_system_events_batch")
@@ -177,7 +239,7 @@ class MemoryManager:
         """
         if api_version != self.API_VERSION:
             raise MetaDAGError("UNSUPPORTED_API_VERSION", f"API version {api_version} is not supported.")
-            
+
         if len(events) > 1000:  # 執行契約 7.2 容量限制
             raise MetaDAGError("BATCH_TOO_LARGE", f"Batch size ({len(events)}) exceeds 1000 event limit.")
 
@@ -190,13 +252,17 @@ class MemoryManager:
                 # 批次處理中遇到單個錯誤不應中斷整個批次，但應記錄並跳過
                 logger.error("Skipping malformed event in batch.")
                 continue
-        
-        # 3. 數據庫批量寫入 (In-memory Placeholder - 關鍵是使用 DB 的批量插入優化)
-        self._memory_store.extend(memory_cards)
-        
-        # 4. 觸發事件發送者 (通常批次寫入後，通知也會以批次或定期方式發送)
-        logger.info(f"Successfully processed batch of {len(memory_cards)} events.")
-        
+
+        # 3. 數據庫批量寫入（持久層：每個時間分區一次交易的 executemany）
+        if self._durable is not None:
+            self._durable.insert_many(memory_cards)
+        self._index.add_many(memory_cards)
+
+        # 4. 觸發事件發送者 (整批排入通知佇列，由背景 worker 合併送出)
+        self._notifier.publish_many(self._notification(card) for card in memory_cards)
+        if LOG_API_CALLS:
+            logger.info(f"Successfully processed batch of {len(memory_cards)} events.")
+
         return [card.event_id for card in memory_cards]
 
     @observe_performance("retrieve_relevant_memories")
@@ -204,26 +270,295 @@ class MemoryManager:
         """
         契約接口：結構化查詢，支持 keywords, event_types, time_range, severity。
         必須滿足 P95 < 100ms。
+        帶 keywords 時結果依 BM25 相關度排序，否則依寫入順序。
+        time_range 起點早於熱區間時，較早的一段由持久層依時間順序讀出：無 keywords 時排在索引結果之前，
+        有 keywords 時排在 BM25 結果之後（冷資料不在倒排索引內，不計分）。
         """
         # 查詢邏輯將嚴重依賴 TimescaleDB 的時間索引和 FTS 查詢。
-        # In-memory 實現僅為邏輯驗證的 Placeholder。
-        
+        # In-memory 實現：各條件走索引，候選數最小者先行交集（見 memory_index.py）
+
         # 根據契約 7.2 限制單次查詢結果
         limit = min(query.get("limit", 100), 100)
-        
-        # In-memory 模擬查詢
-        results = [card for card in self._memory_store if card.event_type in query.get("event_types", [card.event_type])]
-        
+
+        conditions = self._index_conditions(query)
+        slots = self._index.query(**conditions, limit=limit)
+        results = [self._memory_store[slot] for slot in slots]
+        cold = self._cold_cards(conditions)
+        if conditions["keywords"] is None:
+            results = [card for _, card in islice(cold, limit)] + results
+        elif len(results) < limit:
+            results += [card for _, card in islice(cold, limit - len(results))]
+
         if not results:
             raise MetaDAGError("MEMORY_NOT_FOUND", "No relevant memory found within the given time window.")
 
         # 返回結果必須轉換為字典格式，並解密 raw_data
-        # Placeholder: 實際應從 DB 獲取，並呼叫 self._decrypt_card(card)
-        return [card.__dict__ for card in results[:limit]]
+        return [self._decrypt_and_serialize(card) for card in results[:limit]]
+
+    @observe_performance("retrieve_memories_page")
+    def retrieve_memories_page(
+        self,
+        query: Dict[str, Any],
+        cursor: Optional[str] = None,
+        page_size: int = 100,
+        api_version: str = API_VERSION,
+    ) -> Dict[str, Any]:
+        """
+        分頁查詢：條件同 retrieve_relevant_memories（keywords 只做篩選，不做 BM25 排序），
+        結果依 (timestamp, event_id) 穩定排序。單頁仍受契約 7.2 的 100 筆上限。
+        回傳 {"items": [...], "next_cursor": str | None}；沒有結果時 items 為空、不拋 MEMORY_NOT_FOUND。
+        cursor 綁定查詢條件，換條件沿用舊 cursor 會拋 INVALID_CURSOR。
+        熱區間之前的 time_range 由持久層補上，與索引結果依同一排序合併。
+        """
+        if api_version != self.API_VERSION:
+            raise MetaDAGError("UNSUPPORTED_API_VERSION", f"API version {api_version} is not supported.")
+
+        page_size = max(1, min(page_size, 100))
+        fingerprint = self._query_fingerprint(query)
+        after = self._decode_cursor(cursor, fingerprint) if cursor else None
+
+        # 多取一筆判斷是否還有下一頁；項目為 (時間鍵, event_id, slot 或冷資料的 MemoryCard)
+        conditions = self._index_conditions(query)
+        slots = self._index.page(**conditions, after=after, limit=page_size + 1)
+        store = self._memory_store
+        entries: List[Tuple[float, str, Any]] = [(store.timestamps[slot], store.event_id(slot), slot) for slot in slots]
+        cold = [(ts, card.event_id, card) for ts, card in islice(self._cold_cards(conditions, after), page_size + 1)]
+        if cold:
+            entries = sorted(entries + cold, key=lambda e: (e[0], e[1]))
+        next_cursor = None
+        if len(entries) > page_size:
+            entries = entries[:page_size]
+            next_cursor = self._encode_cursor(entries[-1][0], entries[-1][1], fingerprint)
+        # 只序列化本頁
+        return {
+            "items": [self._decrypt_and_serialize(store[x] if isinstance(x, int) else x) for _, _, x in entries],
+            "next_cursor": next_cursor,
+        }
+
+    def iter_relevant_memories(self, query: Dict[str, Any], page_size: int = 100,
+                               api_version: str = API_VERSION) -> Iterator[Dict[str, Any]]:
+        """
+        串流所有符合條件的記憶（不受 100 筆上限）：逐頁向 retrieve_memories_page 取資料，
+        任一時刻只持有一頁的序列化結果。
+        """
+        cursor = None
+        while True:
+            page = self.retrieve_memories_page(query, cursor=cursor, page_size=page_size, api_version=api_version)
+            yield from page["items"]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return
+
+
+    @observe_performance("receive_feedback")
+    def receive_feedback(self, event_id: str, decision: str, notes: Dict[str, Any], api_version: str = API_VERSION) -> bool:
+        """
+        契約接口 2.3：接收 Meta-DAG 的治理決策反饋。
+        以 event_id 主鍵索引 O(1) 定位記憶卡並記錄決策；熱區間之外的卡片改由持久層定位。
+        """
+        if api_version != self.API_VERSION:
+            raise MetaDAGError("UNSUPPORTED_API_VERSION", f"API version {api_version} is not supported.")
+
+        slot = self._memory_store.slot_of(event_id)
+        if slot is None:
+            cold = self._locate_cold([event_id])
+            if not cold:
+                logger.warning(f"Feedback received for unknown event_id: {event_id}")
+                return False
+            self._durable.set_decisions([(event_id, cold[event_id], decision)])
+            logger.debug(f"Feedback received for cold {event_id}: {decision}")
+            return True
+
+        self._memory_store.set_decision(slot, decision)
+        if self._durable is not None:
+            self._durable.set_decisions([(event_id, self._memory_store.timestamps[slot], decision)])
+        logger.debug(f"Feedback received for {event_id}: {decision}")
+        return True
+
+    @observe_performance("receive_feedback_batch")
+    def receive_feedback_batch(self, feedback: List[Tuple[str, str]], api_version: str = API_VERSION) -> Dict[str, Any]:
+        """
+        批次套用治理決策：[(event_id, decision), ...]，容量限制同批次寫入（≤ 1000）。
+        未知的 event_id 不中斷批次，於結果中回報。
+        """
+        if api_version != self.API_VERSION:
+            raise MetaDAGError("UNSUPPORTED_API_VERSION", f"API version {api_version} is not supported.")
+
+        if len(feedback) > 1000:  # 執行契約 7.2 容量限制
+            raise MetaDAGError("BATCH_TOO_LARGE", f"Batch size ({len(feedback)}) exceeds 1000 event limit.")
+
+        store = self._memory_store
+        applied: List[Tuple[str, float, str]] = []
+        unknown: List[str] = []
+        for event_id, decision in feedback:
+            slot = store.slot_of(event_id)
+            if slot is None:
+                unknown.append(event_id)
+                continue
+            store.set_decision(slot, decision)
+            applied.append((event_id, store.timestamps[slot], decision))
+        if unknown:
+            cold = self._locate_cold(unknown)
+            applied += [(event_id, cold[event_id], decision) for event_id, decision in feedback if event_id in cold]
+            unknown = [event_id for event_id in unknown if event_id not in cold]
+        if self._durable is not None:
+            self._durable.set_decisions(applied)
+
+        if unknown:
+            logger.warning(f"Feedback batch: {len(unknown)} unknown event_id(s).")
+        return {"applied_count": len(applied), "unknown_count": len(unknown), "unknown_event_ids": unknown}
 
-    
     # --- 內部輔助方法 ---
-    
+
+    def flush_notifications(self, timeout: Optional[float] = None) -> bool:
+        """等待已排入的事件通知全部送出。"""
+        return self._notifier.flush(timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """送完剩餘通知並停止背景 worker；關閉持久層連線。"""
+        self._notifier.close(timeout)
+        if self._durable is not None:
+            self._durable.close()
+
+    def enforce_retention(self, now: Optional[datetime] = None) -> int:
+        """
+        丟棄超過保留期限的時間分區，並以新的熱區間由持久層重建記憶體索引（索引為 append-only）。
+        回傳被丟棄的分區數。
+        """
+        if self._durable is None:
+            return 0
+        dropped = self._durable.enforce_retention(now)
+        if dropped:
+            self._index = MemoryIndex(MemoryCard)
+            self._memory_store = self._index.cards
+            self._rehydrate(now)
+        return len(dropped)
+
+    def _rehydrate(self, now: Optional[datetime] = None):
+        """
+        依 (timestamp, event_id) 順序從持久層載入熱區間內的卡片與治理決策。
+        iter_range 只開啟與熱區間重疊的分區，較舊的分區檔不會被讀取。
+        """
+        if self._hot_days is not None:
+            self._loaded_since = timestamp_key((now or datetime.utcnow()) - timedelta(days=self._hot_days))
+        for card, decision in self._durable.iter_range(start_key=self._loaded_since):
+            slot = self._index.add(card)
+            if decision is not None:
+                self._memory_store.set_decision(slot, decision)
+
+    def _cold_cards(self, conditions: Dict[str, Any],
+                    after: Optional[Tuple[int, str]] = None) -> Iterator[Tuple[int, MemoryCard]]:
+        """
+        time_range 起點早於熱區間時，[起點, 熱區間起點) 的卡片由持久層依 (timestamp, event_id) 串流讀出
+        （只開啟與區間重疊的分區），套用與索引相同的條件；已在記憶體索引內的卡片（晚到事件）略過。
+        產生 (時間鍵, MemoryCard)；after 為分頁游標位置。
+        """
+        time_range = conditions["time_range"]
+        if self._durable is None or self._loaded_since is None or time_range is None:
+            return
+        start, end = time_range[0], min(time_range[1], self._loaded_since - 1)
+        if after is not None:
+            start = max(start, after[0])
+        if start > end:
+            return
+        event_types = None if conditions["event_types"] is None else set(conditions["event_types"])
+        severities = None if conditions["severities"] is None else set(conditions["severities"])
+        terms = None
+        if conditions["keywords"] is not None:
+            # 整串關鍵字也可能是冷資料的索引詞（熱區間的詞表裡沒有時，query_terms 會把它拆開）
+            keywords = conditions["keywords"]
+            terms = set(self._index.keywords.query_terms(keywords)) | {kw.lower() for kw in keywords}
+        store = self._memory_store
+        for card, _ in self._durable.iter_range(start, end):
+            if event_types is not None and card.event_type not in event_types:
+                continue
+            if severities is not None and card.severity not in severities:
+                continue
+            if terms is not None and terms.isdisjoint(card.indexed_keywords):
+                continue
+            ts = timestamp_key(card.timestamp)
+            if after is not None and (ts, card.event_id) <= after:
+                continue
+            if store.slot_of(card.event_id) is not None:
+                continue
+            yield ts, card
+
+    def _locate_cold(self, event_ids: List[str]) -> Dict[str, int]:
+        """不在記憶體索引內的 event_id → 持久層中的時間鍵（沒有持久層時為空）。"""
+        if self._durable is None:
+            return {}
+        return self._durable.locate(event_ids)
+
+    @staticmethod
+    def _notification(card: MemoryCard) -> Dict[str, Any]:
+        return {
+            "event_type": card.event_type,
+            "memory_id": card.event_id,
+            "context": {"description": card.description, "dag_hash": card.dag_hash},
+        }
+
+    @staticmethod
+    def _query_fingerprint(query: Dict[str, Any]) -> str:
+        conditions = {k: v for k, v in query.items() if k != "limit"}
+        raw = json.dumps(conditions, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _encode_cursor(ts_key: float, event_id: str, fingerprint: str) -> str:
+        raw = json.dumps({"ts": int(ts_key), "id": event_id, "q": fingerprint}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor: str, fingerprint: str) -> Tuple[int, str]:
+        """continuation token → (時間鍵, event_id)；格式錯誤或查詢條件不符拋 INVALID_CURSOR。"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            ts_key, event_id, query_fp = int(data["ts"]), str(data["id"]), data["q"]
+        except (ValueError, TypeError, KeyError, UnicodeError) as e:
+            raise MetaDAGError("INVALID_CURSOR", f"Malformed cursor: {e}") from e
+        if query_fp != fingerprint:
+            raise MetaDAGError("INVALID_CURSOR", "Cursor was issued for a different query.")
+        return ts_key, event_id
+
+    def _index_conditions(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        內部方法：查詢條件 → MemoryIndex.query / page 的篩選參數。
+        severity 可為字串或清單；空的 severity / keywords 視為不篩選。
+        """
+        severity = query.get("severity")
+        if isinstance(severity, str):
+            severity = [severity]
+        return {
+            "event_types": query.get("event_types"),
+            "severities": severity or None,
+            "time_range": self._parse_time_range(query.get("time_range")),
+            "keywords": query.get("keywords") or None,
+        }
+
+    def _parse_time_range(self, time_range: Optional[Dict[str, Any]]) -> Optional[Tuple[int, int]]:
+        """
+        內部方法：{"start": ISO, "end": ISO} → 索引用時間鍵區間（含端點）。
+        任一端缺省視為不設限。
+        """
+        if not time_range:
+            return None
+        try:
+            bounds = []
+            for name, default in (("start", datetime.min), ("end", datetime.max)):
+                value = time_range.get(name)
+                if value is None:
+                    value = default
+                elif isinstance(value, str):
+                    value = datetime.fromisoformat(value)
+                bounds.append(timestamp_key(value))
+        except (AttributeError, TypeError, ValueError, OverflowError) as e:
+            raise MetaDAGError("INVALID_TIME_WINDOW", f"Invalid time_range: {e}", {"time_range": str(time_range)}) from e
+
+        if bounds[0] > bounds[1]:
+            raise MetaDAGError("INVALID_TIME_WINDOW", "time_range start is after end.", {"time_range": str(time_range)})
+        return bounds[0], bounds[1]
+
     def _create_and_encrypt_card(self, event_data: Dict[str, Any]) -> MemoryCard:
         """
         內部方法：創建 MemoryCard 並對 raw_data 進行加密。
@@ -232,11 +567,11 @@ class MemoryManager:
         required_fields = ["event_type", "severity", "description"]
         if not all(field in event_data for field in required_fields):
              raise MetaDAGError("INVALID_EVENT_FORMAT", "Missing required fields in event data.")
-        
+
         raw_data = event_data.get('raw_data', {})
         ciphertext = None
         key_id = None
-        
+
         if raw_data:
             # 2. 加密邏輯 (模擬 AES-256-GCM - 契約第 4 章)
             key_id = "key_2025_12"  # 應來自 KMS
@@ -246,7 +581,7 @@ class MemoryManager:
 
         # 3. 提取索引關鍵字
         indexed_keywords = self._extract_keywords(event_data.get('description', ''), raw_data)
-        
+
         return MemoryCard(
             api_version=self.API_VERSION,
             event_type=event_data['event_type'],
@@ -258,16 +593,23 @@ class MemoryManager:
             indexed_keywords=indexed_keywords
         )
 
+    def _decrypt_and_serialize(self, card: MemoryCard) -> Dict[str, Any]:
+        """
+        內部方法：MemoryCard → 回傳用字典（每筆獨立的 dict）。
+        密文目前為模擬值（見 _create_and_encrypt_card），待接上 KMS 後在此解密 raw_data。
+        """
+        return dict(card.__dict__)
+
     def _extract_keywords(self, description: str, raw_data: Dict[str, Any]) -> List[str]:
         """
         內部方法：從數據中提取用於快速查詢的關鍵字。
-        (生產環境中會使用更複雜的 NLP 技術)
+        CJK 取字元 bigram、其他文字取小寫單詞（見 keyword_index.tokenize），依出現順序去重。
         """
-        keywords = set(description.lower().split())
+        keywords = dict.fromkeys(tokenize(description))
         if 'tul_marker' in raw_data:
-            keywords.add(raw_data['tul_marker'])
+            keywords[str(raw_data['tul_marker']).lower()] = None
         # 移除通用詞彙
-        return list(keywords - {'a', 'the', 'is', 'in', 'of', 'and', 'or', 'to', 'from'})
+        return [kw for kw in keywords if kw not in STOPWORDS]
 
     def _standardize_error(self, e: Exception) -> MetaDAGError:
         """
@@ -276,285 +618,9 @@ class MemoryManager:
         if isinstance(e, MetaDAGError):
             # 已經是標準錯誤，直接返回
             return e
-        
+
         if "BATCH_TOO_LARGE" in str(e):
             return MetaDAGError("BATCH_TOO_LARGE", "Batch size exceeds contract limit.", {"limit": 1000})
-        
+
         # 默認的內部錯誤處理
         return MetaDAGError("INTERNAL_ERROR", "An unhandled internal error occurred.", {"exception": type(e).__name__})
-
-
-
-# 🎯 **分類建議!**
-
----
-
-## 📋 **建議分類:**
-
-### **🔴 必須「現在」改 (會導致契約不符)**
-
-```python
-# 1. 完整查詢邏輯 (契約要求,現在缺失)
-# 位置: retrieve_relevant_memories()
-
-def retrieve_relevant_memories(self, query: Dict[str, Any], api_version: str = API_VERSION) -> List[Dict[str, Any]]:
-    """
-    TODO (CRITICAL): 補完契約要求的查詢邏輯
-    - [ ] time_range 篩選
-    - [ ] severity 篩選  
-    - [ ] keywords 篩選
-    當前只實作了 event_types 查詢
-    """
-    # 現有代碼...
-    
-    # TODO: 加入以下篩選邏輯
-    # time_range = query.get("time_range")
-    # if time_range:
-    #     start = datetime.fromisoformat(time_range["start"])
-    #     end = datetime.fromisoformat(time_range["end"])
-    #     results = [card for card in results if start <= card.timestamp <= end]
-    
-    # severity_filter = query.get("severity")
-    # if severity_filter:
-    #     results = [card for card in results if card.severity in severity_filter]
-    
-    # keywords = query.get("keywords", [])
-    # if keywords:
-    #     results = [card for card in results if any(kw.lower() in card.indexed_keywords for kw in keywords)]
-```
-
-```python
-# 2. 解密邏輯 (契約要求返回解密數據)
-# 位置: retrieve_relevant_memories()
-
-def retrieve_relevant_memories(self, query: Dict[str, Any], api_version: str = API_VERSION) -> List[Dict[str, Any]]:
-    """
-    TODO (CRITICAL): 返回解密後的數據
-    當前返回 card.__dict__ 包含加密的 ciphertext
-    契約要求返回解密的 raw_data
-    """
-    # return [card.__dict__ for card in results[:limit]]  # 舊代碼
-    return [self._decrypt_and_serialize(card) for card in results[:limit]]  # 新代碼
-
-# TODO: 實作 _decrypt_and_serialize() 方法
-def _decrypt_and_serialize(self, card: MemoryCard) -> Dict[str, Any]:
-    """將 MemoryCard 轉為字典並解密敏感數據"""
-    result = {
-        "event_id": card.event_id,
-        "timestamp": card.timestamp.isoformat(),
-        "event_type": card.event_type,
-        "severity": card.severity,
-        "description": card.description,
-        "dag_hash": card.dag_hash,
-        "api_version": card.api_version
-    }
-    
-    if card.is_encrypted:
-        # TODO: 實作真實解密 (現在先模擬)
-        # decrypted = self._decrypt_data(card.encrypted_data_ciphertext, card.encrypted_data_key_id)
-        result['raw_data'] = {"SIMULATED": "decrypted_data"}
-    
-    return result
-```
-
-```python
-# 3. 實作 IGovernanceFeedbackReceiver (契約要求)
-# 位置: MemoryManager 類定義
-
-class MemoryManager(IGovernanceFeedbackReceiver):  # 加上繼承
-    """
-    TODO (CRITICAL): 實作 receive_feedback 介面
-    契約 2.3 要求記憶模組能接收治理決策反饋
-    """
-    
-    @observe_performance("receive_feedback")
-    def receive_feedback(self, event_id: str, decision: str, notes: Dict[str, Any], api_version: str = "1.0") -> bool:
-        """接收 Meta-DAG 的治理決策反饋 (契約 2.3)"""
-        if api_version != self.API_VERSION:
-            raise MetaDAGError("UNSUPPORTED_API_VERSION", f"API version {api_version} is not supported.")
-        
-        # 找到對應記憶卡
-        card = next((c for c in self._memory_store if c.event_id == event_id), None)
-        if not card:
-            logger.warning(f"Feedback received for unknown event_id: {event_id}")
-            return False
-        
-        logger.info(f"✓ Feedback received for {event_id}: {decision}")
-        
-        # TODO: 實際生產環境應更新 DB 中的記憶狀態
-        # TODO: 可選擇性地將反饋記錄為新事件
-        
-        return True
-```
-
----
-
-### **🟡 應該「盡快」改 (影響功能品質)**
-
-```python
-# 4. 批次處理返回失敗資訊
-# 位置: log_system_events_batch()
-
-def log_system_events_batch(self, events: List[Dict[str, Any]], api_version: str = API_VERSION) -> Dict[str, Any]:
-    """
-    TODO (HIGH): 返回詳細的批次處理結果
-    當前只返回成功的 event_ids
-    應該告知哪些事件失敗及原因
-    """
-    # ...現有代碼...
-    
-    memory_cards: List[MemoryCard] = []
-    failed_events: List[Dict[str, Any]] = []  # 新增
-    
-    for i, event in enumerate(events):
-        try:
-            card = self._create_and_encrypt_card(event)
-            memory_cards.append(card)
-        except MetaDAGError as e:
-            logger.error(f"Skipping malformed event at index {i}")
-            failed_events.append({"index": i, "error": e.error_code, "message": e.message})  # 新增
-            continue
-    
-    self._memory_store.extend(memory_cards)
-    logger.info(f"Successfully processed batch: {len(memory_cards)} success, {len(failed_events)} failed.")
-    
-    # 返回詳細結果
-    return {
-        "success_ids": [card.event_id for card in memory_cards],
-        "success_count": len(memory_cards),
-        "failed_count": len(failed_events),
-        "failed_events": failed_events  # 新增
-    }
-```
-
-```python
-# 5. 查詢效能優化 (索引)
-# 位置: MemoryManager __init__
-
-def __init__(self, event_sender: INarrativeEventSender):
-    """
-    TODO (HIGH): 加入索引以提升查詢效能
-    當前 retrieve_relevant_memories 使用全掃描
-    """
-    self._event_sender = event_sender
-    self._memory_store: List[MemoryCard] = []
-    
-    # TODO: 建立索引 (TimescaleDB 前的臨時優化)
-    self._event_type_index: Dict[str, List[MemoryCard]] = defaultdict(list)
-    self._severity_index: Dict[str, List[MemoryCard]] = defaultdict(list)
-    
-    logger.info("MemoryManager initialized with in-memory indexes.")
-
-# TODO: 在 log_system_event 和 log_system_events_batch 中更新索引
-def _update_indexes(self, card: MemoryCard):
-    """更新所有索引"""
-    self._event_type_index[card.event_type].append(card)
-    self._severity_index[card.severity].append(card)
-```
-
----
-
-### **🟢 可以「之後」改 (優化項)**
-
-```python
-# 6. MetaDAGError 加 to_dict()
-# 位置: MetaDAGError 類
-
-class MetaDAGError(Exception):
-    """TODO (LOW): 加 to_dict() 方法便於序列化"""
-    def __init__(self, error_code: str, message: str, detail: Optional[Dict] = None):
-        self.error_code = error_code
-        self.message = message
-        self.detail = detail or {}
-        super().__init__(message)
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """返回契約第 5 章定義的標準錯誤格式"""
-        return {
-            "success": False,
-            "error": {
-                "code": self.error_code,
-                "message": self.message,
-                "detail": self.detail,
-                "api_version": "1.0"
-            }
-        }
-```
-
-```python
-# 7. MemoryCard 加工廠方法
-# 位置: MemoryCard 類
-
-@dataclass(frozen=True)
-class MemoryCard:
-    """TODO (LOW): 加 from_dict() 工廠方法便於反序列化"""
-    # ...現有欄位...
-    
-    @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'MemoryCard':
-        """從字典創建 MemoryCard (用於 DB 讀取)"""
-        # 處理日期時間轉換
-        if isinstance(data.get('timestamp'), str):
-            data['timestamp'] = datetime.fromisoformat(data['timestamp'])
-        return cls(**data)
-```
-
-```python
-# 8. 效能警告閾值
-# 位置: observe_performance 裝飾器
-
-def observe_performance(metric_name: str):
-    """TODO (LOW): 加效能警告閾值 (契約 7.1)"""
-    # 定義 P95 閾值
-    THRESHOLDS = {
-        "log_system_event": 50,        # ms
-        "log_system_events_batch": 200, # ms
-        "retrieve_relevant_memories": 100 # ms
-    }
-    
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(self, *args, **kwargs):
-            start_time = time.perf_counter()
-            # ...現有代碼...
-            
-            try:
-                result = func(self, *args, **kwargs)
-                duration = (time.perf_counter() - start_time) * 1000
-                
-                # 檢查是否超過閾值
-                threshold = THRESHOLDS.get(metric_name, 1000)
-                if duration > threshold:
-                    logger.warning(f"⚠️ Performance Alert: {func.__name__} took {duration:.2f}ms (threshold: {threshold}ms)")
-                
-                logger.info(f"API Success: {func.__name__}", extra={"duration_ms": duration})
-                return result
-            # ...
-```
-
-```python
-# 9. 真實加密實作
-# 位置: _create_and_encrypt_card()
-
-def _encrypt_data(self, data: Dict[str, Any], key_id: str) -> bytes:
-    """
-    TODO (LOW): 實作真實 AES-256-GCM 加密 (契約第 4 章)
-    需要:
-    - from cryptography.fernet import Fernet
-    - 整合 KMS 密鑰管理
-    """
-    # key = self._get_key_from_kms(key_id)
-    # f = Fernet(key)
-    # return f.encrypt(json.dumps(data).encode())
-    pass
-
-def _decrypt_data(self, ciphertext: bytes, key_id: str) -> str:
-    """解密數據"""
-    # key = self._get_key_from_kms(key_id)
-    # f = Fernet(key)
-    # return f.decrypt(ciphertext).decode()
-    pass
-```
-
----
-
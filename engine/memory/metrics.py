@@ -0,0 +1,264 @@
+# engine/memory/metrics.py
+# ======================================================
+# In-process 指標註冊表（契約第 8 章：可觀測性）
+# - 每個 API 一個延遲直方圖（HDR 式 log-linear 桶，微秒，相對誤差 ≤ 1/32）
+# - 計數器：呼叫數、錯誤數（依錯誤碼）、結果筆數、SLO 超標次數
+# - 匯出：snapshot() dict / JSON / Prometheus text format
+# - 熱路徑只做一次桶索引計算 + 鎖內整數累加
+# ======================================================
+
+import json
+import threading
+from array import array
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# 每個 2 的冪次區間切成 32 個線性子桶；< 64 的值各自一桶（精確）
+_SUB_BITS = 5
+_SUB_COUNT = 1 << _SUB_BITS          # 32
+_LINEAR_LIMIT = _SUB_COUNT * 2       # 64
+_MAX_EXPONENT = 40                   # 2^46 µs ≈ 2.2 年，超過則落在最後一桶
+_BUCKETS = _LINEAR_LIMIT + _MAX_EXPONENT * _SUB_COUNT
+
+# Prometheus 匯出用的累積桶上界（毫秒）
+PROMETHEUS_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 200, 500, 1000, 2500, 5000)
+
+
+def _bucket_index(value: int) -> int:
+    if value < _LINEAR_LIMIT:
+        return max(0, value)
+    exponent = value.bit_length() - (_SUB_BITS + 1)
+    if exponent > _MAX_EXPONENT:
+        return _BUCKETS - 1
+    return _LINEAR_LIMIT + (exponent - 1) * _SUB_COUNT + ((value >> exponent) - _SUB_COUNT)
+
+
+def _bucket_bounds(index: int) -> Tuple[int, int]:
+    """桶 index 涵蓋的整數區間 [low, high]。"""
+    if index < _LINEAR_LIMIT:
+        return index, index
+    exponent = (index - _LINEAR_LIMIT) // _SUB_COUNT + 1
+    mantissa = (index - _LINEAR_LIMIT) % _SUB_COUNT + _SUB_COUNT
+    return mantissa << exponent, ((mantissa + 1) << exponent) - 1
+
+
+class Histogram:
+    """
+    log-linear 直方圖：記錄非負整數（延遲以微秒、筆數以個數）。
+    lock 可由呼叫端共用（同一 API 的多個直方圖 + 計數器只取一次鎖）。
+    """
+
+    __slots__ = ("_counts", "_lock", "count", "total", "max")
+
+    def __init__(self, lock: Optional[threading.Lock] = None):
+        self._counts = array("Q", bytes(8 * _BUCKETS))
+        self._lock = lock or threading.Lock()
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int):
+        with self._lock:
+            self._add(value)
+
+    def _add(self, value: int):
+        """呼叫端須已持有 lock。"""
+        self._counts[_bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram"):
+        """併入另一個直方圖（例如其他執行緒 / worker 的結果）。"""
+        state = other.to_state()  # 先在 other 的鎖下取快照，兩者共用同一把鎖也不會死結
+        with self._lock:
+            self._add_state(state)
+
+    def to_state(self) -> Dict[str, Any]:
+        """可 pickle / JSON 化的快照：{"counts": [...], "count", "total", "max"}。"""
+        with self._lock:
+            return {"counts": self._counts.tolist(), "count": self.count, "total": self.total, "max": self.max}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], lock: Optional[threading.Lock] = None) -> "Histogram":
+        """由 to_state() 的快照重建。"""
+        hist = cls(lock)
+        hist._add_state(state)
+        return hist
+
+    def _add_state(self, state: Dict[str, Any]):
+        """呼叫端須已持有 lock。"""
+        counts = state["counts"]
+        if len(counts) != _BUCKETS:
+            raise ValueError(f"histogram state has {len(counts)} buckets, expected {_BUCKETS}")
+        for index, c in enumerate(counts):
+            if c:
+                self._counts[index] += c
+        self.count += state["count"]
+        self.total += state["total"]
+        self.max = max(self.max, state["max"])
+
+    def percentiles(self, quantiles: Iterable[float]) -> Dict[float, int]:
+        """各分位數的「等價最大值」（所在桶上界，不超過實際最大值）。"""
+        with self._lock:
+            counts = self._counts.tolist()
+            total, vmax = self.count, self.max
+        wanted = sorted(quantiles)
+        out: Dict[float, int] = {}
+        if total == 0:
+            return {q: 0 for q in wanted}
+        seen = 0
+        qi = 0
+        for index, c in enumerate(counts):
+            if not c:
+                continue
+            seen += c
+            while qi < len(wanted) and seen >= wanted[qi] * total:
+                out[wanted[qi]] = min(_bucket_bounds(index)[1], vmax)
+                qi += 1
+            if qi == len(wanted):
+                break
+        for q in wanted[qi:]:
+            out[q] = vmax
+        return out
+
+    def cumulative(self, upper_bounds: Iterable[int]) -> Dict[int, int]:
+        """上界 ≤ bound 的桶累積筆數（Prometheus le 語義，以桶為粒度）。"""
+        with self._lock:
+            counts = self._counts.tolist()
+        out: Dict[int, int] = {}
+        index = 0
+        running = 0
+        for bound in sorted(upper_bounds):
+            while index < _BUCKETS and _bucket_bounds(index)[1] <= bound:
+                running += counts[index]
+                index += 1
+            out[bound] = running
+        return out
+
+
+class ApiMetrics:
+    """單一 API 的指標。"""
+
+    __slots__ = ("name", "slo_ms", "latency_us", "result_size", "calls", "slo_breaches", "errors", "_lock")
+
+    def __init__(self, name: str, slo_ms: Optional[float]):
+        self.name = name
+        self.slo_ms = slo_ms
+        self._lock = threading.Lock()
+        self.latency_us = Histogram(self._lock)
+        self.result_size = Histogram(self._lock)
+        self.calls = 0
+        self.slo_breaches = 0
+        self.errors: Dict[str, int] = {}
+
+    def observe(self, duration_ms: float, result_size: Optional[int] = None, error_code: Optional[str] = None):
+        breached = self.slo_ms is not None and duration_ms > self.slo_ms
+        with self._lock:
+            self.latency_us._add(int(duration_ms * 1000))
+            if result_size is not None:
+                self.result_size._add(result_size)
+            self.calls += 1
+            if breached:
+                self.slo_breaches += 1
+            if error_code is not None:
+                self.errors[error_code] = self.errors.get(error_code, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        p = self.latency_us.percentiles((0.5, 0.95, 0.99))
+        sizes = self.result_size
+        with self._lock:
+            errors = dict(self.errors)
+            calls, breaches = self.calls, self.slo_breaches
+        p95_ms = p[0.95] / 1000
+        return {
+            "calls": calls,
+            "errors": errors,
+            "error_count": sum(errors.values()),
+            "latency_ms": {
+                "p50": p[0.5] / 1000,
+                "p95": p95_ms,
+                "p99": p[0.99] / 1000,
+                "max": self.latency_us.max / 1000,
+                "mean": round(self.latency_us.total / self.latency_us.count / 1000, 3) if self.latency_us.count else 0.0,
+            },
+            "result_size": {
+                "total": sizes.total,
+                "p50": sizes.percentiles((0.5,))[0.5],
+                "max": sizes.max,
+            },
+            "slo": {
+                "p95_target_ms": self.slo_ms,
+                "breaches": breaches,
+                "p95_ok": None if self.slo_ms is None or not calls else p95_ms <= self.slo_ms,
+            },
+        }
+
+
+class MetricsRegistry:
+    """
+    API 名稱 → ApiMetrics。
+    slo_ms：{api: P95 目標毫秒}，單次呼叫超過目標即計入 slo breaches。
+    """
+
+    def __init__(self, slo_ms: Optional[Dict[str, float]] = None, namespace: str = "memory_api"):
+        self.slo_ms = dict(slo_ms or {})
+        self.namespace = namespace
+        self._apis: Dict[str, ApiMetrics] = {}
+        self._lock = threading.Lock()
+
+    def api(self, name: str) -> ApiMetrics:
+        metrics = self._apis.get(name)
+        if metrics is None:
+            with self._lock:
+                metrics = self._apis.get(name)
+                if metrics is None:
+                    metrics = self._apis[name] = ApiMetrics(name, self.slo_ms.get(name))
+        return metrics
+
+    def observe(self, name: str, duration_ms: float, result_size: Optional[int] = None, error_code: Optional[str] = None):
+        self.api(name).observe(duration_ms, result_size, error_code)
+
+    # ---------- 匯出 ----------
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: m.snapshot() for name, m in sorted(self._apis.items())}
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent, ensure_ascii=False)
+
+    def to_prometheus(self) -> str:
+        ns = self.namespace
+        bounds_us = [int(b * 1000) for b in PROMETHEUS_BUCKETS_MS]
+        lines = [
+            f"# HELP {ns}_duration_ms API latency in milliseconds.",
+            f"# TYPE {ns}_duration_ms histogram",
+        ]
+        for name, m in sorted(self._apis.items()):
+            hist = m.latency_us
+            cumulative = hist.cumulative(bounds_us)
+            for bound_ms, bound_us in zip(PROMETHEUS_BUCKETS_MS, bounds_us):
+                lines.append(f'{ns}_duration_ms_bucket{{api="{name}",le="{bound_ms}"}} {cumulative[bound_us]}')
+            lines.append(f'{ns}_duration_ms_bucket{{api="{name}",le="+Inf"}} {hist.count}')
+            lines.append(f'{ns}_duration_ms_sum{{api="{name}"}} {hist.total / 1000}')
+            lines.append(f'{ns}_duration_ms_count{{api="{name}"}} {hist.count}')
+
+        counters = (
+            ("calls_total", "API calls.", lambda m: [((), m.calls)]),
+            ("errors_total", "API errors by error code.",
+             lambda m: [((("code", code),), n) for code, n in sorted(m.errors.items())]),
+            ("slo_breaches_total", "Calls slower than the API's P95 target.", lambda m: [((), m.slo_breaches)]),
+            ("result_items_total", "Items returned or written.", lambda m: [((), m.result_size.total)]),
+        )
+        for suffix, help_text, samples in counters:
+            lines.append(f"# HELP {ns}_{suffix} {help_text}")
+            lines.append(f"# TYPE {ns}_{suffix} counter")
+            for name, m in sorted(self._apis.items()):
+                for labels, value in samples(m):
+                    label_text = "".join(f',{k}="{v}"' for k, v in labels)
+                    lines.append(f'{ns}_{suffix}{{api="{name}"{label_text}}} {value}')
+
+        lines.append(f"# HELP {ns}_p95_ms Current P95 latency estimate in milliseconds.")
+        lines.append(f"# TYPE {ns}_p95_ms gauge")
+        for name, m in sorted(self._apis.items()):
+            lines.append(f'{ns}_p95_ms{{api="{name}"}} {m.latency_us.percentiles((0.95,))[0.95] / 1000}')
+        return "\n".join(lines) + "\n"
@@ -5,6 +5,12 @@ import os
 from typing import Dict, Any, List
 from pathlib import Path
 
+try:
+    from engine.chain_verifier import ChainIntegrityError, record_checkpoints
+except ImportError:
+    # 以 engine/ 為工作目錄的扁平匯入（phase4_collab / demo_phase2）
+    from chain_verifier import ChainIntegrityError, record_checkpoints
+
 # ===============================
 # 路徑設定（符合你的新結構）
 # /meta_dag_engine/
@@ -86,6 +92,15 @@ def append_node(tul_input: Dict[str, Any], l_alpha_verdict: Dict[str, Any], pra_
     memory_nodes.append(new_node)
     save_memory_store(memory_nodes)
 
+    # 每 CHECKPOINT_INTERVAL 個節點補一個簽章檢查點（見 chain_verifier.py）；
+    # 既有節點驗證失敗時不簽章，節點照常寫入但回報問題
+    try:
+        record_checkpoints(memory_nodes)
+    except ChainIntegrityError as e:
+        print(f"[CHAIN WARNING] {e}")
+        for err in e.errors[:5]:
+            print(f"  ! 位置 {err['position']} {err['node_id'] or ''}: {err['reason']}")
+
     # 自動寫入 VETO 索引
     if l_alpha_verdict.get("Decision_Status") == "REJECTED_HARD_VETO":
         veto_log(node_id)
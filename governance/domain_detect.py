@@ -1,9 +1,10 @@
 # governance/domain_detect.py
 
-import re
+from governance.policy_tables import compile_domain_matcher, get_policy
 
 # ================================
 # 危險 / 風險語料清單
+# （內建預設值；正式規則以 governance_rules.json 的 domains 區段為準）
 # ================================
 
 # 高風險心理 / 自傷傾向
@@ -71,14 +72,18 @@ META_DAG_PATTERNS = [
     r"t\.?u\.?l",  # ex: T.U.L / tul
 ]
 
-# ================================
-# utils
-# ================================
-def _match_any(text: str, patterns) -> bool:
-    for p in patterns:
-        if re.search(p, text, flags=re.IGNORECASE):
-            return True
-    return False
+# 風險優先順序：先高風險 → 後其他分類
+DOMAIN_PRIORITY = [
+    ("MANIPULATION_COERCION", MANIPULATION_PATTERNS),
+    ("MENTAL_HEALTH_CRISIS", MH_CRISIS_PATTERNS),
+    ("SAFETY", SAFETY_PATTERNS),
+    ("BLAME_TRANSFER", BLAME_PATTERNS),
+    ("MENTAL_HEALTH", MH_GENERAL_PATTERNS),
+    ("META_DAG", META_DAG_PATTERNS),
+    ("RELATIONSHIP", RELATION_PATTERNS),
+]
+
+_DEFAULT_MATCHER = compile_domain_matcher(DOMAIN_PRIORITY)
 
 # ================================
 # Domain 決策邏輯
@@ -88,20 +93,5 @@ def detect_domain(text: str) -> str:
     if not t:
         return "GENERAL"
 
-    # 風險優先順序：先高風險 → 後其他分類
-    if _match_any(t, MANIPULATION_PATTERNS):
-        return "MANIPULATION_COERCION"
-    if _match_any(t, MH_CRISIS_PATTERNS):
-        return "MENTAL_HEALTH_CRISIS"
-    if _match_any(t, SAFETY_PATTERNS):
-        return "SAFETY"
-    if _match_any(t, BLAME_PATTERNS):
-        return "BLAME_TRANSFER"
-    if _match_any(t, MH_GENERAL_PATTERNS):
-        return "MENTAL_HEALTH"
-    if _match_any(t, META_DAG_PATTERNS):
-        return "META_DAG"
-    if _match_any(t, RELATION_PATTERNS):
-        return "RELATIONSHIP"
-
-    return "GENERAL"
+    matcher = get_policy().domains or _DEFAULT_MATCHER
+    return matcher.detect(t) or "GENERAL"
@@ -11,6 +11,8 @@ import time
 from pathlib import Path
 from typing import Dict, Any, List
 
+from governance.policy_tables import DriftWeights, get_policy
+
 # === 路徑設定 ===
 BASE_DIR = Path(__file__).resolve().parents[1]
 STATE_DIR = BASE_DIR / "state"
@@ -18,6 +20,39 @@ DRIFT_LOG_FILE = STATE_DIR / "drift_log.json"
 
 STATE_DIR.mkdir(parents=True, exist_ok=True)
 
+# === 內建預設權重（governance_rules.json 的 drift_weights 區段缺失時使用） ===
+RISK_WEIGHT = {
+    "LOW": 0.00,
+    "MEDIUM": 0.10,
+    "HIGH": 0.20,
+    "CRITICAL": 0.30,
+    "UNKNOWN": 0.15,
+}
+
+CODE_WEIGHT = {
+    "A": 0.00,  # 正常行為
+    "S": 0.05,  # 系統 / 治理
+    "R": 0.10,  # 重複
+    "N": 0.20,  # Noise
+    "I": 0.20,  # Ill-formed
+    "F": 0.25,  # Fail
+    "V": 0.30,  # Veto Trace
+    "E": 0.30,  # External Failure
+}
+
+_DEFAULT_WEIGHTS = DriftWeights(
+    pec_empty=0.20,
+    pec_overflow=0.15,
+    pec_overflow_len=3,
+    risk_level=RISK_WEIGHT,
+    risk_level_default=0.15,
+    decision_veto=0.30,
+    decision_rejected=0.15,
+    classification_code=CODE_WEIGHT,
+    classification_code_default=0.10,
+    anomaly_threshold=0.6,
+)
+
 
 # === 基本 I/O ===
 def _load_drift_log() -> List[Dict[str, Any]]:
@@ -54,6 +89,8 @@ def compute_semantic_drift(
     decision_status = verdict_struct.get("Decision_Status", "UNKNOWN")
     cls_code = classifier_result.get("Code", "A")
 
+    w = get_policy().drift_weights or _DEFAULT_WEIGHTS
+
     score = 0.0
     detail: Dict[str, Any] = {}
 
@@ -63,41 +100,24 @@ def compute_semantic_drift(
     detail["pec_list"] = inferred_pec
 
     if pec_len == 0:
-        score += 0.20  # 完全沒 PEC → 有點怪
-    elif pec_len > 3:
-        score += 0.15  # 過度複雜 → 也怪
+        score += w.pec_empty  # 完全沒 PEC → 有點怪
+    elif pec_len > w.pec_overflow_len:
+        score += w.pec_overflow  # 過度複雜 → 也怪
 
     # 2) Risk Level（視為粗略熵）
-    risk_weight = {
-        "LOW": 0.00,
-        "MEDIUM": 0.10,
-        "HIGH": 0.20,
-        "CRITICAL": 0.30,
-        "UNKNOWN": 0.15,
-    }
-    score += risk_weight.get(risk_level, 0.15)
+    score += w.risk_level.get(risk_level, w.risk_level_default)
     detail["risk_level"] = risk_level
 
     # 3) Decision Status（VETO / External Failure 特別加權）
     veto_like = {"REJECTED_HARD_VETO", "REJECTED_PEC6_EXTERNAL_FAILURE"}
     if decision_status in veto_like:
-        score += 0.30
+        score += w.decision_veto
     elif decision_status.startswith("REJECTED_"):
-        score += 0.15
+        score += w.decision_rejected
     detail["decision_status"] = decision_status
 
     # 4) C-B 類別（N/F/I/V/E 視為高漂移）
-    code_weight = {
-        "A": 0.00,  # 正常行為
-        "S": 0.05,  # 系統 / 治理
-        "R": 0.10,  # 重複
-        "N": 0.20,  # Noise
-        "I": 0.20,  # Ill-formed
-        "F": 0.25,  # Fail
-        "V": 0.30,  # Veto Trace
-        "E": 0.30,  # External Failure
-    }
-    score += code_weight.get(cls_code, 0.10)
+    score += w.classification_code.get(cls_code, w.classification_code_default)
     detail["classification_code"] = cls_code
     detail["classification_type"] = classifier_result.get("Type")
     detail["classification_reason"] = classifier_result.get("Reason")
@@ -112,7 +132,7 @@ def compute_semantic_drift(
     entry = {
         "timestamp": time.time(),
         "Semantic_Drift_Score": round(score, 3),
-        "Anomaly_Flag": score >= 0.6,  # 閾值暫定 0.6，可日後調整
+        "Anomaly_Flag": score >= w.anomaly_threshold,  # 預設 0.6，見 drift_weights
         "tul_P": tul_struct.get("P"),
         "tul_T": tul_struct.get("T"),
         "node_meta": {
@@ -0,0 +1,85 @@
+# governance/fast_path.py
+# ======================================================
+# Pre-Admission Fast Path（入口快速通道）
+# - 在 TUL 翻譯 / 日誌 / L(α) 仲裁 / PRA 寫入之前執行
+# - Noise（攻擊垃圾輸入）與危機模板輸入直接給出判決與回應
+# - 其餘輸入回傳 None → 走完整治理管線
+# - 每次攔截只追加一行精簡審計紀錄（JSONL，不重寫整檔）
+# ======================================================
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from governance.domain_answers import CRISIS_TEMPLATE, GENERAL_TEMPLATE, is_mental_health_crisis
+from governance.domain_detect import detect_domain
+from governance.governance_classifier import CLASSIFICATION_CODES, is_noise
+
+# === 路徑設定 ===
+BASE_DIR = Path(__file__).resolve().parents[1]
+STATE_DIR = BASE_DIR / "state"
+FAST_PATH_LOG_FILE = STATE_DIR / "fast_path_log.jsonl"
+
+STATE_DIR.mkdir(parents=True, exist_ok=True)
+
+NOISE_STATUS = "REJECTED_NOISE"
+CRISIS_STATUS = "REDIRECTED_CRISIS_TEMPLATE"
+
+
+def _append_audit(record: Dict[str, Any]) -> None:
+    """精簡審計：只記錄雜湊與長度，不保存原文。"""
+    with open(FAST_PATH_LOG_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+def pre_admission(nl_input: str, source: str = "cli") -> Optional[Dict[str, Any]]:
+    """
+    入口預分類：
+    - Noise → N，回應 GENERAL_TEMPLATE
+    - 危機語句（與 domain_answers.answer 相同判準）→ 危機模板
+    - 其他 → None（交給完整管線）
+    """
+    text = (nl_input or "").strip()
+    if not text:
+        return None
+
+    if is_noise(text):
+        result = {
+            "Fast_Path": "NOISE",
+            "Decision_Status": NOISE_STATUS,
+            "Code": "N",
+            "Type": CLASSIFICATION_CODES["N"],
+            "Reason": "Pre-admission: non-semantic noise, full pipeline skipped.",
+            "response": GENERAL_TEMPLATE,
+        }
+    elif is_mental_health_crisis(text) or detect_domain(text) == "MENTAL_HEALTH_CRISIS":
+        result = {
+            "Fast_Path": "CRISIS",
+            "Decision_Status": CRISIS_STATUS,
+            "Code": "A",
+            "Type": CLASSIFICATION_CODES["A"],
+            "Reason": "Pre-admission: crisis template served, full pipeline skipped.",
+            "response": CRISIS_TEMPLATE,
+        }
+    else:
+        return None
+
+    _append_audit({
+        "ts": round(time.time(), 3),
+        "src": source,
+        "fp": result["Fast_Path"],
+        "status": result["Decision_Status"],
+        "code": result["Code"],
+        "sha": hashlib.sha256(text.encode("utf-8")).hexdigest()[:12],
+        "len": len(text),
+    })
+    return result
+
+
+if __name__ == "__main__":
+    for sample in ["ffffffffffff", "我真的活不下去了", "請幫我排定會議時間"]:
+        r = pre_admission(sample, source="self_test")
+        print(f"[FastPath] {sample!r} → {r['Fast_Path'] if r else 'FULL_PIPELINE'}")
+    print(f"Audit log: {FAST_PATH_LOG_FILE}")
@@ -10,6 +10,12 @@ import subprocess
 import sys
 from typing import Dict, Any, List
 
+# sandbox 根目錄：讓 engine / governance 套件在直接執行本檔時也可匯入
+# （append 而非 insert，不影響下方同目錄模組的扁平匯入）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
 # ---- Phase 3 TUL 翻譯模組 ----
 try:
     from tul_map import TUL_translate_v2
@@ -49,6 +55,22 @@ except ImportError:
 
     CLASSIFICATION_CODES = {"A": "Action / Task"}
 
+# ---- Pre-admission 快速通道 ----
+try:
+    from governance.fast_path import pre_admission
+except ImportError:
+    def pre_admission(nl_input: str, source: str = "cli"):
+        # 找不到 governance 套件時不攔截，全部走完整管線
+        return None
+
+# ---- 入口准入控制 ----
+try:
+    from engine.admission_control import AdmissionController, format_metrics
+except ImportError:
+    # 找不到 engine 套件時不做准入控制，直接呼叫 run_model
+    AdmissionController = None
+    format_metrics = None
+
 
 # ===== 常數區 =====
 PRA_LOG_FILE = "pra_log.json"
@@ -236,6 +258,16 @@ def run_model(user_input: str) -> str:
     """
     V2.4 集成 C-B: TUL -> L(α) -> C-B 分類 -> DAG 流程（Audit Mode）。
     """
+    # 0. Pre-admission：Noise / 危機模板不進入 TUL / 仲裁 / PRA
+    fast = pre_admission(user_input, source="LLM_Simulator")
+    if fast is not None:
+        return (
+            f"\n[GOVERNANCE RESULT] **{fast['Decision_Status']}** (fast path)\n"
+            f"  - **C-B 分類**: {fast['Code']} ({fast['Type']})\n"
+            f"  - 原因: {fast['Reason']}\n"
+            f"  - 回應:\n{fast['response']}"
+        )
+
     # 1. Phase 3: TUL 翻譯
     try:
         tul_struct = TUL_translate_v2(
@@ -317,7 +349,11 @@ def main():
 
     print("=== Meta-DAG 核心引擎 V2.4 啟動 (L(α) 仲裁模擬器 - 集成 C-B / Audit Mode) ===")
     print(f"核心分類碼: {', '.join(CLASSIFICATION_CODES.keys())}")
-    print("支援指令: /dag, /pra, /tul <NL>, /remember <NL>, exit")
+    print("支援指令: /dag, /pra, /tul <NL>, /remember <NL>, /metrics, exit")
+
+    # 入口准入控制：token bucket（每 source）+ 有界佇列，超載回 REJECTED_OVERLOAD。
+    # CLI 逐筆同步呼叫，實際只會對腳本灌入的 stdin 限速；主要提供 /metrics
+    controller = AdmissionController(run_model, workers=1) if AdmissionController else None
 
     try:
         while True:
@@ -329,6 +365,14 @@ def main():
             if not user_input:
                 continue
 
+            # --- 准入指標 ---
+            if user_input == "/metrics":
+                if controller is None:
+                    print("[ADMISSION] 未載入 engine.admission_control，無准入指標。")
+                else:
+                    print(format_metrics(controller.metrics()))
+                continue
+
             # --- DAG/PRA 查詢 ---
             if user_input.startswith("/dag") or user_input.startswith("/pra"):
                 print("\n[審計日誌輸出]")
@@ -382,7 +426,19 @@ def main():
             # --- 運行模型/仲裁模擬 ---
             print("\n[LLM_Simulator] 觸發 TUL -> L(α) -> C-B -> DAG 流程...")
             try:
-                output = run_model(user_input)
+                if controller is None:
+                    result = {"admitted": True, "output": run_model(user_input)}
+                else:
+                    result = controller.call("cli", user_input)
+                if result["admitted"]:
+                    output = result["output"]
+                else:
+                    verdict = result["verdict"]
+                    output = (
+                        f"\n[GOVERNANCE RESULT] **{verdict['Decision_Status']}**\n"
+                        f"  - 原因: {verdict['Verdict_Reason']}\n"
+                        f"  - Retry After: {verdict['Retry_After_Sec']}s"
+                    )
             except Exception as e:
                 auto_pra("Model", "ExecutionError", "Fallback Local", "engine")
                 output = f"[Engine Execution Error] {str(e)}"
@@ -392,6 +448,9 @@ def main():
 
     except KeyboardInterrupt:
         print("\n[Interrupted]")
+    finally:
+        if controller is not None:
+            controller.shutdown()
 
 
 if __name__ == "__main__":
@@ -5,6 +5,48 @@ import re
 from typing import Tuple
 
 from governance.domain_detect import detect_domain
+from governance.policy_tables import FilterTable, combine_patterns, get_policy
+
+# ================================
+# 內建預設值（governance_rules.json 的 filters 區段缺失時使用）
+# ================================
+MAX_LINES = 8
+MAX_CHARS = 400
+
+PERSONA_PATTERNS = [
+    r"\bAs an AI\b",
+    r"\bAs a language model\b",
+    r"\bI'm excited\b",
+    r"\bI am excited\b",
+    r"\bI'm happy to\b",
+    r"\bI would be happy to\b",
+    r"\bI don't have feelings\b",
+    r"\bIt's nice to meet you\b",
+    r"\bI don't have personal experiences\b",
+]
+
+FINANCE_PATTERNS = [r"必買", r"一定會漲", r"保證獲利", r"all[- ]in", r"all in"]
+
+# 人格化句型合併成單一 alternation，一趟 sub 完成：
+# 每條 pattern 兩端皆為 \b + 英數字，且內部沒有相鄰的非字元，
+# 刪除某一句不會拼出新的命中，也不會與其他句重疊 → 與逐條 re.sub 結果逐位元組相同
+_DEFAULT_FILTERS = FilterTable(
+    max_lines=MAX_LINES,
+    max_chars=MAX_CHARS,
+    persona_pattern=combine_patterns(PERSONA_PATTERNS),
+    finance_pattern=combine_patterns(FINANCE_PATTERNS),
+    finance_replacement="[filtered]",
+)
+
+# 其餘固定 regex 於載入時預先編譯
+_BLANK_LINES = re.compile(r"\n{3,}")
+_SENTENCE_BREAK = re.compile(r"(?<=[。.!?])\s+")
+_NON_TEXT = re.compile(r"[^\w\s\-\.\,\:\;\(\)\[\]{}\/\u4e00-\u9fff]")
+_CODE_BLOCK = re.compile(r"```.*?```", flags=re.DOTALL)
+
+
+def _filters() -> FilterTable:
+    return get_policy().filters or _DEFAULT_FILTERS
 
 
 def _basic_sanitize(text: str) -> str:
@@ -12,29 +54,20 @@ def _basic_sanitize(text: str) -> str:
     if not text:
         return ""
 
+    table = _filters()
+
     # 1) 限制前幾行，避免模型一直講
     lines = text.splitlines()
-    # 保留前 8 行，遇到極度冗長時仍可看出結構
-    lines = lines[:8]
+    # 保留前 N 行（預設 8），遇到極度冗長時仍可看出結構
+    lines = lines[:table.max_lines]
     text = "\n".join(lines)
 
-    # 2) 移除人格化 / 客套話
-    patterns = [
-        r"\bAs an AI\b",
-        r"\bAs a language model\b",
-        r"\bI'm excited\b",
-        r"\bI am excited\b",
-        r"\bI'm happy to\b",
-        r"\bI would be happy to\b",
-        r"\bI don't have feelings\b",
-        r"\bIt's nice to meet you\b",
-        r"\bI don't have personal experiences\b",
-    ]
-    for p in patterns:
-        text = re.sub(p, "", text, flags=re.IGNORECASE)
-
-    # 收斂多餘空白
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    # 2) 移除人格化 / 客套話（單趟）
+    text = table.persona_pattern.sub("", text)
+
+    # 收斂多餘空白（沒有連續三個換行就不必再掃一次）
+    if "\n\n\n" in text:
+        text = _BLANK_LINES.sub("\n\n", text)
     return text.strip()
 
 
@@ -44,7 +77,7 @@ def _meta_dag_filter(text: str) -> str:
         return ""
 
     # 只保留第一或第二個句子（避免長篇歷史故事）
-    parts = re.split(r"(?<=[。.!?])\s+", text)
+    parts = _SENTENCE_BREAK.split(text, maxsplit=2)
     short = " ".join(parts[:2]).strip()
 
     # 加上簡短標記說明這是治理後的簡述
@@ -60,11 +93,12 @@ def _governance_filter(text: str) -> str:
         return ""
 
     # 去掉 emoji 類字元（簡化處理）
-    text = re.sub(r"[^\w\s\-\.\,\:\;\(\)\[\]{}\/\u4e00-\u9fff]", "", text)
+    text = _NON_TEXT.sub("", text)
 
     # 限制總長度
-    if len(text) > 400:
-        text = text[:400] + " ..."
+    max_chars = _filters().max_chars
+    if len(text) > max_chars:
+        text = text[:max_chars] + " ..."
 
     return text.strip()
 
@@ -75,7 +109,7 @@ def _code_filter(text: str) -> str:
         return ""
 
     # 優先抓 ``` 區塊
-    code_block = re.search(r"```.*?```", text, flags=re.DOTALL)
+    code_block = _CODE_BLOCK.search(text)
     if code_block:
         code = code_block.group(0)
         # 前面加一行單句說明（如果有）
@@ -94,16 +128,13 @@ def _finance_filter(text: str) -> str:
     if not text:
         return ""
 
+    table = _filters()
+
     # 移除過度肯定／命令式句子（極簡版）
-    text = re.sub(
-        r"(必買|一定會漲|保證獲利|all[- ]in|all in)",
-        "[filtered]",
-        text,
-        flags=re.IGNORECASE,
-    )
+    text = table.finance_pattern.sub(table.finance_replacement, text)
 
-    if len(text) > 400:
-        text = text[:400] + " ..."
+    if len(text) > table.max_chars:
+        text = text[:table.max_chars] + " ..."
 
     return text.strip()
 
@@ -132,8 +163,9 @@ def filter_response(user_input: str, model_output: str) -> Tuple[str, str]:
     else:
         # GENERAL：只做 basic sanitize + 適度壓縮
         final = base
-        if len(final) > 400:
-            final = final[:400] + " ..."
+        max_chars = _filters().max_chars
+        if len(final) > max_chars:
+            final = final[:max_chars] + " ..."
 
     final = final.strip()
     if not final:
@@ -0,0 +1,253 @@
+# governance/policy_tables.py
+# ======================================================
+# C-5 Compiled Governance Policy Tables
+# - 單一宣告式規則檔：governance/governance_rules.json
+# - 載入時一次編譯成 matcher / decision table，請求路徑不再重新解析
+# - 檔案變更 → 重新編譯 → 以版本號原子替換（daemon 不需重啟）
+# - 任一區段缺失或編譯失敗 → 該區段回退到各模組內建預設值
+# ======================================================
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+# === 路徑設定 ===
+GOVERNANCE_DIR = Path(__file__).resolve().parent
+RULES_FILE = GOVERNANCE_DIR / "governance_rules.json"
+
+# 檔案變更檢查間隔（秒）；間隔內的請求只讀取已編譯的版本
+RELOAD_CHECK_INTERVAL = 1.0
+
+
+# ======================================================
+#   已編譯的決策表
+# ======================================================
+@dataclass(frozen=True)
+class DomainMatcher:
+    """依優先順序排列的 (domain, 合併後的 regex)。"""
+    rules: Tuple[Tuple[str, Pattern[str]], ...]
+
+    def detect(self, text: str) -> Optional[str]:
+        for domain, pattern in self.rules:
+            if pattern.search(text):
+                return domain
+        return None
+
+
+@dataclass(frozen=True)
+class FilterTable:
+    max_lines: int
+    max_chars: int
+    persona_pattern: Pattern[str]
+    finance_pattern: Pattern[str]
+    finance_replacement: str
+
+
+@dataclass(frozen=True)
+class DriftWeights:
+    pec_empty: float
+    pec_overflow: float
+    pec_overflow_len: int
+    risk_level: Dict[str, float]
+    risk_level_default: float
+    decision_veto: float
+    decision_rejected: float
+    classification_code: Dict[str, float]
+    classification_code_default: float
+    anomaly_threshold: float
+
+
+@dataclass(frozen=True)
+class Thresholds:
+    snapshot: float
+    veto: float
+
+
+@dataclass(frozen=True)
+class CompiledPolicy:
+    """
+    一次編譯的完整政策快照（不可變）。
+    - 區段為 None → 呼叫端使用模組內建預設值
+    """
+    version: int
+    source_version: str
+    loaded_at: float
+    domains: Optional[DomainMatcher] = None
+    filters: Optional[FilterTable] = None
+    drift_weights: Optional[DriftWeights] = None
+    thresholds: Optional[Thresholds] = None
+
+
+# ======================================================
+#   編譯工具
+# ======================================================
+def combine_patterns(patterns: List[str], flags: int = re.IGNORECASE) -> Pattern[str]:
+    """
+    將多個 regex 合併成單一 alternation。
+    re.search(合併) 命中 ⇔ 任一 re.search(p) 命中，語義與逐條比對相同。
+    """
+    if not patterns:
+        raise ValueError("empty pattern list")
+    return re.compile("|".join(f"(?:{p})" for p in patterns), flags)
+
+
+def compile_domain_matcher(domains: List[Tuple[str, List[str]]]) -> DomainMatcher:
+    return DomainMatcher(
+        rules=tuple((name, combine_patterns(list(patterns))) for name, patterns in domains)
+    )
+
+
+def _compile_domains(raw: Any) -> DomainMatcher:
+    return compile_domain_matcher([(item["domain"], item["patterns"]) for item in raw])
+
+
+def _compile_filters(raw: Dict[str, Any]) -> FilterTable:
+    return FilterTable(
+        max_lines=int(raw["max_lines"]),
+        max_chars=int(raw["max_chars"]),
+        persona_pattern=combine_patterns(raw["persona_patterns"]),
+        finance_pattern=combine_patterns(raw["finance_patterns"]),
+        finance_replacement=str(raw["finance_replacement"]),
+    )
+
+
+def _compile_drift_weights(raw: Dict[str, Any]) -> DriftWeights:
+    return DriftWeights(
+        pec_empty=float(raw["pec_empty"]),
+        pec_overflow=float(raw["pec_overflow"]),
+        pec_overflow_len=int(raw["pec_overflow_len"]),
+        risk_level={k.upper(): float(v) for k, v in raw["risk_level"].items()},
+        risk_level_default=float(raw["risk_level_default"]),
+        decision_veto=float(raw["decision_veto"]),
+        decision_rejected=float(raw["decision_rejected"]),
+        classification_code={k: float(v) for k, v in raw["classification_code"].items()},
+        classification_code_default=float(raw["classification_code_default"]),
+        anomaly_threshold=float(raw["anomaly_threshold"]),
+    )
+
+
+def _compile_thresholds(raw: Dict[str, Any]) -> Thresholds:
+    return Thresholds(snapshot=float(raw["snapshot"]), veto=float(raw["veto"]))
+
+
+_SECTIONS = {
+    "domains": _compile_domains,
+    "filters": _compile_filters,
+    "drift_weights": _compile_drift_weights,
+    "thresholds": _compile_thresholds,
+}
+
+
+def compile_policy(raw: Dict[str, Any], version: int) -> CompiledPolicy:
+    """
+    將規則檔內容編譯成 CompiledPolicy。
+    單一區段壞掉只影響該區段（回退預設），不拖垮整份政策。
+    """
+    compiled: Dict[str, Any] = {}
+    for name, compiler in _SECTIONS.items():
+        if name not in raw:
+            continue
+        try:
+            compiled[name] = compiler(raw[name])
+        except (KeyError, TypeError, ValueError, re.error) as e:
+            print(f"[Governance Warning] policy section '{name}' invalid, using defaults: {e}")
+
+    return CompiledPolicy(
+        version=version,
+        source_version=str(raw.get("version", "unknown")),
+        loaded_at=time.time(),
+        **compiled,
+    )
+
+
+# ======================================================
+#   熱重載註冊表
+# ======================================================
+class PolicyRegistry:
+    """
+    持有目前生效的 CompiledPolicy。
+    - current() 只在檢查間隔到期時 stat 規則檔
+    - 檔案簽章 (mtime_ns, size) 改變才重新編譯
+    - 編譯完成後單一參考賦值替換 → 讀取端永遠看到完整的一版
+    - 重新載入失敗 → 保留上一個版本
+    """
+
+    def __init__(self, path: Path = RULES_FILE, check_interval: float = RELOAD_CHECK_INTERVAL):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+        self._version = 0
+        self._policy = CompiledPolicy(version=0, source_version="builtin", loaded_at=time.time())
+        self.reload(force=True)
+
+    @property
+    def version(self) -> int:
+        return self._policy.version
+
+    def _stat_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def reload(self, force: bool = False) -> bool:
+        """檔案有變更（或 force）時重新編譯；回傳是否換上新版本。"""
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            signature = self._stat_signature()
+            if signature is None or (signature == self._signature and not force):
+                return False
+
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+                if not isinstance(raw, dict):
+                    raise ValueError("rules file root must be an object")
+            except (OSError, ValueError) as e:
+                print(f"[Governance Warning] policy reload failed, keeping v{self._version}: {e}")
+                self._signature = signature
+                return False
+
+            self._version += 1
+            policy = compile_policy(raw, self._version)
+            self._signature = signature
+            self._policy = policy
+            return True
+
+    def current(self) -> CompiledPolicy:
+        if time.monotonic() >= self._next_check:
+            self.reload()
+        return self._policy
+
+
+_REGISTRY: Optional[PolicyRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_registry() -> PolicyRegistry:
+    global _REGISTRY
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = PolicyRegistry()
+    return _REGISTRY
+
+
+def get_policy() -> CompiledPolicy:
+    """對外介面：取得目前生效的已編譯政策。"""
+    return get_registry().current()
+
+
+if __name__ == "__main__":
+    p = get_policy()
+    print(f"[Policy] v{p.version} ({p.source_version}) from {RULES_FILE}")
+    for section in _SECTIONS:
+        print(f"  - {section}: {'loaded' if getattr(p, section) else 'builtin default'}")
@@ -2,6 +2,8 @@ import argparse
 import hashlib
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 # 掃描模式
 # "light" = 只掃核心檔案（快、穩定）
 # "full"  = 掃整個專案（Debug 用）
@@ -10,9 +12,22 @@ SCAN_MODE = "auto"
 from pathlib import Path
 from datetime import datetime
 
-ROOT = Path(__file__).resolve().parents[1]  # 專案根目錄 = 上一層
+ROOT = Path(__file__).resolve().parent  # 專案根目錄 = 本檔所在目錄
 VERSION_LOCK = ROOT / "version.lock"
 
+# 增量 hash 快取：相對路徑 → [size, mtime_ns, inode, sha256]，stat 完全相同才沿用
+HASH_CACHE = ROOT / ".integrity_cache.json"
+# mtime 距離掃描開始太近的檔案不寫入快取（同一個 mtime 刻度內可能還會被改寫）
+RACY_WINDOW_NS = 2_000_000_000
+HASH_BUFFER_SIZE = 1 << 20  # 1 MiB
+HASH_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# 走訪時整個略過的目錄（名稱比對，任何層級）
+EXCLUDE_DIRS = {"backup", ".git", "__pycache__"}
+# 不納入結構 hash 的檔案：version.lock 封存後會被改寫、快取檔隨每次掃描變動
+EXCLUDE_FILES = {VERSION_LOCK.name, HASH_CACHE.name}
+
+
 def get_include_paths(mode: str):
     if mode == "light":
         return [
@@ -33,60 +48,211 @@ def get_include_paths(mode: str):
             "state/veto_index.json",
             "manifest/version_marker.txt",
             "version.lock",
-]
-
         ]
 
 
+def _is_excluded_file(root: Path, path: str) -> bool:
+    return os.path.basename(path) in EXCLUDE_FILES and os.path.dirname(os.path.abspath(path)) == str(root)
+
+
+def _walk(path: str):
+    """os.scandir 遞迴走訪，回傳 (路徑, stat)；stat 取自 DirEntry，不另開檔。"""
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if entry.name not in EXCLUDE_DIRS:
+                yield from _walk(entry.path)
+        elif entry.is_file():
+            yield entry.path, entry.stat()
+
 
 def iter_files(root: Path, include_paths):
     """
-    依照固定順序列出所有要計算 hash 的檔案。
-    只包含 include_paths 底下的檔案。
+    依照固定順序列出所有要計算 hash 的檔案：[(相對路徑, 絕對路徑, stat), ...]
+    只包含 include_paths 底下的檔案；include_paths 可以是目錄或單一檔案。
     """
-    files = []
+    found = {}
     for rel in include_paths:
-        base = root / rel
-        if not base.exists():
-            continue
-        for p in base.rglob("*"):
-            if p.is_file():
-                files.append(p)
+        base = os.path.normpath(os.path.join(root, rel))
+        if os.path.isfile(base):
+            candidates = [(base, os.stat(base))]
+        else:
+            candidates = _walk(base)
+        for path, st in candidates:
+            if _is_excluded_file(root, path):
+                continue
+            rel_path = os.path.relpath(path, root).replace("\\", "/")
+            found[rel_path] = (path, st)
     # 用相對路徑排序，確保每次順序一致
-    files.sort(key=lambda p: str(p.relative_to(root)))
-    return files
+    return [(rel, path, st) for rel, (path, st) in sorted(found.items())]
 
 
-def file_sha256(path: Path) -> str:
+def file_sha256(path) -> str:
     h = hashlib.sha256()
-    with path.open("rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
+    buf = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])  # > 2 KiB 的 update 會釋放 GIL，執行緒可真正平行
     return h.hexdigest()
 
 
-def compute_structure_hash(root: Path, include_paths):
+def load_hash_cache() -> dict:
+    try:
+        with HASH_CACHE.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_hash_cache(cache: dict):
+    tmp = HASH_CACHE.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, HASH_CACHE)
+
+
+def compute_structure_hash(root: Path, include_paths, use_cache: bool = True, stats: dict = None):
     """
     回傳：
       - global_hash: 整體結構 hash
       - file_hashes: {relative_path: sha256}
+    use_cache：(size, mtime_ns, inode) 與快取相同的檔案不重讀；變動的檔案以執行緒池平行 hash。
+    stats：若提供，填入 files / hashed / cached 計數。
     """
-    paths = get_include_paths(SCAN_MODE)
-    files = iter_files(root, paths)
+    scan_started_ns = time.time_ns()
+    files = iter_files(root, include_paths)
+    cache = load_hash_cache() if use_cache else {}
+
     file_hashes = {}
+    to_hash = []
+    for rel, path, st in files:
+        entry = cache.get(rel)
+        if entry is not None and entry[:3] == [st.st_size, st.st_mtime_ns, st.st_ino]:
+            file_hashes[rel] = entry[3]
+        else:
+            to_hash.append((rel, path, st))
+
+    if to_hash:
+        with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+            for (rel, _, _), digest in zip(to_hash, pool.map(lambda item: file_sha256(item[1]), to_hash)):
+                file_hashes[rel] = digest
+
+    if use_cache:
+        # 其他掃描模式留下的項目保留（light / full 交替執行也能命中），已刪除的檔案才移除
+        scanned = {rel for rel, _, _ in files}
+        new_cache = {
+            rel: entry for rel, entry in cache.items()
+            if rel not in scanned and os.path.exists(os.path.join(root, rel))
+        }
+        for rel, _, st in files:
+            if scan_started_ns - st.st_mtime_ns >= RACY_WINDOW_NS:
+                new_cache[rel] = [st.st_size, st.st_mtime_ns, st.st_ino, file_hashes[rel]]
+        if new_cache != cache:
+            save_hash_cache(new_cache)
+
+    if stats is not None:
+        stats.update(files=len(files), hashed=len(to_hash), cached=len(files) - len(to_hash))
+
+    # 整體 hash = Merkle 樹根（目錄 hash 由子項目組成，見 build_merkle_tree）
+    global_hash = build_merkle_tree(file_hashes)[""]["hash"]
+
+    return global_hash, file_hashes
 
-    for f in files:
-        rel = str(f.relative_to(root)).replace("\\", "/")
-        file_hashes[rel] = file_sha256(f)
 
-    # 用「檔名 + 單檔 hash」再組成一個總 hash
+def flat_structure_hash(file_hashes: dict) -> str:
+    """v0.2 以前的整體 hash：「檔名 + 單檔 hash」依序串接（驗證舊版 version.lock 用）。"""
     h = hashlib.sha256()
     for rel in sorted(file_hashes.keys()):
         h.update(rel.encode("utf-8"))
         h.update(file_hashes[rel].encode("utf-8"))
-    global_hash = h.hexdigest()
+    return h.hexdigest()
 
-    return global_hash, file_hashes
+
+# ---------- Merkle 目錄樹 ----------
+# 目錄 hash = sha256(依名稱排序的子項目 "f <名稱> <hash>\n" / "d <名稱> <hash>\n")
+# 樹以 {目錄相對路徑: {"hash", "dirs", "files"}} 保存（根目錄為 ""），
+# 子項目名稱直接記在節點上 → 比對時不必重建索引，只走 hash 不同的節點
+
+def _parent(rel: str) -> str:
+    return rel.rsplit("/", 1)[0] if "/" in rel else ""
+
+
+def _join(d: str, name: str) -> str:
+    return f"{d}/{name}" if d else name
+
+
+def build_merkle_tree(file_hashes: dict) -> dict:
+    """{檔案相對路徑: sha256} → {目錄相對路徑: {"hash", "dirs": [子目錄名], "files": [檔名]}}。"""
+    tree = {"": {"dirs": [], "files": []}}
+    for rel in sorted(file_hashes):
+        d = _parent(rel)
+        if d not in tree:
+            # 補齊祖先目錄
+            chain = []
+            while d not in tree:
+                chain.append(d)
+                d = _parent(d)
+            for sub in reversed(chain):
+                tree[sub] = {"dirs": [], "files": []}
+                tree[_parent(sub)]["dirs"].append(sub.rsplit("/", 1)[-1])
+            d = chain[0]
+        tree[d]["files"].append(rel.rsplit("/", 1)[-1])
+
+    # 由深到淺計算，子目錄一定先完成
+    for d in sorted(tree, key=lambda x: x.count("/") + (1 if x else 0), reverse=True):
+        node = tree[d]
+        entries = [(name, "f", file_hashes[_join(d, name)]) for name in node["files"]]
+        entries += [(name, "d", tree[_join(d, name)]["hash"]) for name in node["dirs"]]
+        h = hashlib.sha256()
+        for name, kind, digest in sorted(entries):
+            h.update(f"{kind} {name} {digest}\n".encode("utf-8"))
+        node["dirs"].sort()
+        node["hash"] = h.hexdigest()
+    return tree
+
+
+def merkle_diff(expected_files: dict, expected_tree: dict, current_files: dict, current_tree: dict) -> dict:
+    """
+    由根往下比對兩棵 Merkle 樹，只進入 hash 不同的子樹（成本與變動範圍成正比）。
+    回傳 missing / extra / changed（檔案）與 dirs（直接含有變動檔案的目錄）。
+    """
+    empty = {"hash": None, "dirs": [], "files": []}
+    result = {"missing": [], "extra": [], "changed": [], "dirs": []}
+
+    stack = [""]
+    while stack:
+        d = stack.pop()
+        expected = expected_tree.get(d, empty)
+        current = current_tree.get(d, empty)
+        if expected["hash"] == current["hash"]:
+            continue
+        touched = False
+        for name in set(expected["files"]) | set(current["files"]):
+            rel = _join(d, name)
+            if rel not in current_files:
+                result["missing"].append(rel)
+            elif rel not in expected_files:
+                result["extra"].append(rel)
+            elif expected_files[rel] != current_files[rel]:
+                result["changed"].append(rel)
+            else:
+                continue
+            touched = True
+        if touched:
+            result["dirs"].append(d or ".")
+        stack.extend(_join(d, name) for name in set(expected["dirs"]) | set(current["dirs"]))
+
+    for key in result:
+        result[key].sort()
+    return result
 
 
 def load_version_lock():
@@ -102,8 +268,10 @@ def save_version_lock(project_name: str, version: str, global_hash: str, file_ha
         "version": version,
         "sealed_at": datetime.now().isoformat(timespec="seconds"),
         "python": f"{os.sys.version_info.major}.{os.sys.version_info.minor}.{os.sys.version_info.micro}",
-        "engine_version": "integrity_engine_v0.1",
+        "engine_version": "integrity_engine_v0.3",
+        "hash_scheme": "merkle-sha256",
         "structure_hash": global_hash,
+        "tree": build_merkle_tree(file_hashes),
         "files": file_hashes,
     }
     with VERSION_LOCK.open("w", encoding="utf-8") as f:
@@ -111,6 +279,11 @@ def save_version_lock(project_name: str, version: str, global_hash: str, file_ha
     print(f"[OK] version.lock 已更新：{VERSION_LOCK}")
 
 
+def _print_scan_stats(stats: dict, elapsed: float):
+    print(f"[INFO] 掃描 {stats['files']} 個檔案：重新計算 {stats['hashed']}，"
+          f"快取命中 {stats['cached']}（{elapsed:.2f}s）")
+
+
 def cmd_seal(args):
     global SCAN_MODE
     if args.full:
@@ -118,7 +291,7 @@ def cmd_seal(args):
     else:
         SCAN_MODE = "light"
 
-    
+
     """
     建立 / 更新 version.lock：
     - 計算目前 engine + state 結構的 hash
@@ -129,7 +302,10 @@ def cmd_seal(args):
 
     print(f"[INFO] 開始 sealing，project={project_name}, version={version}")
     paths = get_include_paths(SCAN_MODE)
-    global_hash, file_hashes = compute_structure_hash(ROOT, paths)
+    stats = {}
+    t0 = time.perf_counter()
+    global_hash, file_hashes = compute_structure_hash(ROOT, paths, use_cache=not args.no_cache, stats=stats)
+    _print_scan_stats(stats, time.perf_counter() - t0)
 
     print(f"[INFO] 結構 hash = {global_hash}")
     save_version_lock(project_name, version, global_hash, file_hashes)
@@ -143,7 +319,7 @@ def cmd_verify(args):
     else:
         SCAN_MODE = "light"
 
-    
+
     """
     驗證目前檔案結構是否與 version.lock 一致。
     """
@@ -157,46 +333,81 @@ def cmd_verify(args):
     expected_files = lock.get("files", {})
 
     paths = get_include_paths(SCAN_MODE)
-    current_hash, current_files = compute_structure_hash(ROOT, paths)
+    stats = {}
+    t0 = time.perf_counter()
+    current_hash, current_files = compute_structure_hash(ROOT, paths, use_cache=not args.no_cache, stats=stats)
+    _print_scan_stats(stats, time.perf_counter() - t0)
 
 
     print(f"[INFO] version.lock 中的 hash = {expected_hash}")
     print(f"[INFO] 目前計算的 hash   = {current_hash}")
 
-    # 比對整體 hash
-    if current_hash != expected_hash:
-        print("[WARN] 整體結構 hash 不一致！開始檢查差異...")
+    # 比對整體 hash（舊版 lock 沒有 Merkle 樹：改用平面 hash、逐檔比對）
+    if lock.get("hash_scheme") == "merkle-sha256":
+        consistent = current_hash == expected_hash
+        expected_dirs = lock["tree"]
+    else:
+        print("[INFO] version.lock 為舊格式（無目錄樹），以平面 hash 比對；重新 seal 可升級。")
+        consistent = flat_structure_hash(current_files) == expected_hash
+        expected_dirs = build_merkle_tree(expected_files)
+
+    if not consistent:
+        print("[WARN] 整體結構 hash 不一致！沿目錄樹定位差異...")
+        diff = merkle_diff(expected_files, expected_dirs, current_files, build_merkle_tree(current_files))
+        print_diff(diff)
+        print("\n[RESULT] ❌ 結構不一致，需人工確認。")
+    else:
+        print("[RESULT] ✅ 結構完全一致，未偵測到變動。")
+
 
-        # 檔案集合差異
-        expected_set = set(expected_files.keys())
-        current_set = set(current_files.keys())
+def print_diff(diff: dict):
+    if diff["dirs"]:
+        print("\n[DIFF] 變動所在的目錄：")
+        for rel in diff["dirs"]:
+            print("  @", rel)
 
-        missing = expected_set - current_set
-        extra = current_set - expected_set
-        changed = set()
+    if diff["missing"]:
+        print("\n[DIFF] 遺失的檔案：")
+        for rel in diff["missing"]:
+            print("  -", rel)
 
-        for rel in expected_set & current_set:
-            if expected_files[rel] != current_files[rel]:
-                changed.add(rel)
+    if diff["extra"]:
+        print("\n[DIFF] 多出來的檔案：")
+        for rel in diff["extra"]:
+            print("  +", rel)
 
-        if missing:
-            print("\n[DIFF] 遺失的檔案：")
-            for rel in sorted(missing):
-                print("  -", rel)
+    if diff["changed"]:
+        print("\n[DIFF] 內容被修改的檔案：")
+        for rel in diff["changed"]:
+            print("  *", rel)
 
-        if extra:
-            print("\n[DIFF] 多出來的檔案：")
-            for rel in sorted(extra):
-                print("  +", rel)
 
-        if changed:
-            print("\n[DIFF] 內容被修改的檔案：")
-            for rel in sorted(changed):
-                print("  *", rel)
+def _load_lock_file(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        lock = json.load(f)
+    files = lock.get("files", {})
+    tree = lock.get("tree") if lock.get("hash_scheme") == "merkle-sha256" else None
+    return lock, files, tree or build_merkle_tree(files)
 
-        print("\n[RESULT] ❌ 結構不一致，需人工確認。")
-    else:
-        print("[RESULT] ✅ 結構完全一致，未偵測到變動。")
+
+def cmd_diff(args):
+    """
+    比較兩份 version.lock（不讀任何專案檔案）：只走 hash 不同的子樹。
+    省略 new 時與目前的 version.lock 比較。
+    """
+    new_path = args.new or str(VERSION_LOCK)
+    old_lock, old_files, old_dirs = _load_lock_file(args.old)
+    new_lock, new_files, new_dirs = _load_lock_file(new_path)
+    print(f"[INFO] {args.old} ({old_lock.get('version')}, {old_lock.get('sealed_at')})"
+          f" → {new_path} ({new_lock.get('version')}, {new_lock.get('sealed_at')})")
+
+    if old_dirs[""]["hash"] == new_dirs[""]["hash"]:
+        print("[RESULT] ✅ 兩份 lock 的結構相同。")
+        return
+    diff = merkle_diff(old_files, old_dirs, new_files, new_dirs)
+    print_diff(diff)
+    print(f"\n[RESULT] {len(diff['missing'])} 刪除、{len(diff['extra'])} 新增、{len(diff['changed'])} 修改，"
+          f"分布於 {len(diff['dirs'])} 個目錄。")
 
 
 def main():
@@ -209,12 +420,21 @@ def main():
     p_seal.add_argument("--version", type=str, help="版本號，例如 0.1.0")
     p_seal.set_defaults(func=cmd_seal)
     p_seal.add_argument("--full", action="store_true", help="使用完整掃描模式")
+    p_seal.add_argument("--no-cache", action="store_true", help="忽略 hash 快取，全部重新計算")
 
 
     # verify
     p_verify = sub.add_parser("verify", help="驗證檔案結構是否與 version.lock 一致")
     p_verify.set_defaults(func=cmd_verify)
     p_verify.add_argument("--full", action="store_true", help="使用完整掃描模式")
+    p_verify.add_argument("--no-cache", action="store_true", help="忽略 hash 快取，全部重新計算")
+
+
+    # diff
+    p_diff = sub.add_parser("diff", help="比較兩份 version.lock 的差異")
+    p_diff.add_argument("old", type=str, help="舊的 lock 檔")
+    p_diff.add_argument("new", type=str, nargs="?", help="新的 lock 檔（預設為目前的 version.lock）")
+    p_diff.set_defaults(func=cmd_diff)
 
 
     args = parser.parse_args()
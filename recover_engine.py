@@ -1,37 +1,144 @@
+import argparse
+import hashlib
 import os
 import shutil
 import pathlib
 
 # 路徑設定：目前所在資料夾 = sandbox 根目錄
 ROOT = pathlib.Path.cwd()
-BASE = ROOT / "baseline" / "v1.1_xstable" / "engine"
+BASELINE = ROOT / "baseline" / "v1.1_xstable"
+BASE = BASELINE / "engine"
+SUMS_FILE = BASELINE / "SHA256_SUMS.txt"
 TARGET = ROOT / "engine"
 
-print("[STEP] SANDBOX BASELINE RECOVERY")
-print("[INFO] Baseline from:", BASE)
-print("[INFO] Recover to   :", TARGET)
+# 你的 engine 內出現過的舊版本殘影
+BAD = ["engine_v2_Final.py", "tul_map_v0.9.py", "tul_map_v0.9.1.py"]
 
-# 檢查 baseline 資料夾是否存在
-if not BASE.exists():
-    raise FileNotFoundError(f"[ERROR] Baseline folder not found: {BASE}")
 
-# Step1: 清 __pycache__
-for p in TARGET.rglob("__pycache__"):
-    print("[DEL DIR]", p)
-    shutil.rmtree(p, ignore_errors=True)
+def sha256_file(path: pathlib.Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
 
-# Step2: 清不該存在的殘影檔案（你的 engine 內出現過的舊版本）
-BAD = ["engine_v2_Final.py", "tul_map_v0.9.py", "tul_map_v0.9.1.py"]
-for name in BAD:
-    f = TARGET / name
-    if f.exists():
-        print("[DEL]", f)
-        f.unlink()
-
-# Step3: 覆蓋 baseline → engine/
-for src in BASE.iterdir():
-    dst = TARGET / src.name
-    shutil.copy2(src, dst)
-    print("[COPY]", src.name)
-
-print("[DONE] SANDBOX RECOVERED OK")
+
+def matches_sum(path: pathlib.Path, listed: str) -> bool:
+    """
+    檔案是否符合清單中的 sha256。SHA256_SUMS.txt 是在 Windows（CRLF）工作目錄產生的，
+    LF 檢出的同一份內容也視為相符。
+    """
+    data = path.read_bytes()
+    if hashlib.sha256(data).hexdigest() == listed:
+        return True
+    crlf = data.replace(b"\r\n", b"\n").replace(b"\n", b"\r\n")
+    return hashlib.sha256(crlf).hexdigest() == listed
+
+
+def load_sums(path: pathlib.Path) -> dict:
+    """讀取 sha256sum 格式的 SHA256_SUMS.txt：{"engine_v2.py": sha, ...}（只取 engine/ 底下的檔名）。"""
+    sums = {}
+    if not path.exists():
+        return sums
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            sha, name = line.split(None, 1)
+            name = name.lstrip("*").replace("\\", "/")
+            if name.startswith("engine/"):
+                sums[name[len("engine/"):]] = sha.lower()
+    return sums
+
+
+def plan_recovery(base: pathlib.Path = BASE, target: pathlib.Path = TARGET, sums_file: pathlib.Path = SUMS_FILE) -> dict:
+    """
+    比對 target 與 baseline，回傳要做的動作（不寫入任何檔案）：
+      copy       內容與 baseline 不同（或不存在）的檔案
+      unchanged  sha256 已相符的檔案
+      delete     BAD 清單中的殘影檔
+      pycache    被覆蓋模組的舊 .pyc（未變動模組的快取保留）
+      stale      baseline 本身與 SHA256_SUMS.txt 不符的檔案（清單過期或 baseline 被改過）
+    """
+    sums = load_sums(sums_file)
+    plan = {"copy": [], "unchanged": [], "delete": [], "pycache": [], "stale": []}
+
+    for src in sorted(p for p in base.iterdir() if p.is_file()):
+        expected = sha256_file(src)
+        listed = sums.get(src.name)
+        if listed is None or (listed != expected and not matches_sum(src, listed)):
+            plan["stale"].append(src.name)
+        dst = target / src.name
+        if dst.is_file() and sha256_file(dst) == expected:
+            plan["unchanged"].append(src.name)
+        else:
+            plan["copy"].append(src.name)
+
+    for name in BAD:
+        if (target / name).exists():
+            plan["delete"].append(name)
+
+    # copy2 會保留 baseline 的 mtime，舊 .pyc 的來源時間戳可能剛好相符，因此覆蓋的模組要一併清掉快取
+    pycache = target / "__pycache__"
+    if pycache.is_dir():
+        stems = {pathlib.Path(name).stem for name in plan["copy"] + plan["delete"]}
+        for pyc in sorted(pycache.iterdir()):
+            if pyc.name.split(".", 1)[0] in stems:
+                plan["pycache"].append(pyc.name)
+    return plan
+
+
+def apply_recovery(plan: dict, base: pathlib.Path = BASE, target: pathlib.Path = TARGET):
+    for name in plan["pycache"]:
+        print("[DEL PYC]", target / "__pycache__" / name)
+        (target / "__pycache__" / name).unlink()
+    for name in plan["delete"]:
+        print("[DEL]", target / name)
+        (target / name).unlink()
+    for name in plan["copy"]:
+        tmp = target / f".{name}.recover_tmp"
+        shutil.copy2(base / name, tmp)
+        os.replace(tmp, target / name)
+        print("[COPY]", name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recover engine/ from the v1.1_xstable baseline (diff-only)")
+    parser.add_argument("--dry-run", action="store_true", help="只列出會變動的檔案，不寫入")
+    parser.add_argument("--strict", action="store_true", help="baseline 與 SHA256_SUMS.txt 不符時中止")
+    args = parser.parse_args()
+
+    print("[STEP] SANDBOX BASELINE RECOVERY" + (" (dry run)" if args.dry_run else ""))
+    print("[INFO] Baseline from:", BASE)
+    print("[INFO] Recover to   :", TARGET)
+
+    # 檢查 baseline 資料夾是否存在
+    if not BASE.exists():
+        raise FileNotFoundError(f"[ERROR] Baseline folder not found: {BASE}")
+
+    plan = plan_recovery()
+    for name in plan["stale"]:
+        print(f"[WARN] baseline/{name} does not match {SUMS_FILE.name}; the checksum list may be stale")
+    if plan["stale"] and args.strict:
+        raise SystemExit("[ERROR] Baseline checksum mismatch (--strict)")
+
+    for name in plan["unchanged"]:
+        print("[SAME]", name)
+    if args.dry_run:
+        for name in plan["copy"]:
+            print("[WOULD COPY]", name)
+        for name in plan["delete"]:
+            print("[WOULD DEL]", TARGET / name)
+        for name in plan["pycache"]:
+            print("[WOULD DEL PYC]", TARGET / "__pycache__" / name)
+        print(f"[DONE] {len(plan['copy'])} to copy, {len(plan['delete'])} to delete, {len(plan['unchanged'])} unchanged")
+        return
+
+    apply_recovery(plan)
+    print(f"[INFO] {len(plan['copy'])} copied, {len(plan['delete'])} deleted, {len(plan['unchanged'])} unchanged")
+    print("[DONE] SANDBOX RECOVERED OK")
+
+
+if __name__ == "__main__":
+    main()
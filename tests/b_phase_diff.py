@@ -1,6 +1,8 @@
-import json
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+
+from tests.b_phase_restore import verify_segments
+from tests.b_phase_snapshot import file_length, is_delta_snapshot, load_snapshot
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 REPORT_DIR = BASE_DIR / "tests" / "attack_reports"
@@ -30,14 +32,94 @@ def _diff_json(a, b, path="") -> List[str]:
     return diffs
 
 
+def _resolve_content(snap_path: Path, snap: Dict[str, Any], name: str) -> Any:
+    """非陣列檔在增量快照中可能記成 unchanged；沿 prev 往回找最近一份完整內容。"""
+    while True:
+        rec = snap["files"].get(name) or {"kind": "missing"}
+        if rec["kind"] == "full":
+            return rec["content"]
+        if rec["kind"] != "unchanged" or not snap.get("prev"):
+            return None
+        snap_path = snap_path.with_name(snap["prev"])
+        snap = load_snapshot(snap_path)
+
+
+def _kind(snap: Dict[str, Any], name: str) -> str:
+    rec = snap.get("files", {}).get(name)
+    return rec["kind"] if rec else "missing"
+
+
+def _chain_between(name: str, older: Path, newer: Path) -> Optional[List[Tuple[Dict[str, Any], str]]]:
+    """
+    newer 沿 prev 往回走到 older，這個檔案的 (紀錄, 快照名稱) 序列（由舊到新）。
+    不在同一條鏈上、或中途不是陣列紀錄時回傳 None。
+    """
+    segs: List[Tuple[Dict[str, Any], str]] = []
+    snap_path = newer
+    while True:
+        snap = load_snapshot(snap_path)
+        rec = snap["files"].get(name) or {"kind": "missing"}
+        if rec["kind"] not in ("base", "append"):
+            return None
+        segs.append((rec, snap_path.name))
+        if snap_path.name == older.name:
+            segs.reverse()
+            return segs
+        prev = snap.get("prev")
+        if not prev:
+            return None
+        snap_path = snap_path.with_name(prev)
+
+
+def _verify_delta_chain(name: str, path_a: Path, path_b: Path) -> Optional[str]:
+    """驗證 A、B 之間每份增量的 chain_sha256；有問題時回傳說明，A、B 不在同一條鏈上則不檢查。"""
+    try:
+        segs = _chain_between(name, path_a, path_b) or _chain_between(name, path_b, path_a)
+    except (OSError, ValueError) as e:
+        return f"delta chain between A and B cannot be read: {e}"
+    if segs is None or len(segs) < 2:
+        return None
+    # 鏈中途重新起算（kind=base）時，從最後一個 base 開始驗證
+    first = 1
+    for i in range(len(segs) - 1, 0, -1):
+        if segs[i][0]["kind"] == "base":
+            segs, first = segs[i:], 0
+            break
+    if not verify_segments(name, segs, first, path_b.parent):
+        return "delta chain_sha256 does not verify between A and B (tampered or reordered delta)"
+    return None
+
+
+def _diff_delta_file(name: str, A: Dict[str, Any], B: Dict[str, Any], path_a: Path, path_b: Path) -> List[str]:
+    """
+    以增量紀錄比較兩邊都存在的單一檔案。
+    陣列檔只看筆數與 B 的紀錄種類，並驗證 A → B 之間每份增量的 chain_sha256，不需要載入基準快照。
+    """
+    ra = A["files"][name]
+    rb = B["files"][name]
+    len_a, len_b = file_length(ra), file_length(rb)
+    if len_a is not None and len_b is not None:
+        diffs: List[str] = []
+        if len_a != len_b:
+            diffs.append(f"~ {name} : len(A)={len_a}, len(B)={len_b}")
+        if rb["kind"] == "base" and B.get("prev") == path_a.name:
+            diffs.append(f"! {name} : existing entries were rewritten (snapshot chain rebased)")
+        problem = _verify_delta_chain(name, path_a, path_b)
+        if problem:
+            diffs.append(f"! {name} : {problem}")
+        return diffs
+    if rb["kind"] == "unchanged" and ra.get("sha256") == rb["sha256"]:
+        return []
+    return _diff_json(_resolve_content(path_a, A, name), _resolve_content(path_b, B, name), path=name)
+
+
 def diff_snapshots(snap_a: Path, snap_b: Path) -> Path:
-    """比較兩個 snapshot JSON，輸出簡易 Markdown 報告。"""
+    """比較兩個 snapshot JSON（增量或舊版完整快照），輸出簡易 Markdown 報告。"""
     REPORT_DIR.mkdir(parents=True, exist_ok=True)
 
-    with open(snap_a, "r", encoding="utf-8") as f:
-        A = json.load(f)
-    with open(snap_b, "r", encoding="utf-8") as f:
-        B = json.load(f)
+    A = load_snapshot(snap_a)
+    B = load_snapshot(snap_b)
+    delta = is_delta_snapshot(A) and is_delta_snapshot(B)
 
     lines: List[str] = []
     lines.append("# B-Phase Snapshot Diff Report\n")
@@ -51,25 +133,34 @@ def diff_snapshots(snap_a: Path, snap_b: Path) -> Path:
 
     keys = set(files_a.keys()) | set(files_b.keys())
     for name in sorted(keys):
-        fa = files_a.get(name)
-        fb = files_b.get(name)
         lines.append(f"## File: {name}")
-        if fa is None and fb is None:
-            lines.append("- both missing")
-        elif fa is None:
-            lines.append("- only in B")
-        elif fb is None:
-            lines.append("- only in A")
+        if delta:
+            missing_a = _kind(A, name) == "missing"
+            missing_b = _kind(B, name) == "missing"
         else:
-            diffs = _diff_json(fa, fb, path=name)
-            if not diffs:
-                lines.append("- no observable diff")
+            missing_a = files_a.get(name) is None
+            missing_b = files_b.get(name) is None
+        if missing_a or missing_b:
+            if missing_a and missing_b:
+                lines.append("- both missing")
+            elif missing_a:
+                lines.append("- only in B")
             else:
-                for d in diffs[:100]:
-                    lines.append(f"- {d}")
-                if len(diffs) > 100:
-                    lines.append(f"- ... {len(diffs)-100} more diffs omitted ...")
-            all_diffs.extend(diffs)
+                lines.append("- only in A")
+            lines.append("")
+            continue
+        if delta:
+            diffs = _diff_delta_file(name, A, B, snap_a, snap_b)
+        else:
+            diffs = _diff_json(files_a[name], files_b[name], path=name)
+        if not diffs:
+            lines.append("- no observable diff")
+        else:
+            for d in diffs[:100]:
+                lines.append(f"- {d}")
+            if len(diffs) > 100:
+                lines.append(f"- ... {len(diffs)-100} more diffs omitted ...")
+        all_diffs.extend(diffs)
         lines.append("")
 
     out_name = f"b_phase_diff_{snap_a.stem}_vs_{snap_b.stem}.md"
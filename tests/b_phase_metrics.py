@@ -2,10 +2,12 @@ import json
 from pathlib import Path
 from typing import List, Dict, Any
 
+from tests.b_phase_snapshot import file_length, load_snapshot
+
 
 def compute_metrics(snapshot_paths: List[Path]) -> Dict[str, Any]:
     """
-    從多個 snapshot JSON 中計算簡單指標：
+    從多個 snapshot JSON（增量或舊版完整快照）中計算簡單指標：
       - pra_log 長度序列
       - tul_log 長度序列
       - 是否單調遞增（無回滾）
@@ -14,19 +16,14 @@ def compute_metrics(snapshot_paths: List[Path]) -> Dict[str, Any]:
     tul_lengths = []
 
     for p in snapshot_paths:
-        with open(p, "r", encoding="utf-8") as f:
-            snap = json.load(f)
-        files = snap.get("files", {})
-        pra = files.get("pra_log.json") or []
-        tul = files.get("tul_log.json") or []
-        if isinstance(pra, list):
-            pra_lengths.append(len(pra))
-        else:
-            pra_lengths.append(None)
-        if isinstance(tul, list):
-            tul_lengths.append(len(tul))
-        else:
-            tul_lengths.append(None)
+        # 增量快照直接帶有 count，不需要重建完整內容
+        files = load_snapshot(p).get("files", {})
+        for name, out in (("pra_log.json", pra_lengths), ("tul_log.json", tul_lengths)):
+            rec = files.get(name)
+            if rec is None or (isinstance(rec, dict) and rec.get("kind") == "missing"):
+                out.append(0)
+            else:
+                out.append(file_length(rec))
 
     def is_monotonic(seq: List[int]) -> bool:
         clean = [x for x in seq if isinstance(x, int)]
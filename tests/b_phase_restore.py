@@ -0,0 +1,277 @@
+"""
+b_phase_restore.py — 依增量快照鏈做時間點還原（point-in-time restore）
+
+用法：
+  python -m tests.b_phase_restore --list
+  python -m tests.b_phase_restore --tag case_500
+  python -m tests.b_phase_restore --at 2025-12-13T10:30:00      # 或 epoch 秒數
+  python -m tests.b_phase_restore --tag end --target /tmp/state_copy
+
+還原點由 snapshot_log.jsonl 選出（同名 tag 取最新；--at 取該時間之前最後一份），
+沿 prev 往回收集每個檔案從基準到還原點的所有區段，只讀中繼資料：
+
+  陣列日誌  逐段驗證目前檔案的 chain_sha256：
+              全部相符且結尾相同 → 略過（unchanged）
+              全部相符但檔案較長 → 截短到 end_offset 再補上結尾（truncated），不重寫前綴
+              中途不符 → 保留已驗證的前綴，其後的區段由快照內容重新序列化並以 chain 驗證（rebuilt）
+  其他檔案  sha256 相符則略過，否則寫回快照內容
+  快照中不存在的檔案  刪除
+
+只有需要重建的區段才會載入快照檔的內容，一般情況的成本是一次循序雜湊。
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tests.b_phase_snapshot import SNAPSHOT_DIR, SNAPSHOT_LOG, STATE_DIR, TARGET_FILES, load_snapshot
+
+CHUNK_SIZE = 1 << 20
+# json.dump 常見的輸出格式；重建區段時逐一嘗試，以 chain_sha256 確認位元組完全一致
+_FORMATS: List[Tuple[Optional[int], bool]] = [(4, False), (2, False), (None, False), (4, True), (2, True), (None, True)]
+
+
+def list_snapshots(snapshot_dir: Path = SNAPSHOT_DIR) -> List[Dict[str, Any]]:
+    """snapshot_log.jsonl 中的所有快照中繼資料（依寫入順序）。"""
+    log = snapshot_dir / SNAPSHOT_LOG.name
+    if not log.exists():
+        return []
+    with open(log, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def select_snapshot(entries: List[Dict[str, Any]], tag: Optional[str] = None,
+                    at: Optional[float] = None) -> Dict[str, Any]:
+    if tag is not None:
+        matches = [e for e in entries if e["tag"] == tag]
+    elif at is not None:
+        matches = [e for e in entries if e["timestamp"] <= at]
+    else:
+        matches = entries
+    if not matches:
+        raise LookupError(f"no snapshot matches tag={tag!r} at={at!r}")
+    return max(matches, key=lambda e: e["timestamp"])
+
+
+def _segments(by_name: Dict[str, Dict[str, Any]], target: Dict[str, Any], name: str) -> List[Tuple[Dict[str, Any], str]]:
+    """從基準到還原點，某檔案的 (紀錄, 快照名稱) 序列；最後一筆是還原點的紀錄。"""
+    chain = []
+    snap = target
+    while snap is not None:
+        rec = snap["files"].get(name, {"kind": "missing"})
+        chain.append((rec, snap["name"]))
+        if rec["kind"] in ("base", "full", "missing"):
+            chain.reverse()
+            return chain
+        snap = by_name.get(snap.get("prev"))
+    raise LookupError(f"snapshot chain for {name} is incomplete at {target['name']}")
+
+
+def _verified_prefix(path: Path, segs: List[Dict[str, Any]]) -> int:
+    """目前檔案從頭開始有幾個區段的 chain_sha256 相符。"""
+    if not path.exists():
+        return 0
+    verified = 0
+    prev_chain = None
+    pos = 0
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        for rec in segs:
+            end = rec["end_offset"]
+            if end > size:
+                break
+            h = hashlib.sha256(bytes.fromhex(prev_chain) if prev_chain else b"")
+            remaining = end - pos
+            while remaining:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                h.update(chunk)
+                remaining -= len(chunk)
+            if remaining or h.hexdigest() != rec["chain_sha256"]:
+                break
+            prev_chain = rec["chain_sha256"]
+            pos = end
+            verified += 1
+    return verified
+
+
+def _region(entries: List[Any], start: int, is_base: bool, fmt: Tuple[Optional[int], bool]) -> bytes:
+    """重現 json.dump 整個陣列時，這一段項目所佔的位元組（不含結尾）。"""
+    indent, ensure_ascii = fmt
+    if not entries:
+        return b"[" if is_base else b""
+    inner = json.dumps(entries, indent=indent, ensure_ascii=ensure_ascii)[1:-1].rstrip("\n")
+    if is_base:
+        return ("[" + inner).encode("utf-8")
+    sep = "" if start == 0 else ("," if indent is not None else ", ")
+    return (sep + inner).encode("utf-8")
+
+
+def _trailer(count: int, fmt: Tuple[Optional[int], bool]) -> bytes:
+    return b"\n]" if count and fmt[0] is not None else b"]"
+
+
+def _rebuild_tail(name: str, segs: List[Tuple[Dict[str, Any], str]], first: int, snapshot_dir: Path):
+    """由快照內容重新序列化第 first 段起的區段；回傳 (位元組, 格式)，沒有位元組一致的格式時回傳 (None, None)。"""
+    contents = [(rec, load_snapshot(snapshot_dir / snap_name)["files"][name]["entries"]) for rec, snap_name in segs[first:]]
+    prev_chain = segs[first - 1][0]["chain_sha256"] if first else None
+    for fmt in _FORMATS:
+        chain = prev_chain
+        out = []
+        for rec, entries in contents:
+            region = _region(entries, rec["start"], rec["kind"] == "base", fmt)
+            chain = hashlib.sha256((bytes.fromhex(chain) if chain else b"") + region).hexdigest()
+            if chain != rec["chain_sha256"]:
+                break
+            out.append(region)
+        else:
+            return b"".join(out), fmt
+    return None, None
+
+
+def verify_segments(name: str, segs: List[Tuple[Dict[str, Any], str]], first: int, snapshot_dir: Path) -> bool:
+    """
+    第 first 段起的區段是否可信：append 的 start 接續上一段的 count，且快照內容重新序列化後
+    逐段符合 chain_sha256（被竄改或順序錯亂的增量會在這裡失敗，而不是等到還原時）。
+    """
+    for i in range(max(first, 1), len(segs)):
+        rec, prev = segs[i][0], segs[i - 1][0]
+        if rec["kind"] == "append" and rec["start"] != prev["count"]:
+            return False
+    return _rebuild_tail(name, segs, first, snapshot_dir)[0] is not None
+
+
+def _restore_log(path: Path, name: str, segs: List[Tuple[Dict[str, Any], str]], snapshot_dir: Path) -> str:
+    records = [rec for rec, _ in segs]
+    target = records[-1]
+    end, size = target["end_offset"], target["size"]
+    verified = _verified_prefix(path, records)
+    if verified == len(records) and path.stat().st_size < size:
+        verified -= 1  # 結尾被截掉：重建最後一段並補上結尾
+
+    if verified == len(records):
+        with open(path, "r+b") as f:
+            cur_size = os.fstat(f.fileno()).st_size
+            if cur_size == size:
+                return "unchanged"
+            # 同一個寫入者追加後，檔案結尾的格式不變：沿用目前檔案最後 (size - end) 個位元組
+            f.seek(cur_size - (size - end))
+            trailer = f.read()
+            f.seek(end)
+            f.write(trailer)
+            f.truncate()
+        return "truncated"
+
+    tail, fmt = _rebuild_tail(name, segs, verified, snapshot_dir)
+    if tail is None:
+        # 無法重現原始位元組：以完整內容重寫（內容相同，格式可能不同）
+        entries: List[Any] = []
+        for rec, snap_name in segs:
+            entries.extend(load_snapshot(snapshot_dir / snap_name)["files"][name]["entries"])
+        tmp = path.with_name(path.name + ".restore_tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=4, ensure_ascii=False)
+        os.replace(tmp, path)
+        return "rebuilt (not byte-identical)"
+
+    keep = records[verified - 1]["end_offset"] if verified else 0
+    mode = "r+b" if path.exists() else "wb"
+    with open(path, mode) as f:
+        f.seek(keep)
+        f.write(tail)
+        f.write(_trailer(target["count"], fmt))
+        f.truncate()
+    return "rebuilt"
+
+
+def _restore_document(path: Path, name: str, segs: List[Tuple[Dict[str, Any], str]], snapshot_dir: Path) -> str:
+    full, snap_name = segs[0]
+    if path.exists():
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+        if h.hexdigest() == full["sha256"]:
+            return "unchanged"
+    content = load_snapshot(snapshot_dir / snap_name)["files"][name]["content"]
+    data = None
+    for indent, ensure_ascii in _FORMATS:
+        candidate = json.dumps(content, indent=indent, ensure_ascii=ensure_ascii).encode("utf-8")
+        if hashlib.sha256(candidate).hexdigest() == full["sha256"]:
+            data = candidate
+            break
+    if data is None:
+        data = json.dumps(content, indent=4, ensure_ascii=False).encode("utf-8")
+    tmp = path.with_name(path.name + ".restore_tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return "written"
+
+
+def restore_state(tag: Optional[str] = None, at: Optional[float] = None,
+                  target_dir: Path = STATE_DIR, snapshot_dir: Path = SNAPSHOT_DIR) -> Dict[str, Any]:
+    """
+    把 target_dir 中的 TARGET_FILES 還原到指定快照（tag 或時間點；都不給則為最新一份）。
+    回傳 {"snapshot": 名稱, "tag", "timestamp", "files": {檔名: 動作}}。
+    """
+    entries = list_snapshots(snapshot_dir)
+    chosen = select_snapshot(entries, tag=tag, at=at)
+    by_name = {e["name"]: e for e in entries}
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    actions: Dict[str, str] = {}
+    for name in TARGET_FILES:
+        segs = _segments(by_name, chosen, name)
+        path = target_dir / name
+        kind = segs[0][0]["kind"]
+        if kind == "missing":
+            if path.exists():
+                path.unlink()
+                actions[name] = "removed"
+            else:
+                actions[name] = "absent"
+        elif kind == "base":
+            actions[name] = _restore_log(path, name, segs, snapshot_dir)
+        else:
+            actions[name] = _restore_document(path, name, segs, snapshot_dir)
+    return {"snapshot": chosen["name"], "tag": chosen["tag"], "timestamp": chosen["timestamp"], "files": actions}
+
+
+def _parse_at(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Point-in-time restore of B-Phase state from delta snapshots")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--tag", help="還原到此 tag 的最新一份快照")
+    group.add_argument("--at", help="還原到此時間點（ISO 8601 或 epoch 秒）之前的最後一份快照")
+    group.add_argument("--list", action="store_true", help="列出可用的還原點")
+    parser.add_argument("--target", default=str(STATE_DIR), help="還原目的地（預設為 state/）")
+    args = parser.parse_args()
+
+    if args.list:
+        for e in list_snapshots():
+            counts = {n: r.get("count") for n, r in e["files"].items() if "count" in r}
+            print(f"{e['name']}  seq={e['seq']}  base={e['base']}  {counts}")
+        return
+    report = restore_state(tag=args.tag, at=_parse_at(args.at) if args.at else None, target_dir=Path(args.target))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
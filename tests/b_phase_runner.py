@@ -36,8 +36,8 @@ def main():
         snapshot_paths.append(p)
         print(f"[SNAPSHOT] {tag} -> {p.name}")
 
-    # 起始 snapshot
-    start_snap = take_snapshot("start")
+    # 起始 snapshot：完整基準，之後每份只記錄新增的項目
+    start_snap = take_snapshot("start", new_base=True)
     snapshot_paths.append(start_snap)
 
     # 3) 執行攻擊測試
@@ -1,11 +1,39 @@
+"""
+b_phase_snapshot.py — B-Phase 狀態快照（增量）
+
+state 目錄中的日誌都是「整檔重寫、只在尾端追加」的 JSON 陣列（json.dump 的輸出是決定性的，
+追加一筆時舊內容的位元組不變）。因此每份快照只記錄上一份快照之後新追加的項目：
+
+  {"format": "b_phase_delta/1", "tag", "timestamp", "seq",
+   "base": 本鏈第一份完整快照, "prev": 上一份快照,
+   "files": {name: 檔案紀錄}}
+
+陣列檔案紀錄：
+  kind="base"    entries = 完整陣列（鏈的起點，或前綴被改寫 / 截短時重新起算）
+  kind="append"  entries = 新追加的項目，start = 上一份的筆數
+  共同欄位：count（目前筆數）、end_offset（最後一筆結束的位元組位置）、size、
+  boundary_sha256（end_offset 前 4 KiB 的雜湊，下一份快照以此抽查前綴沒被截短或改寫）、
+  chain_sha256（sha256(上一份 chain + 本次新增的位元組)，等於逐段累積的整段前綴雜湊）
+非陣列 / 無法解析的檔案：kind="full"（完整內容）或 kind="unchanged"（sha256 未變）
+不存在的檔案：kind="missing"
+
+每份快照只讀取檔案尾端的新增區段，成本與新增量成正比，而不是與日誌總長成正比。
+鏈的狀態記在 SNAPSHOT_DIR/chain_index.json，跨程序延續；每份快照的中繼資料（不含內容）
+另追加一行到 SNAPSHOT_DIR/snapshot_log.jsonl，供 b_phase_restore 選取還原點。
+"""
+
+import hashlib
 import json
+import os
 import time
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 STATE_DIR = BASE_DIR / "state"
 SNAPSHOT_DIR = STATE_DIR / "snapshots_b_phase"
+CHAIN_INDEX = SNAPSHOT_DIR / "chain_index.json"
+SNAPSHOT_LOG = SNAPSHOT_DIR / "snapshot_log.jsonl"
 
 TARGET_FILES = [
     "meta_dag.state.json",
@@ -14,6 +42,10 @@ TARGET_FILES = [
     "tul_log.json",
 ]
 
+SNAPSHOT_FORMAT = "b_phase_delta/1"
+BOUNDARY_BYTES = 4096
+_WS = b" \t\r\n"
+
 
 def safe_load_json(path: Path):
     if not path.exists():
@@ -25,26 +57,191 @@ def safe_load_json(path: Path):
         return {"__error__": "failed_to_parse_json"}
 
 
-def take_snapshot(tag: str) -> Path:
-    """將 state 目錄中的關鍵檔案打包成單一 snapshot JSON。"""
+def load_snapshot(path: Path) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_delta_snapshot(snap: Dict[str, Any]) -> bool:
+    return snap.get("format") == SNAPSHOT_FORMAT
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _entries_end(data: bytes) -> Optional[int]:
+    """JSON 陣列中最後一筆項目結束的位置（空陣列為 '[' 之後）；不是陣列則回傳 None。"""
+    body = data.rstrip(_WS)
+    if not body.lstrip(_WS).startswith(b"[") or not body.endswith(b"]"):
+        return None
+    return len(body[:-1].rstrip(_WS))
+
+
+def _parse_region(region: bytes) -> List[Any]:
+    """解析兩個 end_offset 之間的位元組（形如 ',\\n    {...},\\n    {...}'）。"""
+    region = region.strip(_WS)
+    if region.startswith(b","):
+        region = region[1:]
+    return json.loads(b"[" + region + b"]")
+
+
+def _chain(prev_chain: Optional[str], data: bytes) -> str:
+    seed = bytes.fromhex(prev_chain) if prev_chain else b""
+    return _sha256(seed + data)
+
+
+def _load_index() -> Dict[str, Any]:
+    if not CHAIN_INDEX.exists():
+        return {}
+    try:
+        with open(CHAIN_INDEX, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path: Path, data: Dict[str, Any], indent: Optional[int] = None):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _base_record(path: Path) -> Dict[str, Any]:
+    """整檔讀取：陣列給 kind=base，其他給 kind=full。"""
+    if not path.exists():
+        return {"kind": "missing"}
+    data = path.read_bytes()
+    end = _entries_end(data)
+    if end is not None:
+        try:
+            entries = json.loads(data)
+        except ValueError:
+            entries = None
+        if isinstance(entries, list):
+            return {
+                "kind": "base",
+                "start": 0,
+                "count": len(entries),
+                "entries": entries,
+                "end_offset": end,
+                "size": len(data),
+                "boundary_sha256": _sha256(data[max(0, end - BOUNDARY_BYTES):end]),
+                "chain_sha256": _chain(None, data[:end]),
+            }
+    return {"kind": "full", "content": safe_load_json(path), "sha256": _sha256(data), "size": len(data)}
+
+
+def _delta_record(path: Path, prev: Dict[str, Any]) -> Dict[str, Any]:
+    """只讀取上一份 end_offset 之後的位元組；前綴不符時退回完整紀錄。"""
+    if not path.exists():
+        return {"kind": "missing"}
+    kind = prev.get("kind")
+    if kind in ("full", "unchanged"):
+        data = path.read_bytes()
+        if _sha256(data) == prev["sha256"]:
+            return {"kind": "unchanged", "sha256": prev["sha256"], "size": len(data)}
+        return _base_record(path)
+    if kind not in ("base", "append"):
+        return _base_record(path)
+
+    prev_end = prev["end_offset"]
+    window_start = max(0, prev_end - BOUNDARY_BYTES)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < prev_end:
+            return _base_record(path)
+        f.seek(window_start)
+        tail = f.read()
+    boundary = tail[:prev_end - window_start]
+    if _sha256(boundary) != prev["boundary_sha256"]:
+        return _base_record(path)  # 前綴被改寫（回滾 / 截短後重寫），重新起算
+    body = tail.rstrip(_WS)
+    if not body.endswith(b"]"):
+        return _base_record(path)
+    end = window_start + len(body[:-1].rstrip(_WS))
+    if end < prev_end:
+        return _base_record(path)
+    region = tail[prev_end - window_start:end - window_start]
+    try:
+        appended = _parse_region(region)
+    except ValueError:
+        return _base_record(path)
+    # end ≥ prev_end，所以新的邊界視窗一定落在已讀入的 tail 內
+    new_boundary = tail[max(0, end - BOUNDARY_BYTES) - window_start:end - window_start]
+    return {
+        "kind": "append",
+        "start": prev["count"],
+        "count": prev["count"] + len(appended),
+        "entries": appended,
+        "end_offset": end,
+        "size": size,
+        "boundary_sha256": _sha256(new_boundary),
+        "chain_sha256": _chain(prev["chain_sha256"], region),
+    }
+
+
+def _meta(record: Dict[str, Any]) -> Dict[str, Any]:
+    """寫入鏈索引的檔案狀態（不含內容）。"""
+    return {k: v for k, v in record.items() if k not in ("entries", "content")}
+
+
+def take_snapshot(tag: str, new_base: bool = False) -> Path:
+    """
+    寫出一份增量 snapshot：每個檔案只記錄上一份快照之後追加的項目。
+    new_base=True（或尚無鏈）時寫出完整的基準快照並開始新的一條鏈。
+    """
     SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    index = {} if new_base else _load_index()
+    prev_files = index.get("files", {})
+
     ts = time.time()
+    out_path = SNAPSHOT_DIR / f"snapshot_{int(ts)}_{tag}.json"
+    seq = index.get("seq", -1) + 1
     snapshot = {
+        "format": SNAPSHOT_FORMAT,
         "tag": tag,
         "timestamp": ts,
-        "files": {}
+        "seq": seq,
+        "base": index.get("base", out_path.name),
+        "prev": index.get("last"),
+        "files": {},
     }
     for name in TARGET_FILES:
         p = STATE_DIR / name
-        snapshot["files"][name] = safe_load_json(p)
-
-    out_path = SNAPSHOT_DIR / f"snapshot_{int(ts)}_{tag}.json"
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(snapshot, f, indent=2, ensure_ascii=False)
+        prev = prev_files.get(name)
+        if prev is None or prev.get("kind") == "missing":
+            record = _base_record(p)
+        else:
+            record = _delta_record(p, prev)
+        snapshot["files"][name] = record
 
+    _write_json(out_path, snapshot, indent=2)
+    files_meta = {name: _meta(r) for name, r in snapshot["files"].items()}
+    _write_json(CHAIN_INDEX, {
+        "base": snapshot["base"],
+        "last": out_path.name,
+        "seq": seq,
+        "files": files_meta,
+    })
+    header = {k: v for k, v in snapshot.items() if k != "files"}
+    with open(SNAPSHOT_LOG, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"name": out_path.name, **header, "files": files_meta}, ensure_ascii=False) + "\n")
     return out_path
 
 
+def file_length(record: Optional[Dict[str, Any]]) -> Optional[int]:
+    """快照中某個陣列檔的筆數（增量或舊版完整快照皆可）；非陣列回傳 None。"""
+    if record is None:
+        return None
+    if isinstance(record, list):  # 舊版完整快照
+        return len(record)
+    if isinstance(record, dict) and record.get("kind") in ("base", "append"):
+        return record["count"]
+    return None
+
+
 if __name__ == "__main__":
     p = take_snapshot("manual")
     print(f"Snapshot written: {p}")
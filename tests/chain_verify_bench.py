@@ -0,0 +1,136 @@
+"""
+chain_verify_bench.py — 記憶鏈驗證（engine/chain_verifier.py）
+
+用法：
+  python -m tests.chain_verify_bench                  # 100k 個節點
+  python -m tests.chain_verify_bench --nodes 500000 --workers 8
+
+以 phase2_memory_engine.append_node 相同格式產生節點（不寫入 state/），量測：
+  record        建立全部檢查點
+  incremental   只驗證最後檢查點之後的節點
+  full          從創世節點逐段驗證（單行程 / 多行程）
+正確性：竄改任一節點內容、替換檢查點上的節點、截斷鏈尾、偽造檢查點簽章都必須被偵測；
+在已竄改的鏈上建立檢查點時，record_checkpoints 必須拒絕簽章（不可讓增量驗證誤判為完整）。
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from engine.chain_verifier import (
+    GENESIS_NODE_ID,
+    ChainIntegrityError,
+    load_checkpoints,
+    record_checkpoints,
+    verify_chain,
+)
+
+KEY = bytes(range(32))
+
+
+def generate_nodes(n: int, seed: int = 20251213):
+    rng = random.Random(seed)
+    nodes = []
+    prev_id = GENESIS_NODE_ID
+    ts = 1_765_000_000.0
+    for i in range(1, n + 1):
+        ts += rng.random()
+        tul = {"P": "V4.5/GENERIC", "C": {"Original_NL": f"request {i}", "Inferred_PEC": ["PEC-0 (Generic)"]}}
+        verdict = {"Decision_Status": rng.choice(["ACCEPTED", "REJECTED_HARD_VETO"]), "L_Alpha_Score": rng.random()}
+        pra = {"Policy": "P", "Risk": "LOW", "Action": "LOG"}
+        core = json.dumps([tul, verdict, pra], sort_keys=True)
+        node_id = f"TS{int(ts)}_{hashlib.sha256(f'{ts}-{core}'.encode()).hexdigest()[:8]}"
+        nodes.append({
+            "Node_ID": node_id, "Node_Index": i, "Previous_Node_ID": prev_id, "Creation_Timestamp": ts,
+            "TUL_Input": tul, "L_Alpha_Verdict": verdict, "PRA_Final_Report": pra,
+        })
+        prev_id = node_id
+    # 與實際存檔相同：經過一次 JSON 往返
+    return json.loads(json.dumps(nodes))
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, round(time.perf_counter() - t0, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument("--interval", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    nodes = generate_nodes(args.nodes)
+    # 最後一個檢查點之後留一段未封存的尾巴
+    tail = args.interval // 2
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "checkpoints.json"
+        added, t_record = _timed(lambda: record_checkpoints(nodes[:-tail], interval=args.interval, key=KEY, path=path))
+        state = load_checkpoints(path)
+
+    report = {"nodes": len(nodes), "checkpoints": added, "record_s": t_record}
+    inc, report["incremental_s"] = _timed(lambda: verify_chain(nodes, state, KEY))
+    seq, report["full_sequential_s"] = _timed(lambda: verify_chain(nodes, state, KEY, full=True))
+    par, report["full_parallel_s"] = _timed(lambda: verify_chain(nodes, state, KEY, full=True, workers=args.workers))
+    report["incremental_nodes_checked"] = inc["nodes_checked"]
+    assert inc["ok"] and seq["ok"] and par["ok"], (inc["errors"], seq["errors"], par["errors"])
+    assert seq["tip_chain_hash"] == par["tip_chain_hash"] == inc["tip_chain_hash"]
+
+    # --- 竄改偵測 ---
+    checks = {}
+    victim = len(nodes) // 3
+    tampered = copy.deepcopy(nodes)
+    tampered[victim]["L_Alpha_Verdict"]["Decision_Status"] = "ACCEPTED_FORGED"
+    r = verify_chain(tampered, state, KEY, full=True, workers=args.workers)
+    checks["content_edit"] = any(e["position"] == victim for e in r["errors"])
+
+    tampered = copy.deepcopy(nodes)
+    cp_pos = state["checkpoints"][-1]["index"] - 1
+    tampered[cp_pos]["Node_ID"] = "TS0_forged00"
+    checks["checkpoint_node_replaced"] = not verify_chain(tampered, state, KEY)["ok"]
+
+    checks["truncated"] = not verify_chain(nodes[:len(nodes) // 2], state, KEY)["ok"]
+
+    tail_edit = copy.deepcopy(nodes)
+    tail_edit[-1]["PRA_Final_Report"]["Risk"] = "HIGH"
+    checks["tail_edit"] = not verify_chain(tail_edit, state, KEY)["ok"]
+
+    forged = copy.deepcopy(state)
+    forged["checkpoints"][0]["chain_hash"] = "0" * 64
+    checks["forged_signature"] = not verify_chain(nodes, forged, KEY)["ok"]
+
+    # 封存前就被竄改：不可簽出任何涵蓋該節點的檢查點
+    tampered = copy.deepcopy(nodes)
+    tampered[10]["L_Alpha_Verdict"]["Decision_Status"] = "ACCEPTED_FORGED"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "checkpoints.json"
+        try:
+            record_checkpoints(tampered, interval=args.interval, key=KEY, path=path)
+            refused = False
+        except ChainIntegrityError as e:
+            refused = e.added == 0 and any(err["position"] == 10 for err in e.errors)
+        pre_sealed = load_checkpoints(path)
+    checks["record_refuses_tampered"] = refused and not pre_sealed["checkpoints"]
+    checks["incremental_after_refused_record"] = not verify_chain(tampered, pre_sealed, KEY)["ok"]
+    report["tamper_detected"] = checks
+
+    print(json.dumps(report, indent=2))
+    if not all(checks.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+corpus_stream.py — 串流式語料輸出的共用元件（generate_tul_corpus / generate_attack_corpus）
+
+  BloomFilter     固定記憶體的機率式去重：依預期筆數與誤判率配置位元陣列，
+                  「已看過」可能誤判（該行被略過），但不會把重複行當成新行
+  ShardedWriter   逐行輪流寫入 N 個分片檔（先寫 .tmp，close 時 os.replace），
+                  並輸出 manifest（分片檔名、行數、產生參數），供平行的消費端各讀一片
+
+記憶體：BloomFilter ≈ -n·ln(p) / ln(2)² 位元（1M 行、p = 1e-6 約 3.4 MB），加上每個分片的寫入緩衝；
+與已輸出的行數無關。
+"""
+
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 1e-6):
+        capacity = max(1, capacity)
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> List[int]:
+        # Kirsch–Mitzenmacher：兩個 64 位元雜湊組出 k 個位置
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        h1 %= size
+        h2 = h2 % size or 1
+        positions = []
+        for _ in range(self.hashes):
+            positions.append(h1)
+            h1 = (h1 + h2) % size
+        return positions
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        """加入 item；回傳 True 表示先前（很可能）沒有出現過。"""
+        bits = self._bits
+        new = False
+        for p in self._positions(item):
+            byte, mask = p >> 3, 1 << (p & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+
+class ShardedWriter:
+    """
+    with ShardedWriter(out_dir, "TUL_1000000", shards=8) as w: w.write(line)
+    shards == 1 時檔名為 <stem>.txt（與舊版輸出相同），否則為 <stem>-00000-of-00008.txt …，
+    並另寫 <stem>.manifest.json（manifest 參數可強制開關）
+    """
+
+    def __init__(self, out_dir: Path, stem: str, shards: int = 1, manifest: Optional[bool] = None,
+                 params: Optional[Dict[str, Any]] = None, buffer_size: int = 1 << 20):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.stem = stem
+        self.shards = max(1, shards)
+        self.manifest = self.shards > 1 if manifest is None else manifest
+        self.params = params or {}
+        self.paths: List[Path] = [
+            self.out_dir / (f"{stem}.txt" if self.shards == 1 else f"{stem}-{i:05d}-of-{self.shards:05d}.txt")
+            for i in range(self.shards)
+        ]
+        self._files = [open(f"{p}.tmp", "w", encoding="utf-8", buffering=buffer_size) for p in self.paths]
+        self.counts = [0] * self.shards
+        self.total = 0
+
+    def write(self, line: str):
+        shard = self.total % self.shards
+        self._files[shard].write(line + "\n")
+        self.counts[shard] += 1
+        self.total += 1
+
+    def close(self, commit: bool = True):
+        for f in self._files:
+            f.close()
+        for p in self.paths:
+            tmp = f"{p}.tmp"
+            if commit:
+                os.replace(tmp, p)
+            else:
+                os.unlink(tmp)
+        if commit and self.manifest:
+            self.manifest_path.write_text(json.dumps({
+                "stem": self.stem,
+                "total_lines": self.total,
+                "shards": [{"file": p.name, "lines": c} for p, c in zip(self.paths, self.counts)],
+                "params": self.params,
+            }, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.out_dir / f"{self.stem}.manifest.json"
+
+    def __enter__(self) -> "ShardedWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
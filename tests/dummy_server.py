@@ -1,29 +1,280 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer
+"""
+dummy_server.py — 本機 LLM 替身（多執行緒、可設定延遲 / 串流 / 錯誤注入）
+
+用法：
+  python -m tests.dummy_server                                    # 與舊版相同：立即回 "dummy reply"
+  python -m tests.dummy_server --latency lognormal --latency-ms 300 --jitter 0.5
+  python -m tests.dummy_server --per-token-ms 20 --prefill-ms-per-token 0.5 --reply-tokens 200
+  python -m tests.dummy_server --error-rate 0.05 --error-status 503 --stall-rate 0.01 --stall-s 30
+
+介面（OpenAI chat 相容，任何 POST 路徑皆可，例如 /chat、/v1/chat/completions）：
+  請求  {"messages": [{"role": "user", "content": "..."}], "stream": false, "max_tokens": N}
+  回應  {"choices": [{"message": {"role": "assistant", "content": "..."}, "finish_reason": "stop"}], "usage": {...}}
+  stream=true 時以 chunked transfer encoding 送出 SSE：每個 token 一行 `data: {"choices": [{"delta": {...}}]}`，
+  最後 `data: [DONE]`。GET /health 回 {"status": "ok"}。
+
+延遲模型（每筆請求）：
+  首個 token 前 = 基礎延遲（--latency 分布，平均 --latency-ms）+ 輸入 token 數 × --prefill-ms-per-token
+  之後每個輸出 token 再加 --per-token-ms（非串流時累加後一次回傳）
+  分布：fixed / uniform（±jitter×平均）/ normal（σ = jitter×平均，截斷於 0）/
+        exponential / lognormal（σ = jitter，平均維持 --latency-ms）
+錯誤注入：--error-rate 機率回 --error-status（OpenAI 格式 error 物件）；
+          --stall-rate 機率在送出任何位元組前停住 --stall-s 秒（測逾時）；
+          --drop-rate 機率直接斷線（串流時送到一半才斷，測串流過濾器的截斷處理）。
+
+程式內使用：server, thread = serve_in_background(ServerConfig(latency_ms=50)) …… server.shutdown()
+"""
+
+import argparse
 import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "exponential", "lognormal")
+
+# 粗略的 token 切分：CJK 每字一個、英數連續字串一個、其他符號各一個
+_TOKEN_RE = re.compile(r"[㐀-鿿豈-﫿]|\w+|[^\w\s]")
+_PIECE_RE = re.compile(r"\s*(?:[㐀-鿿豈-﫿]|\w+|[^\w\s])")
+
+
+@dataclass
+class ServerConfig:
+    host: str = "localhost"
+    port: int = 8000
+    reply: str = "dummy reply"
+    reply_tokens: int = 0              # >0：重複 reply 的 token 直到這個長度（受請求的 max_tokens 限制）
+    latency: str = "fixed"
+    latency_ms: float = 0.0
+    jitter: float = 0.0
+    per_token_ms: float = 0.0
+    prefill_ms_per_token: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 500
+    stall_rate: float = 0.0
+    stall_s: float = 30.0
+    drop_rate: float = 0.0
+    seed: Optional[int] = None
+    quiet: bool = True
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text)
+
+
+def sample_latency_ms(cfg: ServerConfig, rng: random.Random) -> float:
+    mean = cfg.latency_ms
+    if mean <= 0:
+        return 0.0
+    if cfg.latency == "fixed":
+        return mean
+    if cfg.latency == "uniform":
+        return max(0.0, rng.uniform(mean * (1 - cfg.jitter), mean * (1 + cfg.jitter)))
+    if cfg.latency == "normal":
+        return max(0.0, rng.gauss(mean, mean * cfg.jitter))
+    if cfg.latency == "exponential":
+        return rng.expovariate(1.0 / mean)
+    if cfg.latency == "lognormal":
+        sigma = cfg.jitter
+        return rng.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma)
+    raise ValueError(f"unknown latency distribution: {cfg.latency}")
+
+
+def build_reply(cfg: ServerConfig, max_tokens: Optional[int]) -> List[str]:
+    """回覆的 token 序列（串接後即完整內容；英數 token 之間保留空白）。"""
+    base = _PIECE_RE.findall(cfg.reply) or [cfg.reply]
+    pieces = base
+    if cfg.reply_tokens:
+        pieces = [base[i % len(base)] for i in range(cfg.reply_tokens)]
+        # 重複時在每一輪開頭補空白，避免前後兩輪黏成一個字
+        for i in range(len(base), len(pieces), len(base)):
+            pieces[i] = " " + pieces[i].lstrip()
+    if max_tokens:
+        pieces = pieces[:max_tokens]
+    return pieces
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, cfg: ServerConfig):
+        super().__init__((cfg.host, cfg.port), Handler)
+        self.cfg = cfg
+        self._rng = random.Random(cfg.seed)
+        self._rng_lock = threading.Lock()
+        self.counters = {"requests": 0, "errors": 0, "stalls": 0, "drops": 0, "streamed": 0}
+
+    def plan(self, prompt_tokens: int) -> Tuple[str, float]:
+        """抽出這筆請求的命運（ok / error / stall / drop）與首 token 延遲（秒）。"""
+        cfg = self.cfg
+        with self._rng_lock:
+            self.counters["requests"] += 1
+            roll = self._rng.random()
+            ttft_ms = sample_latency_ms(cfg, self._rng) + prompt_tokens * cfg.prefill_ms_per_token
+            if roll < cfg.error_rate:
+                fate = "error"
+            elif roll < cfg.error_rate + cfg.stall_rate:
+                fate = "stall"
+            elif roll < cfg.error_rate + cfg.stall_rate + cfg.drop_rate:
+                fate = "drop"
+            else:
+                fate = "ok"
+            if fate != "ok":
+                self.counters[fate + "s"] += 1
+        return fate, ttft_ms / 1000.0
+
 
 class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StandInServer
+
+    def log_message(self, format, *args):
+        if not self.server.cfg.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: Dict[str, Any]):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            self._send_json(200, {"status": "ok", "counters": dict(self.server.counters)})
+        else:
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
     def do_POST(self):
-        # 讀取請求
+        cfg = self.server.cfg
         length = int(self.headers.get("Content-Length", 0))
-        data = self.rfile.read(length)
+        raw = self.rfile.read(length)
+        try:
+            data = json.loads(raw or b"{}")
+        except ValueError:
+            data = {}
+        messages = data.get("messages") or []
+        prompt = "".join(str(m.get("content", "")) for m in messages if isinstance(m, dict))
+        prompt_tokens = len(tokenize(prompt))
+
+        fate, ttft_s = self.server.plan(prompt_tokens)
+        if fate == "stall":
+            time.sleep(cfg.stall_s)
+            self.close_connection = True
+            return
+        time.sleep(ttft_s)
+        if fate == "error":
+            self._send_json(cfg.error_status, {"error": {
+                "message": "injected error", "type": "server_error", "code": cfg.error_status}})
+            return
 
-        # 固定回傳格式（模擬 openai/chat）
-        reply = {
-            "choices": [
-                {"message": {"content": "dummy reply"}}
-            ]
-        }
+        pieces = build_reply(cfg, data.get("max_tokens"))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(pieces),
+                 "total_tokens": prompt_tokens + len(pieces)}
 
-        response = json.dumps(reply).encode("utf-8")
+        if data.get("stream"):
+            self._stream(pieces, drop=(fate == "drop"))
+            return
 
+        time.sleep(len(pieces) * cfg.per_token_ms / 1000.0)
+        if fate == "drop":
+            self.close_connection = True
+            return
+        self._send_json(200, {
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(pieces)},
+                         "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def _stream(self, pieces: List[str], drop: bool):
+        cfg = self.server.cfg
+        with self.server._rng_lock:
+            self.server.counters["streamed"] += 1
         self.send_response(200)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(response)))
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
         self.end_headers()
-        self.wfile.write(response)
+
+        def chunk(payload: str):
+            data = payload.encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        cut = len(pieces) // 2 if drop else None
+        try:
+            for i, piece in enumerate(pieces):
+                if i == cut:
+                    self.close_connection = True
+                    return
+                if i:
+                    time.sleep(cfg.per_token_ms / 1000.0)
+                event = {"object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+            final = {"object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            chunk(f"data: {json.dumps(final)}\n\n")
+            chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+def serve_in_background(cfg: ServerConfig) -> Tuple[StandInServer, threading.Thread]:
+    """在背景執行緒啟動（port=0 時由系統分配，實際位址見 server.server_address）。"""
+    server = StandInServer(cfg)
+    thread = threading.Thread(target=server.serve_forever, name="dummy-server", daemon=True)
+    thread.start()
+    return server, thread
+
+
+def main():
+    d = ServerConfig()
+    parser = argparse.ArgumentParser(description="Local LLM stand-in server")
+    parser.add_argument("--host", default=d.host)
+    parser.add_argument("--port", type=int, default=d.port)
+    parser.add_argument("--reply", default=d.reply)
+    parser.add_argument("--reply-tokens", type=int, default=d.reply_tokens, help="回覆長度（token）；0 = 原樣回傳 --reply")
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default=d.latency)
+    parser.add_argument("--latency-ms", type=float, default=d.latency_ms, help="首 token 前的平均基礎延遲")
+    parser.add_argument("--jitter", type=float, default=d.jitter, help="分布寬度（見說明）")
+    parser.add_argument("--per-token-ms", type=float, default=d.per_token_ms)
+    parser.add_argument("--prefill-ms-per-token", type=float, default=d.prefill_ms_per_token)
+    parser.add_argument("--error-rate", type=float, default=d.error_rate)
+    parser.add_argument("--error-status", type=int, default=d.error_status)
+    parser.add_argument("--stall-rate", type=float, default=d.stall_rate)
+    parser.add_argument("--stall-s", type=float, default=d.stall_s)
+    parser.add_argument("--drop-rate", type=float, default=d.drop_rate)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="印出每筆請求的 access log")
+    args = parser.parse_args()
+
+    cfg = ServerConfig(
+        host=args.host, port=args.port, reply=args.reply, reply_tokens=args.reply_tokens,
+        latency=args.latency, latency_ms=args.latency_ms, jitter=args.jitter,
+        per_token_ms=args.per_token_ms, prefill_ms_per_token=args.prefill_ms_per_token,
+        error_rate=args.error_rate, error_status=args.error_status,
+        stall_rate=args.stall_rate, stall_s=args.stall_s, drop_rate=args.drop_rate,
+        seed=args.seed, quiet=not args.verbose,
+    )
+    server = StandInServer(cfg)
+    host, port = server.server_address[:2]
+    print(f"Dummy server listening on http://{host}:{port}/chat")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
 
 if __name__ == "__main__":
-    print("Dummy server listening on http://localhost:8000/chat")
-    server = HTTPServer(("localhost", 8000), Handler)
-    server.serve_forever()
+    main()
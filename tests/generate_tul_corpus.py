@@ -1,4 +1,12 @@
-import sys, os, random, pathlib
+import sys, os, random, pathlib, argparse
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from tests.corpus_stream import BloomFilter, ShardedWriter
+
+OUT_DIR = pathlib.Path("tests/pressure_cases_tul_full")
+MAX_STACK = 6            # 疊加 fuzz 的最大層數
+MAX_REJECTS = 100_000    # 連續這麼多筆都是重複 → 視為已窮盡可產生的變體
 
 def load_seed(path):
     lines = []
@@ -11,85 +19,94 @@ def load_seed(path):
 
 
 # ====== 基本 fuzz 種類（非語意改寫，不破壞 prompt） ======
-def fuzz_one(line):
-    variants = []
-
+FUZZ_OPS = [
     # 1) 加入前置空白／換行
-    variants.append(" " + line)
-    variants.append("\t" + line)
-
+    lambda line: " " + line,
+    lambda line: "\t" + line,
     # 2) 加入後置空白
-    variants.append(line + " ")
-    variants.append(line + "\t")
-
+    lambda line: line + " ",
+    lambda line: line + "\t",
     # 3) 加上 harmless noise token
-    variants.append(f"[NOISE]{line}")
-    variants.append(f"{line}[NOISE]")
-
+    lambda line: f"[NOISE]{line}",
+    lambda line: f"{line}[NOISE]",
     # 4) 加符號 padding
-    variants.append("※" + line)
-    variants.append(line + "※")
-
+    lambda line: "※" + line,
+    lambda line: line + "※",
     # 5) 加括號
-    variants.append("(" + line + ")")
-    variants.append("【" + line + "】")
-
+    lambda line: "(" + line + ")",
+    lambda line: "【" + line + "】",
     # 6) unicode 變體
-    variants.append("​" + line)   # zero-width space
-    variants.append(line + "​")   # zero-width space
+    lambda line: "\u200b" + line,   # zero-width space
+    lambda line: line + "\u200b",   # zero-width space
+]
 
-    # 7) duplicate
-    variants.append(line + " " + line)
+# 7) duplicate（長度加倍，不參與疊加）
+def duplicate(line):
+    return line + " " + line
 
-    # 保留原句
-    variants.append(line)
-
-    return list(set(variants))   # 去重
 
+def fuzz_one(line):
+    variants = [op(line) for op in FUZZ_OPS] + [duplicate(line), line]   # 保留原句
+    return list(dict.fromkeys(variants))   # 去重（保留順序）
 
-def build_corpus(seed_lines, target_count=2000):
-    all_variants = []
 
+def iter_variants(seed_lines, rng):
+    """
+    無窮的變體流：先是每個種子的單層 fuzz（與舊版相同的集合），
+    之後隨機挑種子疊加 2..MAX_STACK 層 fuzz。
+    """
     for line in seed_lines:
-        fv = fuzz_one(line)
-        all_variants.extend(fv)
-
-    # 去重
-    all_variants = list(set(all_variants))
-
-    # 不夠 → 隨機補滿
-    if len(all_variants) < target_count:
-        while len(all_variants) < target_count:
-            all_variants.append(random.choice(all_variants))
-
-    # 太多 → 截斷
-    return all_variants[:target_count]
+        yield from fuzz_one(line)
+    while True:
+        line = rng.choice(seed_lines)
+        for _ in range(rng.randint(2, MAX_STACK)):
+            line = rng.choice(FUZZ_OPS)(line)
+        yield line
 
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: py generate_tul_corpus.py <seed_file> <count>")
+def iter_corpus(seed_lines, target_count, seed=0, error_rate=1e-6):
+    """依序產生最多 target_count 筆不重複的變體（記憶體只有 Bloom filter）。"""
+    if not seed_lines:
         return
+    rng = random.Random(seed)
+    seen = BloomFilter(target_count + len(seed_lines) * (len(FUZZ_OPS) + 2), error_rate)
+    produced = 0
+    rejects = 0
+    for line in iter_variants(seed_lines, rng):
+        if seen.add(line):
+            yield line
+            produced += 1
+            rejects = 0
+            if produced >= target_count:
+                return
+        else:
+            rejects += 1
+            if rejects >= MAX_REJECTS:
+                print(f"[WARN] variants exhausted after {produced} unique lines")
+                return
 
-    seed_path = sys.argv[1]
-    count = int(sys.argv[2])
 
-    seed_lines = load_seed(seed_path)
+def main():
+    parser = argparse.ArgumentParser(usage="py generate_tul_corpus.py <seed_file> <count> [--shards N] [--seed S]")
+    parser.add_argument("seed_file")
+    parser.add_argument("count", type=int)
+    parser.add_argument("--seed", type=int, default=0, help="隨機種子（同參數輸出逐位元組相同）")
+    parser.add_argument("--shards", type=int, default=1, help="輸出分片數（>1 時另寫 manifest）")
+    parser.add_argument("--out-dir", default=str(OUT_DIR))
+    parser.add_argument("--error-rate", type=float, default=1e-6, help="Bloom filter 誤判率")
+    args = parser.parse_args()
+
+    seed_lines = list(dict.fromkeys(load_seed(args.seed_file)))
     print(f"[INFO] Seed loaded: {len(seed_lines)} lines")
 
-    corpus = build_corpus(seed_lines, count)
-
-    out_dir = pathlib.Path("tests/pressure_cases_tul_full")
-    out_dir.mkdir(exist_ok=True, parents=True)
-
-    out_file = out_dir / f"TUL_{count}.txt"
-
-    with open(out_file, "w", encoding="utf-8") as f:
-        for l in corpus:
-            f.write(l + "\n")
+    params = {"seed_file": args.seed_file, "count": args.count, "seed": args.seed, "error_rate": args.error_rate}
+    with ShardedWriter(pathlib.Path(args.out_dir), f"TUL_{args.count}", args.shards, params=params) as out:
+        for line in iter_corpus(seed_lines, args.count, args.seed, args.error_rate):
+            out.write(line)
 
-    print(f"[DONE] Generated {len(corpus)} lines")
-    print(f"[OUT]  {out_file}")
+    print(f"[DONE] Generated {out.total} lines")
+    for path in out.paths:
+        print(f"[OUT]  {path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,293 @@
+"""
+load_generator.py — 開迴路（open-loop）負載產生器 + 飽和吞吐量搜尋
+
+既有的 attack_test / b_phase_attack_test / pressure_test_runner 都是閉迴路：上一筆做完才送下一筆，
+引擎變慢時送出速率跟著變慢，排隊延遲被藏起來（coordinated omission）。
+這裡依到達過程預先排好每筆的「預定送出時間」，不論引擎是否跟得上都照時間送出，
+延遲一律從預定時間算到完成時間。
+
+用法：
+  python -m tests.load_generator --rate 20 --duration 10                  # 單一速率
+  python -m tests.load_generator --rate 20 --arrival bursty --burst-size 8
+  python -m tests.load_generator --search --start-rate 5 --max-rate 400   # 找飽和吞吐量
+  python -m tests.load_generator --search --admission                     # 經過 AdmissionController（含卸載）
+
+到達過程：
+  poisson   指數分布間隔，平均速率 = rate
+  bursty    每批 burst-size 筆同時到達，批次本身為 Poisson（平均速率仍 = rate）
+  constant  固定間隔
+
+量測（每個速率一個獨立的 state 目錄，見 tests/stage_pipeline.isolate_state）：
+  corrected   預定送出 → 完成（含排隊與送出端落後；CO 修正後的延遲）
+  service     開始處理 → 完成（不含排隊；閉迴路工具實際上只量得到這一段）
+  queue_wait  進入佇列 → 開始處理（AdmissionController 回傳的 queue_wait_ms）
+  另有各階段延遲（total = 單筆服務時間）、卸載數（--admission）、--drain 秒內未完成的逾時數
+引擎的狀態檔是 read-modify-write 且沒有檔案鎖，同一行程內一次只執行一筆；
+--workers > 1 只增加等待中的 worker，不會讓服務並行。
+
+飽和搜尋：速率每步乘以 --growth，直到某一步不再「可承受」（有逾時、卸載 > 1%、完成速率 < 0.95 × 到達率、
+或 corrected p99 > --slo-ms），
+再在最後可承受與第一個不可承受的速率之間二分 --refine 次；飽和吞吐量 = 可承受步驟中實際完成速率的最大值。
+輸出：終端表格 + tests/pressure_reports/load_generator_<UTC 時間>.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from engine.admission_control import AdmissionController
+from engine.memory.metrics import Histogram
+from tests.stage_benchmark import load_corpus
+from tests.stage_pipeline import StageTimer, isolate_state, run_case, seed_state
+
+REPORT_DIR = ROOT / "tests" / "pressure_reports"
+QUANTILES = (0.50, 0.90, 0.99, 0.999)
+MAX_SHED_FRACTION = 0.01
+MIN_THROUGHPUT_RATIO = 0.95
+
+
+# ---------- 到達過程 ----------
+def arrival_times(kind: str, rate: float, duration: float, rng: random.Random, burst_size: int = 8) -> List[float]:
+    """[0, duration) 內每筆請求的預定送出時間（相對秒數，遞增）。"""
+    times: List[float] = []
+    if kind == "constant":
+        step = 1.0 / rate
+        t = 0.0
+        while t < duration:
+            times.append(t)
+            t += step
+    elif kind == "poisson":
+        t = rng.expovariate(rate)
+        while t < duration:
+            times.append(t)
+            t += rng.expovariate(rate)
+    elif kind == "bursty":
+        t = rng.expovariate(rate / burst_size)
+        while t < duration:
+            times.extend([t] * burst_size)
+            t += rng.expovariate(rate / burst_size)
+    else:
+        raise ValueError(f"unknown arrival process: {kind}")
+    return times
+
+
+def _percentiles_ms(hist: Histogram) -> Dict[str, float]:
+    if not hist.count:
+        return {}
+    pct = hist.percentiles(QUANTILES)
+    out = {f"p{q * 100:g}": round(pct[q] / 1000, 3) for q in QUANTILES}
+    out["max"] = round(hist.max / 1000, 3)
+    out["mean"] = round(hist.total / hist.count / 1000, 3)
+    return out
+
+
+# ---------- 單一速率 ----------
+def run_step(rate: float, duration: float, arrival: str, corpus: List[str], workers: int,
+             admission: bool, drain_s: float, seed: int, burst_size: int = 8, seed_records: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    schedule = arrival_times(arrival, rate, duration, rng, burst_size)
+    state_dir = Path(tempfile.mkdtemp(prefix="load_generator_"))
+    history = seed_state(state_dir, seed_records) if seed_records else None
+    isolate_state(state_dir)
+
+    timer = StageTimer()
+    corrected, service, queue_wait = Histogram(), Histogram(), Histogram()
+    lock = threading.Lock()
+    engine_lock = threading.Lock()
+    abandoned = threading.Event()
+    counts = {"offered": len(schedule), "completed": 0, "shed": 0, "errors": 0}
+    last_done = [0.0]
+    all_done = threading.Event()
+    if not schedule:
+        all_done.set()
+
+    def handler(text):
+        if abandoned.is_set():
+            raise TimeoutError("abandoned after drain timeout")
+        with engine_lock:
+            return run_case(text, timer, dag_history=history)
+
+    if admission:
+        controller = AdmissionController(handler, workers=workers)
+    else:
+        # 不限速、佇列夠大：只剩 worker 數這個容量限制
+        controller = AdmissionController(handler, workers=workers, max_queue=len(schedule) + 1,
+                                         rate_per_source=1e12, burst=len(schedule) + 1)
+
+    def on_done(future, intended: float):
+        now = time.perf_counter()
+        try:
+            result = future.result()
+        except Exception:
+            result = None
+        with lock:
+            if abandoned.is_set():
+                return
+            if result is None:
+                counts["errors"] += 1
+            elif not result["admitted"]:
+                counts["shed"] += 1
+            else:
+                counts["completed"] += 1
+                corrected.record(int((now - intended) * 1_000_000))
+                service.record(int(result["service_ms"] * 1000))
+                queue_wait.record(int(result["queue_wait_ms"] * 1000))
+                last_done[0] = max(last_done[0], now)
+            if counts["completed"] + counts["shed"] + counts["errors"] == counts["offered"]:
+                all_done.set()
+
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        start = time.perf_counter() + 0.05
+        for i, offset in enumerate(schedule):
+            intended = start + offset
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            future = controller.submit("load_generator", corpus[i % len(corpus)])
+            future.add_done_callback(lambda f, t=intended: on_done(f, t))
+        all_done.wait(timeout=drain_s)
+        with lock:
+            abandoned.set()
+            finished = dict(counts)
+            end = last_done[0]
+        # 逾時未處理的請求在 handler 內直接丟棄；等 worker 結束再刪 state 目錄
+        controller.shutdown(wait=True)
+
+    timeouts = finished["offered"] - finished["completed"] - finished["shed"] - finished["errors"]
+    shutil.rmtree(state_dir, ignore_errors=True)
+
+    # 完成速率的分母至少是送出期間本身（最後一筆到達早於 duration 時不高估）
+    span = max(duration, end - start) if finished["completed"] else 0.0
+    corrected_pct = _percentiles_ms(corrected)
+    throughput = round(finished["completed"] / span, 2) if span else 0.0
+    # 佇列在 --drain 內清空仍不夠：完成速率也必須跟得上到達率
+    sustained = (
+        timeouts == 0
+        and finished["errors"] == 0
+        and finished["shed"] <= MAX_SHED_FRACTION * max(1, finished["offered"])
+        and throughput >= MIN_THROUGHPUT_RATIO * finished["offered"] / duration
+    )
+    return {
+        "offered_rate": rate,
+        "arrival": arrival,
+        "duration_s": duration,
+        **finished,
+        "timeouts": timeouts,
+        "throughput": throughput,
+        "latency_corrected_ms": corrected_pct,
+        "service_ms": _percentiles_ms(service),
+        "queue_wait_ms": _percentiles_ms(queue_wait),
+        "stages": timer.summary(),
+        "sustained": sustained,
+    }
+
+
+def _within_slo(step: Dict[str, Any], slo_ms: float) -> bool:
+    p99 = step["latency_corrected_ms"].get("p99")
+    return step["sustained"] and p99 is not None and p99 <= slo_ms
+
+
+def find_saturation(args, corpus) -> Dict[str, Any]:
+    steps: List[Dict[str, Any]] = []
+
+    def step(rate: float) -> bool:
+        r = run_step(rate, args.duration, args.arrival, corpus, args.workers, args.admission,
+                     args.drain, args.seed, args.burst_size, args.seed_records)
+        r["ok"] = _within_slo(r, args.slo_ms)
+        steps.append(r)
+        print_step(r)
+        return r["ok"]
+
+    good: Optional[float] = None
+    bad: Optional[float] = None
+    rate = args.start_rate
+    while rate <= args.max_rate:
+        if step(rate):
+            good = rate
+            rate *= args.growth
+        else:
+            bad = rate
+            break
+    if good is not None and bad is not None:
+        for _ in range(args.refine):
+            mid = (good + bad) / 2
+            if step(mid):
+                good = mid
+            else:
+                bad = mid
+
+    sustained = [s for s in steps if s["ok"]]
+    return {
+        "saturation_throughput": max((s["throughput"] for s in sustained), default=0.0),
+        "max_sustained_offered_rate": good,
+        "first_unsustained_offered_rate": bad,
+        "steps": steps,
+    }
+
+
+def print_step(r: Dict[str, Any]):
+    c, sv = r["latency_corrected_ms"], r["service_ms"]
+    flag = "ok " if r.get("ok", r["sustained"]) else "SAT"
+    print(f"[{flag}] offered {r['offered_rate']:8.2f}/s  done {r['throughput']:8.2f}/s  "
+          f"n={r['completed']}/{r['offered']} shed={r['shed']} timeout={r['timeouts']}  "
+          f"corrected p50/p99={c.get('p50', '-')}/{c.get('p99', '-')} ms  "
+          f"service p99={sv.get('p99', '-')} ms", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load generator for the governance pipeline")
+    parser.add_argument("--rate", type=float, default=20.0, help="單一速率模式的平均到達率（筆/秒）")
+    parser.add_argument("--duration", type=float, default=10.0, help="每個速率送出請求的秒數")
+    parser.add_argument("--arrival", choices=["poisson", "bursty", "constant"], default="poisson")
+    parser.add_argument("--burst-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1, help="AdmissionController 的 worker 執行緒數")
+    parser.add_argument("--admission", action="store_true", help="經過預設參數的 AdmissionController（會卸載）")
+    parser.add_argument("--drain", type=float, default=30.0, help="送完後等待未完成請求的秒數")
+    parser.add_argument("--seed-records", type=int, default=0, help="每個速率起始的 TUL / PRA / DAG 筆數")
+    parser.add_argument("--seed", type=int, default=20251213)
+    parser.add_argument("--search", action="store_true", help="搜尋飽和吞吐量")
+    parser.add_argument("--start-rate", type=float, default=5.0)
+    parser.add_argument("--max-rate", type=float, default=1000.0)
+    parser.add_argument("--growth", type=float, default=2.0)
+    parser.add_argument("--refine", type=int, default=3)
+    parser.add_argument("--slo-ms", type=float, default=1000.0, help="corrected p99 上限")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    if args.search:
+        report = find_saturation(args, corpus)
+        print(f"\n[load_generator] saturation throughput ≈ {report['saturation_throughput']} cases/s "
+              f"(sustained offered {report['max_sustained_offered_rate']}, "
+              f"failed at {report['first_unsustained_offered_rate']})")
+    else:
+        step = run_step(args.rate, args.duration, args.arrival, corpus, args.workers, args.admission,
+                        args.drain, args.seed, args.burst_size, args.seed_records)
+        step["ok"] = _within_slo(step, args.slo_ms)
+        print_step(step)
+        report = {"steps": [step]}
+
+    report["params"] = vars(args)
+    report["generated_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    out = Path(args.out) if args.out else REPORT_DIR / f"load_generator_{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[load_generator] JSON: {out}")
+
+
+if __name__ == "__main__":
+    main()
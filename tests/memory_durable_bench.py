@@ -0,0 +1,177 @@
+"""
+memory_durable_bench.py — 時間分區持久層（engine/memory/durable_store.py）
+
+用法：
+  python -m tests.memory_durable_bench                 # 200k 張卡，跨 30 天
+  python -m tests.memory_durable_bench --cards 1000000
+
+量測：
+  bulk insert    log_system_events_batch 的持久寫入（1000 筆 / 批，每分區一次交易）
+  rehydrate      重啟時由分區檔重建記憶體索引（全部 / 只載入最近 3 天的熱區間）
+  range scan     單日時間區間計數：分區裁剪 vs 全部分區；以及串流組卡
+  retention      丟棄最舊 7 天分區 + 重建索引
+正確性：重建後的 CardStore 與寫入前逐欄相同（依 (timestamp, event_id) 順序），
+治理決策跨重啟保留，區間掃描筆數與線性計數相同；重複 event_id 在持久層與索引都只保留先寫入的一筆；
+熱區間重建只開啟與區間重疊的分區；重啟後熱區間之前的冷資料仍可由涵蓋它的 time_range 查詢
+（與索引結果合併）與治理反饋存取。
+"""
+
+import argparse
+import json
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from engine.memory.card_store import timestamp_key
+from engine.memory.durable_store import PartitionedStore
+from engine.memory.memory_manager import INarrativeEventSender, MemoryCard, MemoryManager
+from tests.memory_footprint_bench import BASE_TIME, generate_cards
+
+DAYS = 30
+
+
+class _NullSender(INarrativeEventSender):
+    def send_event(self, event_type, memory_id, context, api_version=INarrativeEventSender.API_VERSION):
+        return True
+
+
+def _cards(n: int):
+    """generate_cards 的卡片，時間改為均勻分布在 DAYS 天內。"""
+    step = timedelta(days=DAYS) / n
+    for i, card in enumerate(generate_cards(n)):
+        yield MemoryCard(**{**card.__dict__, "timestamp": BASE_TIME + step * i})
+
+
+def _row(card):
+    return (card.event_id, card.timestamp, card.event_type, card.severity, card.description,
+            card.dag_hash, tuple(card.indexed_keywords))
+
+
+def run(n: int) -> dict:
+    root = tempfile.mkdtemp(prefix="memory_durable_")
+    report = {"cards": n}
+    try:
+        cards = list(_cards(n))
+        mgr = MemoryManager(_NullSender(), durable_dir=root)
+        t0 = time.perf_counter()
+        for i in range(0, n, 1000):
+            batch = cards[i:i + 1000]
+            mgr._durable.insert_many(batch)
+            mgr._index.add_many(batch)
+        report["bulk_insert_s"] = round(time.perf_counter() - t0, 2)
+        report["partitions"] = len(mgr._durable.partitions())
+
+        feedback = [(c.event_id, "APPROVED") for c in cards[:1000]]
+        mgr.receive_feedback_batch(feedback)
+        mgr.close()
+
+        t0 = time.perf_counter()
+        mgr = MemoryManager(_NullSender(), durable_dir=root)
+        report["rehydrate_s"] = round(time.perf_counter() - t0, 2)
+        expected = sorted(cards, key=lambda c: (c.timestamp, c.event_id))
+        store = mgr._memory_store
+        assert len(store) == n, (len(store), n)
+        assert all(_row(a) == _row(b) for a, b in zip(store, expected)), "rehydrated cards differ"
+        assert all(store.decision(store.slot_of(eid)) == d for eid, d in feedback), "decisions lost"
+
+        durable: PartitionedStore = mgr._durable
+        day_start = timestamp_key(BASE_TIME + timedelta(days=10))
+        day_end = timestamp_key(BASE_TIME + timedelta(days=11)) - 1
+        linear = sum(1 for c in cards if day_start <= timestamp_key(c.timestamp) <= day_end)
+
+        t0 = time.perf_counter()
+        pruned = durable.count(day_start, day_end)
+        report["range_count_pruned_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        t0 = time.perf_counter()
+        unpruned = 0
+        for start, _ in durable.partitions():
+            # 對照組：不做分區裁剪，每個分區都查同一區間
+            with durable._lock:
+                unpruned += durable._conn(start, create=False).execute(
+                    "SELECT COUNT(*) FROM memory_cards WHERE ts >= ? AND ts <= ?", (day_start, day_end)).fetchone()[0]
+        report["range_count_all_partitions_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        t0 = time.perf_counter()
+        streamed = sum(1 for _ in durable.iter_range(day_start, day_end))
+        report["range_stream_cards_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        assert pruned == linear == unpruned == streamed, (pruned, linear, unpruned, streamed)
+        report["range_rows"] = pruned
+
+        # 重複 event_id：持久層與索引都保留先寫入的一筆
+        dup = MemoryCard(**{**cards[0].__dict__, "description": "duplicate"})
+        durable.insert_many([dup])
+        mgr._index.add(dup)
+        assert len(store) == durable.count() == n, (len(store), durable.count(), n)
+        assert store[store.slot_of(dup.event_id)].description == cards[0].description
+        assert next(durable.iter_range(end_key=timestamp_key(cards[0].timestamp)))[0].description == cards[0].description
+
+        # 熱區間：只載入最後 3 天，較舊的分區不會被開啟
+        hot_days = (datetime.utcnow() - (BASE_TIME + timedelta(days=DAYS - 3))) / timedelta(days=1)
+        t0 = time.perf_counter()
+        hot = MemoryManager(_NullSender(), durable_dir=root, retention_days=hot_days + DAYS, hot_days=hot_days)
+        report["rehydrate_hot_3d_s"] = round(time.perf_counter() - t0, 2)
+        report["rehydrate_hot_partitions_opened"] = len(hot._durable._conns)
+        assert len(hot._memory_store) == sum(1 for c in cards if timestamp_key(c.timestamp) >= hot._loaded_since)
+        assert report["rehydrate_hot_partitions_opened"] < report["partitions"]
+
+        # 冷資料（熱區間之前、保留期限之內）：涵蓋它的 time_range 查詢由持久層補上，反饋回落到持久層
+        def expected(lo_days, hi_days):
+            lo = timestamp_key(BASE_TIME + timedelta(days=lo_days))
+            hi = timestamp_key(BASE_TIME + timedelta(days=hi_days))
+            return [c.event_id for c in sorted(cards, key=lambda c: (c.timestamp, c.event_id))
+                    if lo <= timestamp_key(c.timestamp) <= hi]
+
+        def time_range(lo_days, hi_days):
+            return {"start": (BASE_TIME + timedelta(days=lo_days)).isoformat(),
+                    "end": (BASE_TIME + timedelta(days=hi_days)).isoformat()}
+
+        t0 = time.perf_counter()
+        top = [r["event_id"] for r in hot.retrieve_relevant_memories({"time_range": time_range(10, 11)})]
+        report["cold_query_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        assert top == expected(10, 11)[:100]
+        t0 = time.perf_counter()
+        spanning = [r["event_id"] for r in hot.iter_relevant_memories({"time_range": time_range(DAYS - 5, DAYS - 1)})]
+        report["cold_hot_spanning_stream_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        assert spanning == expected(DAYS - 5, DAYS - 1), "cold + hot range differs"
+        report["cold_hot_spanning_rows"] = len(spanning)
+        probe = next(c for c in cards[:100] if c.indexed_keywords)
+        by_kw = hot.retrieve_relevant_memories({"time_range": time_range(0, 1), "keywords": [probe.indexed_keywords[0]]})
+        assert probe.event_id in {r["event_id"] for r in by_kw}
+
+        cold_ts = timestamp_key(cards[5].timestamp)
+        assert hot.receive_feedback(cards[5].event_id, "VETOED", {})
+        batch = hot.receive_feedback_batch([(cards[6].event_id, "VETOED"), ("no-such-event", "VETOED")])
+        assert batch["applied_count"] == 1 and batch["unknown_event_ids"] == ["no-such-event"], batch
+        decisions = {card.event_id: d for card, d in durable.iter_range(cold_ts - 1, timestamp_key(cards[6].timestamp))}
+        assert decisions[cards[5].event_id] == decisions[cards[6].event_id] == "VETOED", decisions
+        hot.close()
+
+        durable.retention_days = DAYS
+        t0 = time.perf_counter()
+        report["retention_dropped_partitions"] = mgr.enforce_retention(BASE_TIME + timedelta(days=DAYS + 7))
+        report["retention_s"] = round(time.perf_counter() - t0, 2)
+        cutoff = timestamp_key(BASE_TIME + timedelta(days=7))
+        assert len(mgr._memory_store) == sum(1 for c in cards if timestamp_key(c.timestamp) >= cutoff)
+        mgr.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=200000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    print(json.dumps(run(args.cards), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+memory_footprint_bench.py — 記憶卡儲存的記憶體佔用（tracemalloc）
+
+用法：
+  python -m tests.memory_footprint_bench                 # 1M 張卡
+  python -m tests.memory_footprint_bench --cards 200000
+
+比較三種寫法保留下來的記憶體（不含產生卡片時的暫存物件）：
+  list[MemoryCard]  原本的 _memory_store
+  CardStore         欄式儲存本體
+  MemoryIndex       CardStore + event_type / severity / keyword / 時間索引
+"""
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from engine.memory.card_store import CardStore
+from engine.memory.memory_index import MemoryIndex
+from engine.memory.memory_manager import MemoryCard
+
+EVENT_TYPES = ["VETO_APPLIED", "EXTERNAL_FAILURE", "NOISE_BLOCKED", "INTERNAL_ANOMALY"]
+SEVERITIES = ["low", "medium", "high"]
+WORDS = ["drift", "veto", "node", "pec", "anomaly", "external", "timeout", "noise", "blocked", "rollback",
+         "snapshot", "governance", "threshold", "arbitration", "latency", "retry", "policy", "memory"]
+BASE_TIME = datetime(2025, 12, 1)
+
+
+def generate_cards(n: int, seed: int = 20251213) -> Iterator[MemoryCard]:
+    """與 MemoryManager._create_and_encrypt_card 相同形狀的卡片（uuid4 字串、小寫關鍵字）。"""
+    rng = random.Random(seed)
+    for i in range(n):
+        words = rng.sample(WORDS, 4)
+        description = f"{' '.join(words)} node-{rng.getrandbits(32):08x}"
+        yield MemoryCard(
+            event_id=str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            timestamp=BASE_TIME + timedelta(microseconds=i * 1500),
+            event_type=rng.choice(EVENT_TYPES),
+            severity=rng.choice(SEVERITIES),
+            description=description,
+            dag_hash=f"{rng.getrandbits(64):016x}" if rng.random() < 0.3 else None,
+            indexed_keywords=list(set(description.lower().split())),
+        )
+
+
+def _as_list(cards: Iterator[MemoryCard]) -> Any:
+    return list(cards)
+
+
+def _as_store(cards: Iterator[MemoryCard]) -> Any:
+    store = CardStore(MemoryCard)
+    for card in cards:
+        store.append(card)
+    return store
+
+
+def _as_index(cards: Iterator[MemoryCard]) -> Any:
+    index = MemoryIndex(MemoryCard)
+    for card in cards:
+        index.add(card)
+    return index
+
+
+def measure(build: Callable[[Iterator[MemoryCard]], Any], n: int) -> Dict[str, Any]:
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    holder = build(generate_cards(n))
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del holder
+    gc.collect()
+    return {
+        "retained_mb": round(current / 2**20, 1),
+        "peak_mb": round(peak / 2**20, 1),
+        "bytes_per_card": round(current / n, 1),
+        "build_s": round(elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    report = {"cards": args.cards}
+    for name, build in (("list[MemoryCard]", _as_list), ("CardStore", _as_store), ("MemoryIndex", _as_index)):
+        report[name] = measure(build, args.cards)
+        print(f"[footprint] {name:<17} {report[name]}")
+
+    base = report["list[MemoryCard]"]["retained_mb"]
+    report["store_vs_list"] = round(base / report["CardStore"]["retained_mb"], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
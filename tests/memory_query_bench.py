@@ -0,0 +1,263 @@
+"""
+memory_query_bench.py — MemoryManager 索引查詢：正確性比對 + 延遲基準
+
+用法：
+  python -m tests.memory_query_bench                  # 200k 張卡
+  python -m tests.memory_query_bench --cards 1000000  # 契約規模
+  python -m tests.memory_query_bench --verify         # 只做線性掃描比對
+
+正確性：隨機組合 event_types / severity / time_range / keywords，
+索引查詢結果必須與線性掃描（原始 TODO 語義）逐筆相同、順序相同；
+帶 keywords 時對照組以暴力法計算 BM25 排序；
+時間戳完全遞增與含晚到事件兩種寫入型態都要比對。
+分頁：iter_relevant_memories 以隨機頁大小逐頁取完，須等於線性掃描依 (timestamp, event_id) 排序的全部結果。
+延遲：retrieve_relevant_memories 每種查詢型態的 p50 / p95（契約 P95 < 100 ms），
+retrieve_memories_page 深度串流的每頁延遲，
+以及 receive_feedback_batch（1000 筆 event_id 主鍵點查 + 寫入決策）。
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from collections import Counter
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from engine.memory.keyword_index import BM25_B, BM25_K1, tokenize
+from engine.memory.memory_manager import INarrativeEventSender, MemoryCard, MemoryManager, MetaDAGError
+
+EVENT_TYPES = ["VETO_APPLIED", "EXTERNAL_FAILURE", "NOISE_BLOCKED", "INTERNAL_ANOMALY"]
+SEVERITY_WEIGHTS = {"low": 0.80, "medium": 0.17, "high": 0.03}
+VOCAB = [f"term{i}" for i in range(5000)]
+BASE_TIME = datetime(2025, 12, 1)
+
+
+class _NullSender(INarrativeEventSender):
+    def send_event(self, event_type, memory_id, context, api_version=INarrativeEventSender.API_VERSION):
+        return True
+
+
+def build_manager(n: int, late_ratio: float = 0.01, seed: int = 20251213) -> MemoryManager:
+    rng = random.Random(seed)
+    mgr = MemoryManager(_NullSender())
+    severities = list(SEVERITY_WEIGHTS)
+    weights = list(SEVERITY_WEIGHTS.values())
+    for i in range(n):
+        # 大致遞增、偶爾亂序的時間戳（模擬晚到事件）
+        jitter = rng.randint(-30, 0) if rng.random() < late_ratio else 0
+        words = rng.sample(VOCAB[: 50 + (i % 4950)], 3)
+        # 關鍵字在描述中重複出現、描述長度不一 → BM25 的 tf / 文件長度都有差異
+        filler = ["event", str(i)] + ["detail"] * rng.randint(0, 6)
+        mgr._index.add(MemoryCard(
+            timestamp=BASE_TIME + timedelta(seconds=i + jitter),
+            event_type=rng.choice(EVENT_TYPES),
+            severity=rng.choices(severities, weights)[0],
+            description=" ".join(words + rng.choices(words, k=rng.randint(0, 4)) + filler),
+            indexed_keywords=words,
+        ))
+    return mgr
+
+
+def random_query(rng: random.Random, n: int) -> Dict[str, Any]:
+    q: Dict[str, Any] = {}
+    if rng.random() < 0.6:
+        q["event_types"] = rng.sample(EVENT_TYPES, rng.randint(1, 2))
+    if rng.random() < 0.5:
+        q["severity"] = rng.sample(list(SEVERITY_WEIGHTS), rng.randint(1, 2))
+    if rng.random() < 0.5:
+        start = rng.randint(0, n)
+        q["time_range"] = {
+            "start": (BASE_TIME + timedelta(seconds=start)).isoformat(),
+            "end": (BASE_TIME + timedelta(seconds=start + rng.randint(0, n // 4 + 1))).isoformat(),
+        }
+    if rng.random() < 0.5:
+        q["keywords"] = [kw.upper() if rng.random() < 0.2 else kw for kw in rng.sample(VOCAB, rng.randint(1, 3))]
+    return q
+
+
+def bm25_reference(cards: List[MemoryCard], terms: List[str]) -> Dict[str, float]:
+    """對照組 BM25：逐卡計算（tf / 文件長度取自描述斷詞）。"""
+    doc_len = [max(1, len(tokenize(c.description))) for c in cards]
+    avg = sum(doc_len) / len(cards)
+    n = len(cards)
+    scores: Dict[str, float] = {}
+    for term in terms:
+        df = sum(1 for c in cards if term in c.indexed_keywords)
+        idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+        for c, dl in zip(cards, doc_len):
+            if term in c.indexed_keywords:
+                tf = max(1, Counter(tokenize(c.description))[term])
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * dl / avg)
+                scores[c.event_id] = scores.get(c.event_id, 0.0) + idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+    return scores
+
+
+def linear_scan(cards: List[MemoryCard], query: Dict[str, Any]) -> List[str]:
+    """對照組：原始 TODO 的逐條篩選語義；帶 keywords 時依 BM25 排序。"""
+    results = [c for c in cards if c.event_type in query.get("event_types", [c.event_type])]
+    time_range = query.get("time_range")
+    if time_range:
+        start = datetime.fromisoformat(time_range["start"])
+        end = datetime.fromisoformat(time_range["end"])
+        results = [c for c in results if start <= c.timestamp <= end]
+    severity = query.get("severity")
+    if severity:
+        results = [c for c in results if c.severity in severity]
+    keywords = query.get("keywords", [])
+    if keywords:
+        results = [c for c in results if any(kw.lower() in c.indexed_keywords for kw in keywords)]
+        order = {c.event_id: i for i, c in enumerate(cards)}
+        terms = list(dict.fromkeys(kw.lower() for kw in keywords))
+        scores = bm25_reference(cards, terms)
+        results.sort(key=lambda c: (-round(scores[c.event_id], 9), order[c.event_id]))
+    return [c.event_id for c in results[: min(query.get("limit", 100), 100)]]
+
+
+def linear_scan_all(cards: List[MemoryCard], query: Dict[str, Any]) -> List[str]:
+    """對照組（分頁）：同樣的篩選、不截斷，依 (timestamp, event_id) 排序。"""
+    results = [c for c in cards if c.event_type in query.get("event_types", [c.event_type])]
+    time_range = query.get("time_range")
+    if time_range:
+        start = datetime.fromisoformat(time_range["start"])
+        end = datetime.fromisoformat(time_range["end"])
+        results = [c for c in results if start <= c.timestamp <= end]
+    severity = query.get("severity")
+    if severity:
+        results = [c for c in results if c.severity in severity]
+    keywords = query.get("keywords", [])
+    if keywords:
+        results = [c for c in results if any(kw.lower() in c.indexed_keywords for kw in keywords)]
+    return [c.event_id for c in sorted(results, key=lambda c: (c.timestamp, c.event_id))]
+
+
+def indexed(mgr: MemoryManager, query: Dict[str, Any]) -> List[str]:
+    try:
+        return [r["event_id"] for r in mgr.retrieve_relevant_memories(query)]
+    except MetaDAGError as e:
+        if e.error_code == "MEMORY_NOT_FOUND":
+            return []
+        raise
+
+
+def verify(mgr: MemoryManager, queries: int, seed: int = 7) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    cards = list(mgr._memory_store)  # 一次組出全部 view，對照組不受惰性讀取影響
+    n = len(cards)
+    mismatches = []
+    for i in range(queries):
+        q = random_query(rng, n)
+        if indexed(mgr, q) != linear_scan(cards, q):
+            mismatches.append(q)
+        if i % 5 == 0:
+            page_size = rng.choice([1, 7, 100])
+            if page_size == 1:
+                q.setdefault("severity", ["high"])  # 頁大小 1 只比對小結果集
+            streamed = [r["event_id"] for r in mgr.iter_relevant_memories(q, page_size=page_size)]
+            if streamed != linear_scan_all(cards, q):
+                mismatches.append({"paged": page_size, **q})
+
+    page = mgr.retrieve_memories_page({"severity": ["low"]}, page_size=10)
+    try:
+        mgr.retrieve_memories_page({"severity": ["high"]}, cursor=page["next_cursor"])
+        mismatches.append({"cursor_reuse": "accepted a cursor issued for another query"})
+    except MetaDAGError as e:
+        if e.error_code != "INVALID_CURSOR":
+            raise
+    return {"queries": queries, "mismatches": mismatches[:5], "mismatch_count": len(mismatches)}
+
+
+def _pct(values: List[float], q: float) -> float:
+    s = sorted(values)
+    return round(s[min(len(s) - 1, int(q * len(s)))], 3)
+
+
+def run_bench(mgr: MemoryManager, rounds: int = 200, seed: int = 11) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    n = len(mgr._memory_store)
+    mid = BASE_TIME + timedelta(seconds=n // 2)
+    shapes = {
+        "event_type": lambda: {"event_types": [rng.choice(EVENT_TYPES)]},
+        "severity_high": lambda: {"severity": ["high"]},
+        "time_1h": lambda: {"time_range": {"start": mid.isoformat(), "end": (mid + timedelta(hours=1)).isoformat()}},
+        "keyword": lambda: {"keywords": [rng.choice(VOCAB)]},
+        "type+severity+time": lambda: {
+            "event_types": ["VETO_APPLIED"],
+            "severity": ["high"],
+            "time_range": {"start": mid.isoformat(), "end": (mid + timedelta(days=1)).isoformat()},
+        },
+        "rare_keyword+high": lambda: {"keywords": [rng.choice(VOCAB[4900:])], "severity": ["high"]},
+    }
+    report = {}
+    for name, make in shapes.items():
+        samples = []
+        for _ in range(rounds):
+            q = make()
+            t0 = time.perf_counter()
+            indexed(mgr, q)
+            samples.append((time.perf_counter() - t0) * 1000)
+        report[name] = {"p50_ms": _pct(samples, 0.50), "p95_ms": _pct(samples, 0.95)}
+
+    samples = []
+    for _ in range(max(1, rounds // 10)):
+        batch = [(mgr._memory_store.event_id(rng.randrange(n)), "ACCEPTED") for _ in range(1000)]
+        t0 = time.perf_counter()
+        mgr.receive_feedback_batch(batch)
+        samples.append((time.perf_counter() - t0) * 1000)
+    report["feedback_batch_1000"] = {"p50_ms": _pct(samples, 0.50), "p95_ms": _pct(samples, 0.95)}
+
+    # 深度串流：每頁 100 筆，最多走 500 頁（50k 筆）
+    for name, q in (("page_stream_low", {"severity": ["low"]}),
+                    ("page_stream_high_type", {"severity": ["high"], "event_types": ["VETO_APPLIED"]})):
+        samples = []
+        cursor = None
+        for _ in range(500):
+            t0 = time.perf_counter()
+            page = mgr.retrieve_memories_page(q, cursor=cursor)
+            samples.append((time.perf_counter() - t0) * 1000)
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        report[name] = {"pages": len(samples), "p50_ms": _pct(samples, 0.50), "p95_ms": _pct(samples, 0.95)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=300, help="線性掃描比對的隨機查詢數")
+    parser.add_argument("--verify", action="store_true", help="只做正確性比對（預設 20k 張卡）")
+    args = parser.parse_args()
+
+    logging.getLogger("engine.memory.memory_manager").setLevel(logging.CRITICAL)
+
+    n = 20_000 if args.verify else args.cards
+    t0 = time.perf_counter()
+    mgr = build_manager(n)
+    print(f"[build] {n} cards in {time.perf_counter() - t0:.1f}s")
+
+    for late_ratio in (0.0, 0.01):
+        result = verify(build_manager(min(n, 20_000), late_ratio), args.queries)
+        status = "PASS" if not result["mismatch_count"] else "FAIL"
+        print(f"[verify] late={late_ratio} {status} "
+              f"{result['queries'] - result['mismatch_count']}/{result['queries']} identical to linear scan")
+        if result["mismatch_count"]:
+            print(json.dumps(result["mismatches"], indent=2, ensure_ascii=False))
+            sys.exit(1)
+
+    if args.verify:
+        return
+
+    print(json.dumps({"cards": n, "latency": run_bench(mgr)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,28 @@
 """
-pressure_test_runner.py — 強化版（安全補丁 + PRA diff + snapshot）
+pressure_test_runner.py — 分片平行版（每個 worker 獨立 state 目錄 + 逐階段延遲直方圖）
 可跑：
 - smoke（50）
 - endurance（500–800）
 - final（5000）
 
+案例以 round-robin 分給 --workers 個行程；每個 worker 以 tests/stage_pipeline.isolate_state
+把 TUL / PRA / DAG 狀態寫到自己的暫存目錄（互不鎖檔、不碰 state/，也不需要中途刪除過大的 log），
+逐筆記錄 wall-clock 與 CPU 時間，並回傳各階段的延遲直方圖供主行程合併。
+
+報告：吞吐量、每筆延遲的 p50 / p95 / p99 / max（wall 與 CPU）、各階段分位數與累積直方圖。
+
 不修改主引擎。
 """
 
 import sys, os, json, shutil
 from pathlib import Path
 import argparse
+import tempfile
 import time
-import importlib
+import contextlib
+import io
+import math
+from concurrent.futures import ProcessPoolExecutor
 
 # =========================================================
 #  路徑設置（重要！確保 engine 可被 import）
@@ -26,14 +36,13 @@ REPORT_DIR = ROOT / "tests" / "pressure_reports"
 REPORT_DIR.mkdir(parents=True, exist_ok=True)
 
 # =========================================================
-#  載入真引擎
+#  載入治理管線
 # =========================================================
 ENGINE_AVAILABLE = False
 ENGINE_IMPORT_ERROR = None
-run_model = None
 
 try:
-    from engine.engine_v2 import run_model
+    from tests.stage_pipeline import STAGES, StageTimer, isolate_state, run_case, seed_state
     ENGINE_AVAILABLE = True
 except Exception as e:
     ENGINE_IMPORT_ERROR = repr(e)
@@ -56,106 +65,102 @@ SMOKE_CASES = [
 ENDURANCE_CASES = SMOKE_CASES * 12   # 500–800
 FINAL_CASES = SMOKE_CASES * 100      # ≈ 5000
 
-# =========================================================
-#  安全補丁：PRA / JSON / snapshot / diff
-# =========================================================
-
-def pra_file():
-    return ROOT / "state" / "pra_log.json"
-
-
-def check_pra_safety():
-    """若 PRA 大於 100 KB，警告但不終止"""
-    f = pra_file()
-    if f.exists():
-        size_kb = f.stat().st_size / 1024
-        if size_kb > 100:
-            print(f"[WARN] PRA Log size high: {size_kb:.1f} KB")
-
-
-def snapshot_pra(tag: str):
-    f = pra_file()
-    if f.exists():
-        dest = REPORT_DIR / f"pra_{tag}.json"
-        shutil.copy(f, dest)
-
-
-def diff_pra(a: Path, b: Path):
-    """簡易 diff：回傳行數差值"""
-    if not a.exists() or not b.exists():
-        return "N/A"
-
-    with open(a, "r", encoding="utf-8") as f1:
-        l1 = f1.readlines()
-    with open(b, "r", encoding="utf-8") as f2:
-        l2 = f2.readlines()
-
-    return len(l2) - len(l1)
-
-
-def reset_pra():
-    """Stage3 前清空 PRA（5000 條不會爆）"""
-    f = pra_file()
-    if f.exists():
-        f.unlink()
-        print("[SAFE] PRA reset before final stage")
-
-
-def clean_logs():
-    """避免 TUL/PRA 過大，在壓力測試中自動清理"""
-    state_dir = ROOT / "state"
-    for name in ["pra_log.json", "tul_log.json"]:
-        f = state_dir / name
-        if f.exists() and f.stat().st_size > 200 * 1024:
-            print(f"[CLEAN] truncate {name}")
-            f.unlink()
+STAGE_CASES = {"smoke": SMOKE_CASES, "endurance": ENDURANCE_CASES, "final": FINAL_CASES}
 
-# =========================================================
-#  單筆測試
-# =========================================================
-def run_single_case(text: str):
-    if not ENGINE_AVAILABLE:
-        return {"error": "engine_not_available"}
-
-    try:
-        out = run_model(text)
-        return {"ok": True, "output": out}
-    except Exception as e:
-        return {"ok": False, "error": repr(e)}
+TAIL_QUANTILES = (0.50, 0.95, 0.99)
 
 # =========================================================
-#  批量執行（Stage2 / Stage3）
+#  Worker（每個行程一個分片）
 # =========================================================
-def run_batch(cases, stage: str):
+def run_shard(worker_id: int, shard, state_root: str, seed_records: int = 0):
+    """
+    在獨立 state 目錄中依序執行 shard = [(case_index, text), ...]。
+    回傳 (worker_id, 逐筆結果, StageTimer.to_state())。
+    """
+    state_dir = Path(state_root) / f"worker_{worker_id:02d}"
+    history = seed_state(state_dir, seed_records) if seed_records else None
+    isolate_state(state_dir)
+    timer = StageTimer()
     results = []
-    n = len(cases)
-
-    for i, text in enumerate(cases):
-        r = run_single_case(text)
-        results.append(r)
-
-        check_pra_safety()
-
-        # 每 100 條保護 PRA
-        if (i + 1) % 100 == 0:
-            tag_prev = f"{stage}_{i-99}"
-            tag_now  = f"{stage}_{i+1}"
-
-            snapshot_pra(tag_prev)
-            snapshot_pra(tag_now)
 
-            delta = diff_pra(
-                REPORT_DIR / f"pra_{tag_prev}.json",
-                REPORT_DIR / f"pra_{tag_now}.json",
-            )
-
-            print(f"[PRA diff] {tag_prev} → {tag_now}: Δ={delta} lines")
+    # 引擎的 veto / 分類訊息會印到 stdout；丟棄以免多個 worker 交錯輸出
+    with contextlib.redirect_stdout(io.StringIO()):
+        for index, text in shard:
+            wall0 = time.perf_counter()
+            cpu0 = time.process_time()
+            try:
+                out = run_case(text, timer, dag_history=history)
+                r = {"ok": True, "decision": out["decision"], "code": out["code"]}
+            except Exception as e:
+                r = {"ok": False, "error": repr(e)}
+            r["index"] = index
+            r["worker"] = worker_id
+            r["wall_ms"] = round((time.perf_counter() - wall0) * 1000, 3)
+            r["cpu_ms"] = round((time.process_time() - cpu0) * 1000, 3)
+            results.append(r)
+
+    return worker_id, results, timer.to_state()
+
+# =========================================================
+#  批量執行（分片 + 合併）
+# =========================================================
+def _quantiles(values, quantiles=TAIL_QUANTILES):
+    """精確分位數（nearest-rank）；每筆 wall / cpu 都保留，不需要近似。"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    out = {f"p{int(q * 100)}": ordered[max(0, math.ceil(q * len(ordered)) - 1)] for q in quantiles}
+    out["max"] = ordered[-1]
+    out["mean"] = round(sum(ordered) / len(ordered), 3)
+    return out
+
+
+def run_batch(cases, stage: str, workers: int = 1, seed_records: int = 0, keep_state: bool = False):
+    if not ENGINE_AVAILABLE:
+        return {"error": "engine_not_available", "detail": ENGINE_IMPORT_ERROR}
 
-        # 每 200 條清理一次超大 log
-        if (i + 1) % 200 == 0:
-            clean_logs()
+    workers = max(1, min(workers, len(cases)))
+    shards = [[(i, text) for i, text in enumerate(cases) if i % workers == w] for w in range(workers)]
+    state_root = tempfile.mkdtemp(prefix=f"pressure_{stage}_")
 
-    return results
+    timer = StageTimer()
+    results = []
+    started = time.perf_counter()
+    try:
+        if workers == 1:
+            outputs = [run_shard(0, shards[0], state_root, seed_records)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(run_shard, w, shards[w], state_root, seed_records) for w in range(workers)]
+                outputs = [f.result() for f in futures]
+        wall_s = time.perf_counter() - started
+        for _, shard_results, timer_state in outputs:
+            results.extend(shard_results)
+            timer.merge(StageTimer.from_state(timer_state))
+    finally:
+        if keep_state:
+            print(f"[pressure_test] worker state kept in {state_root}")
+        else:
+            shutil.rmtree(state_root, ignore_errors=True)
+
+    results.sort(key=lambda r: r["index"])
+    ok = sum(1 for r in results if r["ok"])
+    stages = timer.summary()
+    return {
+        "stage": stage,
+        "workers": workers,
+        "seed_records": seed_records,
+        "total_cases": len(results),
+        "ok": ok,
+        "errors": len(results) - ok,
+        "wall_s": round(wall_s, 3),
+        "throughput_cases_per_s": round(len(results) / wall_s, 2) if wall_s > 0 else None,
+        "case_wall_ms": _quantiles([r["wall_ms"] for r in results]),
+        "case_cpu_ms": _quantiles([r["cpu_ms"] for r in results]),
+        "stages": stages,
+        "stage_histograms_ms": {name: timer.histogram_ms(name) for name in stages},
+        "cases": results,
+    }
 
 # =========================================================
 #  報告生成 (JSON + MD)
@@ -170,7 +175,30 @@ def write_report(stage: str, data):
 
     with open(md_path, "w", encoding="utf-8") as f:
         f.write(f"# Pressure Test Report — {stage}\n\n")
-        f.write(f"Total Cases: {len(data)}\n")
+        if "error" in data:
+            f.write(f"Engine not available: {data.get('detail')}\n")
+        else:
+            f.write(f"Total Cases: {data['total_cases']} (ok {data['ok']}, errors {data['errors']})\n")
+            f.write(f"Workers: {data['workers']}, seeded records per worker: {data['seed_records']}\n")
+            f.write(f"Wall time: {data['wall_s']:.2f} s, throughput: {data['throughput_cases_per_s']} cases/s\n\n")
+
+            f.write("## Per-case latency (ms)\n\n| | p50 | p95 | p99 | max | mean |\n|---|---|---|---|---|---|\n")
+            for label, key in (("wall", "case_wall_ms"), ("cpu", "case_cpu_ms")):
+                q = data[key]
+                f.write(f"| {label} | {q['p50']} | {q['p95']} | {q['p99']} | {q['max']} | {q['mean']} |\n")
+
+            f.write("\n## Per-stage latency (ms)\n\n| stage | count | p50 | p95 | p99 | max |\n|---|---|---|---|---|---|\n")
+            for name in STAGES + ["total"]:
+                s = data["stages"].get(name)
+                if s:
+                    f.write(f"| {name} | {s['count']} | {s['p50_ms']} | {s['p95_ms']} | {s['p99_ms']} | {s['max_ms']} |\n")
+
+            f.write("\n## Per-stage histograms (cumulative count ≤ bound, ms)\n\n")
+            for name in STAGES + ["total"]:
+                hist = data["stage_histograms_ms"].get(name)
+                if hist:
+                    cells = ", ".join(f"{k[3:]}: {v}" for k, v in hist.items())
+                    f.write(f"- **{name}**: {cells}\n")
 
     print(f"[pressure_test] JSON report: {json_path}")
     print(f"[pressure_test] MD   report: {md_path}")
@@ -181,27 +209,19 @@ def write_report(stage: str, data):
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--stage", choices=["smoke", "endurance", "final"], default="smoke")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker 行程數（每個有獨立 state）")
+    parser.add_argument("--seed-records", type=int, default=0, help="每個 worker 起始的 TUL / PRA / DAG 筆數")
+    parser.add_argument("--keep-state", action="store_true", help="保留 worker 的 state 目錄以供檢查")
     args = parser.parse_args()
 
     stage = args.stage
-
-    if stage == "smoke":
-        print(f"\n=== Stage: smoke | cases: {len(SMOKE_CASES)} ===")
-        data = run_batch(SMOKE_CASES, "smoke")
-        write_report("smoke", data)
-
-    elif stage == "endurance":
-        print(f"\n=== Stage: endurance | cases: {len(ENDURANCE_CASES)} ===")
-        data = run_batch(ENDURANCE_CASES, "endurance")
-        write_report("endurance", data)
-
-    elif stage == "final":
-        print("\n[SAFE] Stage3：先重置 PRA")
-        reset_pra()
-
-        print(f"=== Stage: final | cases: {len(FINAL_CASES)} ===")
-        data = run_batch(FINAL_CASES, "final")
-        write_report("final", data)
+    cases = STAGE_CASES[stage]
+    print(f"\n=== Stage: {stage} | cases: {len(cases)} | workers: {args.workers} ===")
+    data = run_batch(cases, stage, workers=args.workers, seed_records=args.seed_records, keep_state=args.keep_state)
+    if "error" not in data:
+        print(f"[pressure_test] {data['ok']}/{data['total_cases']} ok, {data['throughput_cases_per_s']} cases/s, "
+              f"wall p99 {data['case_wall_ms']['p99']} ms")
+    write_report(stage, data)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,7 @@
 # ===============================================
 #  quality_check.py
 #  語料庫品質檢查工具（攻擊壓力測試前使用）
-#  - 去重 / 過短句 / 相似度過高
+#  - 去重 / 過短句 / 相似度過高（MinHash + LSH，逐 bucket 驗證，記憶體 O(n)）
 #  - H / S 熵值檢查
 #  - 產生 JSON + MD 報告
 # ===============================================
@@ -10,8 +10,11 @@ import os
 import time
 import json
 import math
+import random
+from collections import defaultdict
+from operator import eq
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Optional
 
 # -----------------------------------
 BASE_DIR = Path(__file__).resolve().parent
@@ -25,6 +28,16 @@ SIM_THRESHOLD = 0.75
 # 最小字數
 MIN_LEN = 4
 
+# MinHash / LSH 參數：128 個雜湊 = 16 band × 8 row
+# banding 的 S 曲線門檻 ≈ (1/16)^(1/8) ≈ 0.71，貼近 SIM_THRESHOLD（16 × 4 的門檻約 0.5，
+# 大量 Jaccard 0.5–0.7 的配對也成為候選，驗證成本隨語料近似平方成長）
+# Jaccard 0.75 的配對至少落在同一 bucket 一次的機率 ≈ 1 - (1 - 0.75^8)^16 ≈ 81%，0.8 ≈ 95%，0.9 ≈ 99.99%
+MINHASH_PERMS = 128
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMS // LSH_BANDS
+MINHASH_SEED = 20251213
+_MERSENNE_P = (1 << 61) - 1
+
 
 # -----------------------------------
 # 工具函数
@@ -54,6 +67,110 @@ def jaccard(a: str, b: str) -> float:
     return len(sa & sb) / len(sa | sb)
 
 
+# -----------------------------------
+# 相似句偵測（MinHash + LSH banding）
+# -----------------------------------
+
+class MinHasher:
+    """
+    字元集合的 MinHash 簽章：h_i(c) = (a_i * ord(c) + b_i) mod p，簽章 = 每個 i 在集合上的最小值。
+    每個字元的 perms 個雜湊值只算一次（語料的字元表很小），集合簽章為各字元向量的逐項最小值。
+    """
+
+    def __init__(self, perms: int = MINHASH_PERMS, seed: int = MINHASH_SEED):
+        rng = random.Random(seed)
+        self._params = [(rng.randrange(1, _MERSENNE_P), rng.randrange(0, _MERSENNE_P)) for _ in range(perms)]
+        self._char_cache: Dict[str, Tuple[int, ...]] = {}
+
+    def _char_hashes(self, c: str) -> Tuple[int, ...]:
+        hashes = self._char_cache.get(c)
+        if hashes is None:
+            x = ord(c)
+            hashes = tuple((a * x + b) % _MERSENNE_P for a, b in self._params)
+            self._char_cache[c] = hashes
+        return hashes
+
+    def signature(self, chars: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(map(min, zip(*(self._char_hashes(c) for c in chars))))
+
+
+def band_keys(signature: Tuple[int, ...], bands: int = LSH_BANDS, rows: int = LSH_ROWS) -> Tuple[int, ...]:
+    """簽章切成 bands 段，每段的雜湊值即該 band 的 bucket 鍵。"""
+    return tuple(hash(signature[b * rows:(b + 1) * rows]) for b in range(bands))
+
+
+def iter_similar_charset_pairs(
+    charsets: List[frozenset],
+    threshold: float = SIM_THRESHOLD,
+    bands: int = LSH_BANDS,
+    rows: int = LSH_ROWS,
+    stats: Optional[Dict[str, int]] = None,
+) -> Iterator[Tuple[int, int, float]]:
+    """
+    逐一產生不同字元集合之間 Jaccard ≥ threshold 的配對 (i, j, sim)，i、j 不分先後。
+    逐 band、逐 bucket 就地以精確 Jaccard 驗證，不建立全域候選集合：記憶體只有每個集合的
+    band 鍵與當前 band 的 bucket 表（O(n)）。同一配對只在它第一個共同 band 驗證一次；
+    bucket 內依集合大小排序，|B| > |A| / threshold 的配對不可能達到門檻，直接跳過。
+    stats 若提供，累計 candidates（實際驗證的配對數）。
+    """
+    hasher = MinHasher(perms=bands * rows)
+    keys = [band_keys(hasher.signature(cs), bands, rows) for cs in charsets]
+    lens = [len(cs) for cs in charsets]
+    checked = 0
+    for b in range(bands):
+        # bucket 以 band 的雜湊值為鍵，只有真的碰撞時才建立成員清單：
+        # 十萬筆的 dict-of-list 會讓循環 GC 反覆掃描，拖慢數倍（雜湊碰撞的誤候選會被精確 Jaccard 濾掉）
+        first: Dict[int, int] = {}
+        shared: Dict[int, List[int]] = {}
+        for i, k in enumerate(keys):
+            key = k[b]
+            j = first.setdefault(key, i)
+            if j != i:
+                shared.setdefault(key, [j]).append(i)
+        del first
+        for members in shared.values():
+            members.sort(key=lens.__getitem__)
+            for x, i in enumerate(members):
+                a, la, ki = charsets[i], lens[i], keys[i][:b]
+                limit = la / threshold
+                for j in members[x + 1:]:
+                    lb = lens[j]
+                    if lb > limit:
+                        break
+                    if b and any(map(eq, ki, keys[j])):
+                        continue  # 先前的 band 已驗證過這一對
+                    checked += 1
+                    inter = len(a & charsets[j])
+                    sim = inter / (la + lb - inter)
+                    if sim >= threshold:
+                        yield i, j, sim
+        del shared
+    if stats is not None:
+        stats["candidates"] = stats.get("candidates", 0) + checked
+
+
+def find_similar_pairs(sentences: Iterable[str], threshold: float = SIM_THRESHOLD,
+                       stats: Optional[Dict[str, int]] = None) -> int:
+    """
+    相異句子之間字符集 Jaccard ≥ threshold 的配對數（不會多算；LSH 可能漏掉少數剛過門檻的配對，
+    漏失率見 LSH 參數說明）。
+    字元集合相同的句子先分組：組內兩兩 Jaccard = 1，直接以組合數計入，不進 LSH。
+    stats 若提供，另填 charsets（相異字元集合數）與 candidates（驗證的配對數）。
+    """
+    groups: Dict[frozenset, int] = defaultdict(int)
+    for s in set(sentences):
+        groups[frozenset(s)] += 1
+    charsets = list(groups)
+    sizes = [groups[cs] for cs in charsets]
+
+    if stats is not None:
+        stats["charsets"] = len(charsets)
+    count = sum(k * (k - 1) // 2 for k in sizes)
+    for i, j, _ in iter_similar_charset_pairs(charsets, threshold, stats=stats):
+        count += sizes[i] * sizes[j]
+    return count
+
+
 def entropy(s: str) -> float:
     """
     極簡字符熵估計
@@ -136,19 +253,9 @@ def analyze_corpus() -> Tuple[Dict, Dict]:
     meta["duplicate_count"] = len(all_sentences) - len(unique)
 
     # -------------------
-    # 相似度檢查（全檔案交叉比較）
+    # 相似度檢查（全檔案交叉比較，MinHash + LSH）
     # -------------------
-    similar_pairs = []
-    uni_list = list(unique)
-    N = len(uni_list)
-
-    for i in range(N):
-        for j in range(i + 1, N):
-            sim = jaccard(uni_list[i], uni_list[j])
-            if sim >= SIM_THRESHOLD:
-                similar_pairs.append((uni_list[i], uni_list[j], sim))
-
-    meta["similar_pairs"] = len(similar_pairs)
+    meta["similar_pairs"] = find_similar_pairs(unique, SIM_THRESHOLD)
 
     # -------------------
     # 高熵語料分析（適用 H / S）
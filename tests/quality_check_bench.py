@@ -0,0 +1,175 @@
+"""
+quality_check_bench.py — quality_check 相似句偵測（MinHash + LSH）的規模與正確性基準
+
+用法：
+  python -m tests.quality_check_bench                           # 合成 1k / 10k / 100k 行 + 攻擊語料 100k 行
+  python -m tests.quality_check_bench --sizes 1000,5000 --exact-max 5000 --attack-lines 0
+  python -m tests.quality_check_bench --sizes "" --attack-dir /tmp/attack_100k   # generate_attack_corpus --out-dir 的輸出
+
+語料：
+  synthetic  以固定種子產生類攻擊語料的合成句子（8–30 字、3000 字元的字表），其中 --dup-ratio
+             比例是先前句子的改寫（替換 / 插入 / 刪除 1–3 字），另外混入完全相同字元集合的重排句，
+             確保每個規模都有需要找出的相似配對。
+  attack     generate_attack_corpus 的變形器（與 --scale 輸出相同）產生的實際攻擊語料，固定種子打散後取
+             --attack-lines 行；或讀取 --attack-dir 內的 *.txt。同一種子句的變形彼此高度相似，
+             相似配對數本身隨行數近似平方成長，是 LSH 驗證成本的實際上限。
+量測：每個語料 find_similar_pairs 的耗時、配對數、LSH 驗證的候選數與行程的最大 RSS。
+正確性：規模 ≤ --exact-max 時以原本的逐對 jaccard() 計算精確配對數，報告召回率
+（LSH 不會產生誤判，只可能漏掉極少數配對）。
+輸出：終端表格 + tests/pressure_reports/quality_check_bench_<UTC 時間>.json
+"""
+
+import argparse
+import json
+import math
+import random
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tests import generate_attack_corpus as attack_gen
+from tests.corpus_stream import BloomFilter
+from tests.quality_check import SIM_THRESHOLD, find_similar_pairs, jaccard, load_file
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_ATTACK_LINES = 100_000
+REPORT_DIR = ROOT / "tests" / "pressure_reports"
+ALPHABET = [chr(0x4E00 + i) for i in range(3000)]
+
+
+def synth_corpus(n: int, dup_ratio: float, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    lines: List[str] = []
+    for _ in range(n):
+        if lines and rng.random() < dup_ratio:
+            chars = list(rng.choice(lines))
+            if rng.random() < 0.2:
+                rng.shuffle(chars)          # 字元集合不變
+            else:
+                for _ in range(rng.randint(1, 3)):
+                    op = rng.random()
+                    pos = rng.randrange(len(chars))
+                    if op < 0.4:
+                        chars[pos] = rng.choice(ALPHABET)
+                    elif op < 0.7 or len(chars) <= 8:
+                        chars.insert(pos, rng.choice(ALPHABET))
+                    else:
+                        del chars[pos]
+            lines.append("".join(chars))
+        else:
+            lines.append("".join(rng.choice(ALPHABET) for _ in range(rng.randint(8, 30))))
+    return lines
+
+
+def attack_corpus(n: int, seed: int) -> List[str]:
+    """generate_attack_corpus 以足夠的 --scale 產生各類別，固定種子打散後取前 n 行。"""
+    scale = math.ceil(n / sum(attack_gen.TARGET_PER_CLASS.values()))
+    lines: List[str] = []
+    for name, base_target in attack_gen.TARGET_PER_CLASS.items():
+        target = base_target * scale
+        seeds = attack_gen.load_lines(attack_gen.CASE_DIR / f"{name}.txt")
+        attack_gen.RNG.seed(f"{attack_gen.DEFAULT_SEED}:{name}")
+        lines.extend(attack_gen.iter_class(name, seeds, target, BloomFilter(target + len(seeds))))
+    random.Random(seed).shuffle(lines)
+    return lines[:n]
+
+
+def load_dir(path: Path) -> List[str]:
+    lines: List[str] = []
+    for f in sorted(path.glob("*.txt")):
+        lines.extend(load_file(f))
+    return lines
+
+
+def exact_pairs(unique: List[str]) -> int:
+    """原本的 O(n²) 逐對比較（對照組）。"""
+    count = 0
+    for i in range(len(unique)):
+        for j in range(i + 1, len(unique)):
+            if jaccard(unique[i], unique[j]) >= SIM_THRESHOLD:
+                count += 1
+    return count
+
+
+def bench_corpus(corpus: str, lines: List[str], exact_max: int) -> dict:
+    unique = list(set(lines))
+
+    stats = {}
+    t0 = time.perf_counter()
+    found = find_similar_pairs(unique, SIM_THRESHOLD, stats=stats)
+    elapsed = time.perf_counter() - t0
+
+    result = {
+        "corpus": corpus,
+        "lines": len(lines),
+        "unique": len(unique),
+        "charsets": stats["charsets"],
+        "lsh_candidates": stats["candidates"],
+        "similar_pairs": found,
+        "lsh_s": round(elapsed, 3),
+        # Linux 的 ru_maxrss 單位為 KB；為行程至今的峰值，依規模遞增排列時即各步的上限
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024,
+    }
+    if len(lines) <= exact_max:
+        t0 = time.perf_counter()
+        expected = exact_pairs(unique)
+        result["exact_s"] = round(time.perf_counter() - t0, 3)
+        result["exact_pairs"] = expected
+        result["recall"] = round(found / expected, 4) if expected else 1.0
+        assert found <= expected, (found, expected)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="逗號分隔的行數")
+    parser.add_argument("--dup-ratio", type=float, default=0.1, help="改寫自先前句子的比例")
+    parser.add_argument("--exact-max", type=int, default=3000, help="此規模以下同時跑逐對比較")
+    parser.add_argument("--attack-lines", type=int, default=DEFAULT_ATTACK_LINES, help="攻擊語料行數；0 = 略過")
+    parser.add_argument("--attack-dir", default=None, help="改讀此目錄的 *.txt 作為攻擊語料（不重新產生）")
+    parser.add_argument("--seed", type=int, default=20251213)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = []
+    for n in sizes:
+        print(f"[quality_check_bench] synthetic lines={n} ...", flush=True)
+        results.append(bench_corpus("synthetic", synth_corpus(n, args.dup_ratio, args.seed), args.exact_max))
+    attack: Optional[List[str]] = None
+    if args.attack_dir:
+        attack = load_dir(Path(args.attack_dir))
+    elif args.attack_lines > 0:
+        attack = attack_corpus(args.attack_lines, args.seed)
+    if attack is not None:
+        print(f"[quality_check_bench] attack lines={len(attack)} ...", flush=True)
+        results.append(bench_corpus("attack", attack, args.exact_max))
+        del attack
+
+    print(f"\n{'corpus':>10}{'lines':>8}{'charsets':>10}{'candidates':>12}{'pairs':>11}{'lsh s':>9}{'rss MB':>8}"
+          f"{'exact s':>10}{'recall':>8}")
+    for r in results:
+        print(f"{r['corpus']:>10}{r['lines']:>8}{r['charsets']:>10}{r['lsh_candidates']:>12}{r['similar_pairs']:>11}"
+              f"{r['lsh_s']:>9.3f}{r['max_rss_mb']:>8}{r.get('exact_s', '-'):>10}{r.get('recall', '-'):>8}")
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "params": {"sizes": sizes, "dup_ratio": args.dup_ratio, "threshold": SIM_THRESHOLD, "seed": args.seed,
+                   "attack_lines": args.attack_lines, "attack_dir": args.attack_dir},
+        "results": results,
+    }
+    out = Path(args.out) if args.out else REPORT_DIR / f"quality_check_bench_{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n[quality_check_bench] JSON: {out}")
+
+
+if __name__ == "__main__":
+    main()
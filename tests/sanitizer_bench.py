@@ -0,0 +1,226 @@
+"""
+sanitizer_bench.py — governance_filter 單趟 sanitizer 微基準 + Golden 比對
+
+用法：
+  python -m tests.sanitizer_bench              # golden 比對 + 微基準
+  python -m tests.sanitizer_bench --verify     # 只做 golden 比對（byte-identical）
+  python -m tests.sanitizer_bench --regen      # 以目前 filter 重建 golden（僅在刻意改變輸出時使用）
+
+Golden 語料：tests/filter_golden/golden_corpus.jsonl
+  每行 {"user_input", "model_output", "domain", "expected", "by_domain"}
+  by_domain：各領域 filter 套在 basic_sanitize 結果上的輸出
+  （detect_domain 目前不會回傳 GOVERNANCE / CODE / FINANCE，需直接覆蓋）
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from governance.governance_filter import (
+    _basic_sanitize,
+    _code_filter,
+    _finance_filter,
+    _governance_filter,
+    _meta_dag_filter,
+    filter_response,
+)
+
+GOLDEN_DIR = ROOT / "tests" / "filter_golden"
+GOLDEN_FILE = GOLDEN_DIR / "golden_corpus.jsonl"
+
+DOMAIN_FILTERS = {
+    "META_DAG": _meta_dag_filter,
+    "GOVERNANCE": _governance_filter,
+    "CODE": _code_filter,
+    "FINANCE": _finance_filter,
+}
+
+
+# =========================================================
+#  對照組：改寫前的逐條 re.sub 版本（僅供基準比較）
+# =========================================================
+_LEGACY_PATTERNS = [
+    r"\bAs an AI\b",
+    r"\bAs a language model\b",
+    r"\bI'm excited\b",
+    r"\bI am excited\b",
+    r"\bI'm happy to\b",
+    r"\bI would be happy to\b",
+    r"\bI don't have feelings\b",
+    r"\bIt's nice to meet you\b",
+    r"\bI don't have personal experiences\b",
+]
+
+
+def legacy_basic_sanitize(text: str) -> str:
+    if not text:
+        return ""
+    lines = text.splitlines()
+    lines = lines[:8]
+    text = "\n".join(lines)
+    for p in _LEGACY_PATTERNS:
+        text = re.sub(p, "", text, flags=re.IGNORECASE)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+# =========================================================
+#  語料：模擬真實模型輸出（固定 seed，可重現）
+# =========================================================
+USER_INPUTS = [
+    "請解釋 Meta-DAG 的治理引擎",
+    "幫我寫一段 python code 讀取 json",
+    "這支股票現在可以 all in 嗎？",
+    "公司的 AI governance policy 應該怎麼寫",
+    "今天天氣如何",
+    "semantic drift 是什麼",
+    "我最近好累",
+    "hello there",
+]
+
+OPENERS = [
+    "As an AI, I don't have feelings, but I'm happy to help!",
+    "As a language model, I would be happy to explain this.",
+    "I'm excited to share some thoughts. It's nice to meet you!",
+    "I am excited about this question.",
+    "I don't have personal experiences, however here is an overview.",
+    "當然可以！以下是說明。",
+    "Sure. Here's a short answer.",
+    "",
+]
+
+BODIES = [
+    "Meta-DAG 是一個治理引擎。它負責判斷輸出是否應該存在。 其餘細節請參考文件。",
+    "```python\nimport json\nwith open('a.json') as f:\n    data = json.load(f)\n```\nThis reads the file.",
+    "這支股票一定會漲，建議必買，甚至可以 all-in 或 all in。保證獲利！",
+    "Policy 要點：\n- 透明 ✅\n- 可審計 📜\n- 可否決 🚫\n(詳見附錄) [v1.0] {draft}",
+    "Semantic drift measures how far outputs deviate from the baseline. It is logged passively.",
+    "I'm happy to listen. 你願意多說一點嗎？\n\n\n\n我在這裡。",
+    "Line A\nLine B\nLine C\nLine D\nLine E\nLine F\nLine G\nLine H\nLine I\nLine J",
+    "As an AI language model I can't browse. As an AIassistant... AS AN AI!",
+    "I'm As an AI excited. I'mAs a language model happy to. i AM EXCITED\n\nAs an AI\n\nok",
+]
+
+CLOSERS = [
+    "",
+    "\n\nI would be happy to help further. 😊",
+    "\n\n\n\nLet me know if you have questions!",
+    "\r\nThanks.\r\nBye.",
+    "\u2028Extra line\u2029para",
+]
+
+
+def build_corpus(n: int, seed: int = 20251201) -> List[Tuple[str, str]]:
+    rng = random.Random(seed)
+    out: List[Tuple[str, str]] = []
+    for _ in range(n):
+        parts = [rng.choice(OPENERS), rng.choice(BODIES)]
+        if rng.random() < 0.4:
+            parts.append(rng.choice(BODIES))
+        text = "\n".join(p for p in parts if p) + rng.choice(CLOSERS)
+        if rng.random() < 0.2:
+            text = text * rng.randint(2, 6)
+        out.append((rng.choice(USER_INPUTS), text))
+    return out
+
+
+# =========================================================
+#  Golden
+# =========================================================
+def regen_golden(n: int = 300) -> Path:
+    GOLDEN_DIR.mkdir(parents=True, exist_ok=True)
+    with GOLDEN_FILE.open("w", encoding="utf-8") as f:
+        for user_input, output in build_corpus(n):
+            domain, final = filter_response(user_input, output)
+            base = _basic_sanitize(output.strip())
+            rec = {
+                "user_input": user_input,
+                "model_output": output,
+                "domain": domain,
+                "expected": final,
+                "by_domain": {name: fn(base) for name, fn in DOMAIN_FILTERS.items()},
+            }
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    return GOLDEN_FILE
+
+
+def verify_golden() -> Dict[str, Any]:
+    total = 0
+    mismatches: List[int] = []
+    with GOLDEN_FILE.open("r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            rec = json.loads(line)
+            total += 1
+            domain, final = filter_response(rec["user_input"], rec["model_output"])
+            base = _basic_sanitize(rec["model_output"].strip())
+            got = [final] + [fn(base) for fn in DOMAIN_FILTERS.values()]
+            want = [rec["expected"]] + [rec["by_domain"][name] for name in DOMAIN_FILTERS]
+            if domain != rec["domain"] or [g.encode("utf-8") for g in got] != [w.encode("utf-8") for w in want]:
+                mismatches.append(i)
+    return {"total": total, "mismatches": mismatches}
+
+
+# =========================================================
+#  微基準
+# =========================================================
+def _bench(fn, texts: List[str], rounds: int) -> float:
+    """回傳每次呼叫的平均微秒數（取多輪最佳）。"""
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for t in texts:
+            fn(t)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1e6 / len(texts)
+
+
+def run_bench(n: int = 2000, rounds: int = 5) -> Dict[str, float]:
+    corpus = build_corpus(n, seed=7)
+    texts = [o for _, o in corpus]
+    legacy_us = _bench(legacy_basic_sanitize, texts, rounds)
+    current_us = _bench(_basic_sanitize, texts, rounds)
+    full_us = _bench(lambda t: filter_response("請解釋 Meta-DAG", t), texts, rounds)
+    return {
+        "samples": n,
+        "legacy_basic_sanitize_us": round(legacy_us, 2),
+        "basic_sanitize_us": round(current_us, 2),
+        "speedup": round(legacy_us / current_us, 2) if current_us else 0.0,
+        "filter_response_us": round(full_us, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verify", action="store_true", help="只做 golden 比對")
+    parser.add_argument("--regen", action="store_true", help="以目前 filter 重建 golden")
+    parser.add_argument("--samples", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.regen:
+        print(f"[golden] regenerated: {regen_golden()}")
+        return
+
+    result = verify_golden()
+    status = "PASS" if not result["mismatches"] else "FAIL"
+    print(f"[golden] {status} {result['total'] - len(result['mismatches'])}/{result['total']} byte-identical")
+    if result["mismatches"]:
+        print(f"[golden] mismatched lines: {result['mismatches'][:20]}")
+        sys.exit(1)
+
+    if args.verify:
+        return
+
+    print(json.dumps(run_bench(args.samples), indent=2))
+
+
+if __name__ == "__main__":
+    main()
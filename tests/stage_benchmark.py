@@ -0,0 +1,155 @@
+"""
+stage_benchmark.py — 治理管線逐階段延遲 × 狀態規模
+
+用法：
+  python -m tests.stage_benchmark                                # 1k / 10k / 100k / 1M 筆
+  python -m tests.stage_benchmark --sizes 1000,10000 --cases 200
+  python -m tests.stage_benchmark --compare tests/pressure_reports/stage_benchmark_<ts>.json
+
+量測：每個規模先在暫存目錄寫入 N 筆 tul_log / pra_log / meta_dag_memory（含檢查點）與
+長度 N 的 dag_history，再以 tests/stage_pipeline.run_case 逐筆跑語料，分別記錄
+TUL_translate_v2 / detect_domain / L_alpha_arbitrator / classify_node /
+compute_semantic_drift / auto_pra / append_node 的 p50 / p95 / p99。
+每個規模最多 --cases 筆，且超過 --budget 秒後停止（至少 --min-cases 筆）；大規模下
+整檔重寫的階段每筆可能要數秒，樣本數會較少，報告中的 count 欄位照實記錄。
+
+輸出：終端表格 + tests/pressure_reports/stage_benchmark_<UTC 時間>.json（--out 可指定），
+--compare 舊檔時列出各階段 p95 的倍率變化。
+正確性：每個規模結束後 meta_dag_memory 的節點數 = N + 已跑筆數，且鏈與檢查點驗證通過。
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tests.stage_pipeline import ISOLATED_CHAIN_KEY, STAGES, StageTimer, isolate_state, run_case, seed_state
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+REPORT_DIR = ROOT / "tests" / "pressure_reports"
+ATTACK_CASE_DIR = ROOT / "tests" / "attack_cases"
+
+
+def load_corpus(limit: int = 2000, seed: int = 20251213):
+    texts = []
+    for p in sorted(ATTACK_CASE_DIR.glob("*.txt")):
+        with open(p, "r", encoding="utf-8") as f:
+            texts.extend(line.strip() for line in f if line.strip())
+    texts = sorted(set(texts)) or ["請幫我排定會議時間，週五下午三點後。"]
+    random.Random(seed).shuffle(texts)
+    return texts[:limit]
+
+
+def bench_size(records: int, corpus, max_cases: int, min_cases: int, budget: float) -> dict:
+    from engine.chain_verifier import verify_chain, load_checkpoints
+
+    state_dir = Path(tempfile.mkdtemp(prefix=f"stage_bench_{records}_"))
+    try:
+        t0 = time.perf_counter()
+        history = seed_state(state_dir, records)
+        seed_s = time.perf_counter() - t0
+        isolate_state(state_dir)
+
+        timer = StageTimer()
+        started = time.perf_counter()
+        done = 0
+        # veto / 分類訊息會印到 stdout；量測期間丟棄，避免終端輸出計入延遲
+        with contextlib.redirect_stdout(io.StringIO()):
+            while done < max_cases and (done < min_cases or time.perf_counter() - started < budget):
+                run_case(corpus[done % len(corpus)], timer, dag_history=history)
+                done += 1
+        elapsed = time.perf_counter() - started
+
+        with open(state_dir / "meta_dag_memory.json", "r", encoding="utf-8") as f:
+            nodes = json.load(f)
+        assert len(nodes) == records + done, (len(nodes), records, done)
+        state = load_checkpoints(state_dir / "meta_dag_checkpoints.json")
+        result = verify_chain(nodes, state, ISOLATED_CHAIN_KEY)
+        assert result["ok"], result
+        del nodes
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    return {
+        "records": records,
+        "cases": done,
+        "seed_s": round(seed_s, 2),
+        "elapsed_s": round(elapsed, 2),
+        "stages": timer.summary(),
+    }
+
+
+def print_table(results):
+    print(f"{'stage':<24}{'records':>10}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+    for stage in STAGES + ["total"]:
+        for r in results:
+            s = r["stages"].get(stage)
+            if s:
+                print(f"{stage:<24}{r['records']:>10}{s['count']:>6}{s['p50_ms']:>11.3f}{s['p95_ms']:>11.3f}{s['p99_ms']:>11.3f}")
+
+
+def print_comparison(results, previous_path: Path):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = {r["records"]: r for r in json.load(f)["results"]}
+    print(f"\n--- p95 vs {previous_path.name} (new / old) ---")
+    for r in results:
+        old = previous.get(r["records"])
+        if not old:
+            continue
+        for stage in STAGES + ["total"]:
+            new_s, old_s = r["stages"].get(stage), old["stages"].get(stage)
+            if new_s and old_s and old_s["p95_ms"] > 0:
+                print(f"{stage:<24}{r['records']:>10}  {old_s['p95_ms']:>10.3f} → {new_s['p95_ms']:>10.3f}"
+                      f"  ×{new_s['p95_ms'] / old_s['p95_ms']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="逗號分隔的狀態筆數")
+    parser.add_argument("--cases", type=int, default=500, help="每個規模最多跑幾筆")
+    parser.add_argument("--min-cases", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=60.0, help="每個規模的量測秒數上限")
+    parser.add_argument("--out", default=None, help="JSON 輸出路徑")
+    parser.add_argument("--compare", default=None, help="與先前的 JSON 比較 p95")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    corpus = load_corpus()
+    results = []
+    for records in sizes:
+        print(f"[stage_benchmark] records={records} ...", flush=True)
+        results.append(bench_size(records, corpus, args.cases, args.min_cases, args.budget))
+
+    print()
+    print_table(results)
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"sizes": sizes, "cases": args.cases, "min_cases": args.min_cases, "budget_s": args.budget},
+        "results": results,
+    }
+    out = Path(args.out) if args.out else REPORT_DIR / f"stage_benchmark_{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n[stage_benchmark] JSON: {out}")
+
+    if args.compare:
+        print_comparison(results, Path(args.compare))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+stage_pipeline.py — 逐階段計時的治理管線（供 stage_benchmark / pressure_test_runner 共用）
+
+管線與各階段（依執行順序）：
+  TUL_translate_v2        engine/tul_map.py（寫入 tul_log.json）
+  detect_domain           governance/domain_detect.py
+  L_alpha_arbitrator      governance/governance_engine_cb_sim.py
+  classify_node           governance/governance_classifier.py（dag_history 決定重複偵測的掃描長度）
+  compute_semantic_drift  governance/drift_monitor.py
+  auto_pra                governance/governance_engine_cb_sim.py（寫入 pra_log.json）
+  append_node             engine/phase2_memory_engine.py（寫入 meta_dag_memory.json + 檢查點）
+
+isolate_state(dir) 把上述模組的狀態檔改到指定目錄，壓測 / 基準測試不碰 state/。
+延遲記錄在 engine/memory/metrics.py 的 log-linear 直方圖（微秒）。
+"""
+
+import functools
+import hashlib
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from engine.memory.metrics import PROMETHEUS_BUCKETS_MS, Histogram
+
+STAGES = [
+    "TUL_translate_v2",
+    "detect_domain",
+    "L_alpha_arbitrator",
+    "classify_node",
+    "compute_semantic_drift",
+    "auto_pra",
+    "append_node",
+]
+
+# tul_map 的輸出沒有 PEC 推論；以 domain 補上 L(α) 需要的 Inferred_PEC / Risk_Level
+HIGH_RISK_DOMAINS = {"MANIPULATION_COERCION", "MENTAL_HEALTH_CRISIS", "SAFETY"}
+
+# 隔離狀態下的檢查點簽章金鑰（不建立 state/.chain_checkpoint.key）
+ISOLATED_CHAIN_KEY = b"stage-pipeline-isolated-key"
+
+QUANTILES = (0.50, 0.95, 0.99)
+
+
+class StageTimer:
+    """每個階段一個延遲直方圖（微秒），另記錄整筆案例的延遲。"""
+
+    def __init__(self, stages: Iterable[str] = STAGES):
+        self.histograms: Dict[str, Histogram] = {name: Histogram() for name in stages}
+        self.histograms.setdefault("total", Histogram())
+
+    @contextmanager
+    def timed(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0)
+
+    def record(self, stage: str, seconds: float):
+        hist = self.histograms.get(stage)
+        if hist is None:
+            hist = self.histograms[stage] = Histogram()
+        hist.record(int(seconds * 1_000_000))
+
+    def merge(self, other: "StageTimer"):
+        """併入另一個 StageTimer（例如其他 worker 的結果）。"""
+        for name, hist in other.histograms.items():
+            self.histograms.setdefault(name, Histogram()).merge(hist)
+
+    def to_state(self) -> Dict[str, Any]:
+        """可 pickle / JSON 化的內容（跨行程傳回 worker 的直方圖）。"""
+        return {name: hist.to_state() for name, hist in self.histograms.items()}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "StageTimer":
+        timer = cls(stages=())
+        timer.histograms = {name: Histogram.from_state(data) for name, data in state.items()}
+        return timer
+
+    def histogram_ms(self, stage: str, bounds_ms: Iterable[float] = PROMETHEUS_BUCKETS_MS) -> Dict[str, int]:
+        """累積直方圖：{"≤ 上界 ms": 筆數}，最後一項 "+Inf" 為總筆數。"""
+        hist = self.histograms[stage]
+        bounds = list(bounds_ms)
+        cumulative = hist.cumulative(int(b * 1000) for b in bounds)
+        out = {f"le_{b:g}": cumulative[int(b * 1000)] for b in bounds}
+        out["le_+Inf"] = hist.count
+        return out
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for name, hist in self.histograms.items():
+            if not hist.count:
+                continue
+            pct = hist.percentiles(QUANTILES)
+            out[name] = {
+                "count": hist.count,
+                "mean_ms": round(hist.total / hist.count / 1000, 3),
+                "p50_ms": round(pct[0.50] / 1000, 3),
+                "p95_ms": round(pct[0.95] / 1000, 3),
+                "p99_ms": round(pct[0.99] / 1000, 3),
+                "max_ms": round(hist.max / 1000, 3),
+            }
+        return out
+
+
+def isolate_state(state_dir: Path) -> Path:
+    """把管線各模組的狀態檔導向 state_dir（同一行程內全域生效）。"""
+    import engine.phase2_memory_engine as phase2
+    import engine.tul_map as tul_map
+    import governance.drift_monitor as drift_monitor
+    import governance.governance_engine_cb_sim as cb_sim
+    from engine import chain_verifier
+
+    state_dir = Path(state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    tul_map.TUL_LOG_FILE = state_dir / "tul_log.json"
+    phase2.STATE_DIR = state_dir
+    phase2.MEMORY_STORE_FILE = state_dir / "meta_dag_memory.json"
+    phase2.VETO_INDEX_FILE = state_dir / "veto_index.json"
+    phase2.record_checkpoints = functools.partial(
+        chain_verifier.record_checkpoints,
+        key=ISOLATED_CHAIN_KEY,
+        path=state_dir / "meta_dag_checkpoints.json",
+    )
+    cb_sim.PRA_LOG_FILE = str(state_dir / "pra_log.json")
+    cb_sim.TUL_ARCHIVE_FILE = str(state_dir / "tul_archive.json")
+    drift_monitor.DRIFT_LOG_FILE = state_dir / "drift_log.json"
+    return state_dir
+
+
+def run_case(text: str, timer: StageTimer, dag_history: Optional[List[Dict[str, Any]]] = None,
+             input_type: str = "USER") -> Dict[str, Any]:
+    """逐階段執行一筆案例並計時；回傳各階段的輸出摘要。"""
+    from engine.phase2_memory_engine import append_node
+    from engine.tul_map import TUL_translate_v2
+    from governance.domain_detect import detect_domain
+    from governance.drift_monitor import compute_semantic_drift
+    from governance.governance_classifier import classify_node
+    from governance.governance_engine_cb_sim import L_alpha_arbitrator, auto_pra
+
+    t_case = time.perf_counter()
+    with timer.timed("TUL_translate_v2"):
+        package = TUL_translate_v2(input_type, text)
+    with timer.timed("detect_domain"):
+        domain = detect_domain(text)
+
+    high_risk = domain in HIGH_RISK_DOMAINS
+    tul_struct = {
+        "P": package["data"]["P"],
+        "T": package["data"]["T"],
+        "C": {
+            "Original_NL": text,
+            "Inferred_PEC": ["PEC-3"] if high_risk else ["PEC-0 (Generic)"],
+            "Risk_Level": "HIGH" if high_risk else "LOW",
+            "Domain": domain,
+            "timestamp": package["data"]["metadata"]["timestamp"],
+        },
+        "archival_marker": package["archival_marker"],
+    }
+
+    with timer.timed("L_alpha_arbitrator"):
+        verdict = L_alpha_arbitrator(tul_struct)
+    with timer.timed("classify_node"):
+        classification = classify_node(tul_struct, verdict, dag_history)
+    with timer.timed("compute_semantic_drift"):
+        drift = compute_semantic_drift(tul_struct, verdict, classification)
+    with timer.timed("auto_pra"):
+        pra = auto_pra(
+            policy=f"L_Alpha Arbitration + C-B Class: {classification.get('Code')}",
+            risk=f"{verdict.get('Decision_Status')}",
+            action="Append Node",
+            source="L_ALPHA",
+        )
+    with timer.timed("append_node"):
+        node_id = append_node(tul_struct, verdict, pra)
+    timer.record("total", time.perf_counter() - t_case)
+
+    return {
+        "domain": domain,
+        "decision": verdict.get("Decision_Status"),
+        "code": classification.get("Code"),
+        "drift": drift["Semantic_Drift_Score"],
+        "node_id": node_id,
+    }
+
+
+# ---------- 狀態種子（固定大小的既有資料） ----------
+def _write_json_array(path: Path, items: Iterable[Any], indent: int):
+    """逐筆寫出與 json.dump(list, indent=indent) 相同位元組的陣列，不需把整份清單留在記憶體。"""
+    pad = " " * indent
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        first = True
+        for item in items:
+            body = json.dumps(item, indent=indent, ensure_ascii=False).replace("\n", "\n" + pad)
+            f.write(("\n" if first else ",\n") + pad + body)
+            first = False
+        f.write("]" if first else "\n]")
+
+
+def seed_state(state_dir: Path, records: int, base_ts: float = 1_765_000_000.0) -> List[Dict[str, Any]]:
+    """
+    在 state_dir 寫入各有 records 筆的 tul_log / pra_log / meta_dag_memory（節點正確鏈結並封存檢查點）。
+    回傳同樣長度的 dag_history（classify_node 的重複偵測掃描對象）。
+    """
+    from engine.chain_verifier import GENESIS_NODE_ID, record_checkpoints
+
+    state_dir = Path(state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+
+    def tul_entries():
+        for i in range(records):
+            marker = hashlib.sha256(f"seed|{i}".encode()).hexdigest()[:12]
+            yield {"Input Type": "USER", "Output Type": "BRIDGE_PACKAGE", "Content": f"seed request {i}",
+                   "Index": marker, "Version": 1, "Signature": None, "Time": base_ts + i,
+                   "Source": "cli", "Status": "active"}
+
+    def pra_entries():
+        for i in range(records):
+            yield {"Policy": "L_Alpha Arbitration + C-B Class: A", "Risk": "ACCEPTED",
+                   "Action": "Append Node", "Source": "L_ALPHA", "timestamp": base_ts + i}
+
+    verdict = {"Decision_Status": "ACCEPTED", "L_Alpha_Score": 0.05,
+               "Verdict_Reason": "低風險，常規運算流程。", "Risk_Level": "LOW"}
+    pra = {"Policy": "L_Alpha Arbitration + C-B Class: A", "Risk": "ACCEPTED", "Action": "Append Node",
+           "Source": "L_ALPHA", "timestamp": base_ts}
+
+    def nodes():
+        prev_id = GENESIS_NODE_ID
+        for i in range(1, records + 1):
+            ts = base_ts + i
+            tul = {"P": "TUL_Generic_Protocol", "T": "Translate:USER",
+                   "C": {"Original_NL": f"seed request {i}", "Inferred_PEC": ["PEC-0 (Generic)"], "Risk_Level": "LOW"}}
+            core = json.dumps([tul, verdict, pra], sort_keys=True)
+            node_id = f"TS{int(ts)}_{hashlib.sha256(f'{ts}-{core}'.encode()).hexdigest()[:8]}"
+            yield {"Node_ID": node_id, "Node_Index": i, "Previous_Node_ID": prev_id, "Creation_Timestamp": ts,
+                   "TUL_Input": tul, "L_Alpha_Verdict": verdict, "PRA_Final_Report": pra}
+            prev_id = node_id
+
+    _write_json_array(state_dir / "tul_log.json", tul_entries(), indent=2)
+    _write_json_array(state_dir / "pra_log.json", pra_entries(), indent=4)
+    memory_file = state_dir / "meta_dag_memory.json"
+    _write_json_array(memory_file, nodes(), indent=4)
+    for name in ("meta_dag_checkpoints.json", "veto_index.json", "drift_log.json"):
+        (state_dir / name).unlink(missing_ok=True)
+    with open(memory_file, "r", encoding="utf-8") as f:
+        record_checkpoints(json.load(f), key=ISOLATED_CHAIN_KEY, path=state_dir / "meta_dag_checkpoints.json")
+
+    return [{"archival_marker": {"index": hashlib.sha256(f"history|{i}".encode()).hexdigest()[:12]}}
+            for i in range(records)]